@@ -0,0 +1,367 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2011 Chris Barber <chris@cb1inc.com>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. The name of the author may not be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+#
+# Overview:
+#   Benchmarks dojosvn2git.py without going near the Dojo svn server. A
+#   synthetic svn repo with the same dojo/dijit/dojox/util/demos trunks,
+#   branches and tags layout is built with svnadmin and imported over a
+#   file:// url, first from scratch and then incrementally. Reports revs/sec,
+#   commits/sec and the peak RSS of the tool for each run.
+#
+# Usage:
+#   python bench.py [options] [-- <dojosvn2git.py options>]
+#
+# Options:
+#   --revisions=N   Number of revisions after the initial one (default 200).
+#   --files=N       Files changed by every revision (default 5).
+#   --branches=N    Branches copied from trunk along the way (default 2).
+#   --tags=N        Tags copied from trunk along the way (default 2).
+#   --incremental=N How many of the revisions are left for the incremental
+#                   import (default 20).
+#   --work-dir=DIR  Where to build the svn and git repos (default a new
+#                   temporary directory, removed at the end).
+#   --dump          Feed the tool the dump directly with --dump instead of
+#                   loading it with svnadmin, for when svnadmin is missing.
+#   --json          Print the results as one JSON object.
+#
+# Examples:
+#   Compare the default import against fast-import:
+#     python bench.py
+#     python bench.py -- --fast-import
+#
+#   A bigger history:
+#     python bench.py --revisions=2000 --files=20 --branches=10 --tags=20
+#
+# Dependencies:
+#   python
+#   python-svn
+#   subversion (svnadmin)
+#   git
+#
+
+import os, sys, subprocess, time, shutil, tempfile, random, hashlib, json
+from optparse import OptionParser
+
+PROJECTS = ("dojo", "dijit", "dojox", "util", "demos")
+
+# writes the synthetic history as an svn dump, one revision at a time so the
+# history can be split between the full and the incremental import
+class DumpWriter(object):
+	
+	def __init__(self, num_files, seed=0):
+		self.num_files	= num_files
+		self.random		= random.Random(seed)
+		self.trunks		= dict([(project, []) for project in PROJECTS])
+		self.revision	= 0
+		self.date		= 1300000000
+	
+	def header(self, stream):
+		stream.write("SVN-fs-dump-format-version: 2\n\n")
+		stream.write("UUID: 5f1f9c3e-0000-4000-8000-000000000000\n\n")
+		self.write_revision(stream, 0, { "svn:date":self.svn_date() })
+	
+	def initial(self, stream):
+		# the trunks with a few files each, like the 1.2 snapshot
+		self.revision += 1
+		self.write_revision(stream, self.revision, self.revprops("Initial layout"))
+		for project in PROJECTS:
+			self.write_dir(stream, project)
+			self.write_dir(stream, project + "/trunk")
+			self.write_dir(stream, project + "/trunk/_base")
+			for i in xrange(max(self.num_files, 1)):
+				path = "%s/trunk/_base/file%d.js" % (project, i)
+				self.write_file(stream, path, "add", self.content(path))
+		self.write_dir(stream, "branches")
+		self.write_dir(stream, "tags")
+	
+	def change(self, stream):
+		self.revision += 1
+		self.write_revision(stream, self.revision, self.revprops("Change %d" % self.revision))
+		changed = set()
+		for i in xrange(self.num_files):
+			project = self.random.choice(PROJECTS)
+			if self.random.random() < 0.2:
+				# every so often a new file instead of a changed one
+				path = "%s/trunk/file%d-%d.js" % (project, self.revision, i)
+				action = "add"
+			else:
+				path = self.random.choice(self.trunks[project])
+				action = "change"
+			if path in changed:
+				continue
+			changed.add(path)
+			self.write_file(stream, path, action, self.content(path))
+	
+	def branch(self, stream, name):
+		# branches hold a copy of some of the trunks, like the real ones do
+		self.revision += 1
+		self.write_revision(stream, self.revision, self.revprops("Branch %s" % name))
+		self.write_dir(stream, "branches/" + name)
+		for project in ("dojo", "dijit"):
+			self.write_copy(stream, "branches/%s/%s" % (name, project), project + "/trunk")
+	
+	def tag(self, stream, name):
+		self.revision += 1
+		self.write_revision(stream, self.revision, self.revprops("Tag %s" % name))
+		self.write_dir(stream, "tags/" + name)
+		for project in PROJECTS:
+			self.write_copy(stream, "tags/%s/%s" % (name, project), project + "/trunk")
+	
+	def content(self, path):
+		return "// %s r%d\n%s\n" % (path, self.revision, "x" * self.random.randint(100, 4000))
+	
+	def revprops(self, message):
+		self.date += 60
+		return { "svn:log":message, "svn:author":"bench", "svn:date":self.svn_date() }
+	
+	def svn_date(self):
+		return time.strftime("%Y-%m-%dT%H:%M:%S.000000Z", time.gmtime(self.date))
+	
+	def write_revision(self, stream, number, props):
+		props = self.props(props)
+		stream.write("Revision-number: %d\n" % number)
+		stream.write("Prop-content-length: %d\n" % len(props))
+		stream.write("Content-length: %d\n\n" % len(props))
+		stream.write(props + "\n")
+	
+	def write_dir(self, stream, path):
+		props = self.props({})
+		stream.write("Node-path: %s\nNode-kind: dir\nNode-action: add\n" % path)
+		stream.write("Prop-content-length: %d\nContent-length: %d\n\n" % (len(props), len(props)))
+		stream.write(props + "\n\n")
+	
+	def write_file(self, stream, path, action, text):
+		if action == "add":
+			self.trunks[path.split("/")[0]].append(path)
+		props = self.props({}) if action == "add" else ""
+		stream.write("Node-path: %s\nNode-kind: file\nNode-action: %s\n" % (path, action))
+		if len(props):
+			stream.write("Prop-content-length: %d\n" % len(props))
+		stream.write("Text-content-length: %d\nText-content-md5: %s\n" % (len(text), hashlib.md5(text).hexdigest()))
+		stream.write("Content-length: %d\n\n" % (len(props) + len(text)))
+		stream.write(props + text + "\n\n")
+	
+	def write_copy(self, stream, path, source):
+		stream.write("Node-path: %s\nNode-kind: dir\nNode-action: add\n" % path)
+		stream.write("Node-copyfrom-rev: %d\nNode-copyfrom-path: %s\n\n\n" % (self.revision - 1, source))
+	
+	def props(self, props):
+		data = ""
+		for (key, value) in sorted(props.items()):
+			data += "K %d\n%s\nV %d\n%s\n" % (len(key), key, len(value), value)
+		return data + "PROPS-END\n"
+
+class Bench(object):
+	
+	def __init__(self, work_dir, num_revisions, num_files, num_branches, num_tags, num_incremental, use_dump, tool_args):
+		self.work_dir			= work_dir
+		self.num_revisions		= num_revisions
+		self.num_files			= num_files
+		self.num_branches		= num_branches
+		self.num_tags			= num_tags
+		self.num_incremental	= min(num_incremental, num_revisions)
+		self.use_dump			= use_dump
+		self.tool_args			= tool_args
+		self.tool				= os.path.join(os.path.dirname(os.path.abspath(__file__)), "dojosvn2git.py")
+		self.svn_path			= os.path.join(work_dir, "svn")
+		self.git_path			= os.path.join(work_dir, "git")
+		self.base_dump			= os.path.join(work_dir, "base.dump")
+		self.full_dump			= os.path.join(work_dir, "full.dump")
+		self.rest_dump			= os.path.join(work_dir, "rest.dump")
+	
+	def go(self):
+		sys.stderr.write("Building synthetic history in %s... " % self.work_dir)
+		self.write_dumps()
+		if not self.use_dump:
+			self.run(["svnadmin", "create", self.svn_path])
+			self.load(self.base_dump)
+		sys.stderr.write("done\n")
+		
+		results = {}
+		results["full"] = self.import_revisions(self.base_dump)
+		if self.num_incremental:
+			if not self.use_dump:
+				self.load(self.rest_dump)
+			results["incremental"] = self.import_revisions(self.full_dump)
+		return results
+	
+	def write_dumps(self):
+		# branches and tags are spread evenly over the history, the last
+		# num_incremental revisions only go into the full and rest dumps
+		writer = DumpWriter(self.num_files)
+		events = ["change"] * self.num_revisions
+		for (kind, count) in (("branch", self.num_branches), ("tag", self.num_tags)):
+			for i in xrange(count):
+				# the next free slot, so branches and tags don't land on each other
+				slot = (i + 1) * self.num_revisions / (count + 1)
+				while slot < len(events) - 1 and events[slot] != "change":
+					slot += 1
+				events[slot] = kind
+		split = self.num_revisions - self.num_incremental
+		
+		base = open(self.base_dump, "w")
+		rest = open(self.rest_dump, "w")
+		full = open(self.full_dump, "w")
+		for stream in (base, rest, full):
+			writer.header(stream)
+		
+		chunk = Tee(base, full)
+		writer.initial(chunk)
+		for (i, kind) in enumerate(events):
+			if i == split:
+				chunk = Tee(rest, full)
+			if kind == "branch":
+				writer.branch(chunk, "1.%d" % i)
+			elif kind == "tag":
+				writer.tag(chunk, "release-1.%d.0" % i)
+			else:
+				writer.change(chunk)
+		
+		for stream in (base, rest, full):
+			stream.close()
+	
+	def load(self, dump):
+		stream = open(dump)
+		try:
+			self.run(["svnadmin", "load", "--quiet", self.svn_path], stdin=stream)
+		finally:
+			stream.close()
+	
+	def import_revisions(self, dump):
+		cmd = [sys.executable, self.tool, "--start-rev", "1"]
+		if self.use_dump:
+			cmd += ["--dump", dump]
+		else:
+			cmd += ["--svn-url", "file://" + os.path.abspath(self.svn_path)]
+		cmd += self.tool_args + [self.git_path]
+		
+		start_rev = self.svn_rev()
+		start_commits = self.num_commits()
+		log = open(os.path.join(self.work_dir, "import.log"), "a")
+		start = time.time()
+		p = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT)
+		# wait4 is the only way to get at the rusage of this one child
+		(pid, status, usage) = os.wait4(p.pid, 0)
+		seconds = time.time() - start
+		log.close()
+		if status != 0:
+			raise RuntimeError("Import failed, see %s" % os.path.join(self.work_dir, "import.log"))
+		
+		revisions = self.svn_rev() - start_rev
+		commits = self.num_commits() - start_commits
+		return {
+			"revisions": revisions,
+			"commits": commits,
+			"seconds": round(seconds, 3),
+			"revs_per_sec": round(revisions / seconds, 2),
+			"commits_per_sec": round(commits / seconds, 2),
+			# kilobytes on linux
+			"peak_rss_kb": usage.ru_maxrss
+		}
+	
+	def svn_rev(self):
+		# the last revision the journal has as done, .svnrev only moves
+		# with a commit on master and the revisions in between count too
+		path = os.path.join(self.git_path, ".git", "svn2git-journal")
+		if os.path.isfile(path):
+			rev = 0
+			file = open(path)
+			for line in file:
+				parts = line.split()
+				if line.endswith("\n") and len(parts) == 2 and parts[1] == "done" and parts[0].isdigit():
+					rev = max(rev, int(parts[0]))
+			file.close()
+			return rev
+		path = os.path.join(self.git_path, ".svnrev")
+		if not os.path.isfile(path):
+			return 0
+		file = open(path)
+		rev = int(file.readline())
+		file.close()
+		return rev
+	
+	def num_commits(self):
+		if not os.path.isdir(self.git_path):
+			return 0
+		return int(subprocess.Popen(["git", "rev-list", "--all", "--count"], cwd=self.git_path, stdout=subprocess.PIPE).communicate()[0])
+	
+	def run(self, cmd, stdin=None):
+		if subprocess.call(cmd, stdin=stdin) != 0:
+			raise RuntimeError("""Command "%s" failed""" % " ".join(cmd))
+
+# writes the same thing to two streams
+class Tee(object):
+	
+	def __init__(self, *streams):
+		self.streams = streams
+	
+	def write(self, data):
+		for stream in self.streams:
+			stream.write(data)
+
+if __name__ == "__main__":
+	parser = OptionParser(usage="python bench.py [options] [-- <dojosvn2git.py options>]")
+	parser.add_option("--revisions", type="int", dest="revisions", default=200, metavar="N",
+		help="number of revisions after the initial one [default: %default]")
+	parser.add_option("--files", type="int", dest="files", default=5, metavar="N",
+		help="files changed by every revision [default: %default]")
+	parser.add_option("--branches", type="int", dest="branches", default=2, metavar="N",
+		help="branches copied from trunk along the way [default: %default]")
+	parser.add_option("--tags", type="int", dest="tags", default=2, metavar="N",
+		help="tags copied from trunk along the way [default: %default]")
+	parser.add_option("--incremental", type="int", dest="incremental", default=20, metavar="N",
+		help="revisions left for the incremental import [default: %default]")
+	parser.add_option("--work-dir", dest="work_dir", default=None, metavar="DIR",
+		help="where to build the svn and git repos [default: a temporary directory]")
+	parser.add_option("--dump", action="store_true", dest="dump", default=False,
+		help="import the dump with --dump instead of loading it into svnadmin")
+	parser.add_option("--json", action="store_true", dest="json", default=False,
+		help="print the results as JSON")
+	(options, args) = parser.parse_args()
+	
+	work_dir = options.work_dir
+	if work_dir == None:
+		work_dir = tempfile.mkdtemp(prefix="svn2git-bench-")
+	elif not os.path.isdir(work_dir):
+		os.makedirs(work_dir)
+	
+	try:
+		results = Bench(work_dir, options.revisions, options.files, options.branches, options.tags, options.incremental, options.dump, args).go()
+	finally:
+		if options.work_dir == None:
+			shutil.rmtree(work_dir, True)
+	
+	if options.json:
+		print json.dumps(results, sort_keys=True)
+	else:
+		print "%-12s %8s %8s %9s %10s %12s %12s" % ("Import", "Revs", "Commits", "Seconds", "Revs/sec", "Commits/sec", "Peak RSS")
+		for name in ("full", "incremental"):
+			if name in results:
+				r = results[name]
+				print "%-12s %8d %8d %9.2f %10.2f %12.2f %10d KB" % (name, r["revisions"], r["commits"], r["seconds"], r["revs_per_sec"], r["commits_per_sec"], r["peak_rss_kb"])
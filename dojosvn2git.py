@@ -33,8 +33,144 @@
 #   dijit, dojox, util, and demos into a single repo including branches and
 #   tags.
 #
+#   How far the sync got is kept in .git/svn2git-journal, one line per step
+#   of every revision. If the tool is killed halfway through it carries on
+#   where it stopped next time, a lock left behind by a process that is no
+#   longer running is removed. Repos without a journal are picked up from
+#   their .svnrev file.
+#
 # Usage:
-#   python dojosvn2git.py [<repo dir>]
+#   python dojosvn2git.py [options] [<repo dir>]
+#
+# Options:
+#   --fast-import   Stream commits into one "git fast-import" process instead
+#                   of running git for every changed file. Much faster on big
+#                   revisions.
+#   --check-refs    Debugging aid, compares the cached branches, tags and HEAD
+#                   against git after every revision.
+#   --export-workers=N
+#                   Export up to N files of a revision from svn at the same
+#                   time (default 1).
+#   --export-retries=N
+#                   Retry a failed export N times before giving up (default 2).
+#   --prefetch=N    Classify and export up to N revisions ahead in the
+#                   background while git is busy committing (default 0).
+#   --log-workers=N Fetch the svn log in up to N windows at the same time
+#                   ahead of the import (default 3). Windows are sized to
+#                   take about two seconds each from how long the last ones
+#                   took for how many changed paths.
+#   --dump=FILE     Read the history from an "svnadmin dump" or "svnrdump dump"
+#                   stream instead of the svn server, use - for stdin. A new
+#                   repo gets every revision in the dump instead of starting
+#                   at the 1.2 snapshot. Files are committed the way the dump
+#                   has them, unlike an export svn:keywords aren't expanded
+#                   and svn:eol-style isn't applied.
+#   --blob-cache=DIR
+#                   Where to keep copies of exported files (default
+#                   .git/svn2git-blobs in the repo). Content that has been
+#                   exported before is taken from git or this cache instead
+#                   of svn.
+#   --blob-cache-size=MB
+#                   How much the blob cache may keep on disk, least recently
+#                   used files go first (default 512).
+#   --svn-url=URL   Root of the svn repo to import from (default
+#                   http://svn.dojotoolkit.org/src). It has to have the same
+#                   dojo/dijit/dojox/util/demos, branches and tags layout.
+#   --start-rev=REV The svn revision a new repo is started from (default
+#                   15378, the 1.2 release).
+#   --shards=N      Import a new repo by running up to N worker processes, one
+#                   project each, into staging repos. The revisions are then
+#                   replayed into the repo one at a time in svn revision
+#                   order, with every file taken from the staging repos
+#                   instead of svn. Only the svn side runs in parallel, the
+#                   replay is as serial as a normal import and makes the same
+#                   history.
+#   --include=PATH, --exclude=PATH
+#                   Only mirror the svn paths under the given ones, like
+#                   dojo, dojox/trunk/gfx, branches or tags/release-1.*
+#                   (default everything). Both can be given more than once,
+#                   the most specific one wins. Nothing under an excluded
+#                   path is exported from svn, a directory with some in it
+#                   is only listed. A new branch or tag still starts from
+#                   what the repo has of the commit it was copied from.
+#                   Give the same ones every time the repo is synced.
+#   --targets=FILE  Sync every repo in the JSON list FILE instead of the repo
+#                   dir, each in a process of its own with its log next to
+#                   it. A target is an object with a "repo" dir and can have
+#                   "include" and "exclude" lists, "remote_url", "push_every"
+#                   and "fast_import". The svn log is fetched once and only
+#                   the first target goes to svn for what the others want
+#                   too, so put the widest one first. They share the caches,
+#                   which are kept next to FILE unless given.
+#   --remote-url=URL
+#                   Push to URL instead of the github repo of the given
+#                   account, for example a local bare repo.
+#   --push-every=N  Push in the background every N revisions while the
+#                   import goes on, so a long catch-up publishes as it goes.
+#                   Everything is pushed once more at the end.
+#   --maintain-every=N
+#                   Repack the objects in the background after about N new
+#                   files and commits (default 25000) and while --watch has
+#                   nothing to do, logging the loose objects and packs before
+#                   and after. 0 leaves it to "git gc --auto".
+#   --watch         Keep running and sync new revisions within seconds of them
+#                   landing in svn, without paying for startup every time.
+#   --poll-min=SECONDS, --poll-max=SECONDS
+#                   How often --watch asks svn for its HEAD revision. The
+#                   interval doubles from the minimum (default 5) up to the
+#                   maximum (default 300) while nothing changes.
+#   --status-file=FILE
+#                   With --watch, keep the state of the watch in FILE as
+#                   JSON: the synced and svn HEAD revisions, the last poll,
+#                   sync and error, and when the next poll is due.
+#   --plan=REV:REV  Instead of syncing, print what syncing a range of svn
+#                   revisions would do: the branches and tags created and
+#                   deleted and the files added, modified and deleted on
+#                   each branch, with how many files that means exporting.
+#                   Only the svn log is read and nothing in the repo but the
+#                   meta cache is written to, so it can run while the repo is
+#                   being synced. A directory counts with all of its files
+#                   only if the meta cache has its info from an earlier sync
+#                   or it's copied from git, otherwise as one file.
+#                   Either end can be left out, : plans everything that
+#                   isn't synced yet. The log is kept in the meta cache, and
+#                   a sync that finds all of its revisions there weighs the
+#                   time left by what each one will cost.
+#   --verify=REV:REV
+#                   Instead of syncing, check the commits made for a range of
+#                   svn revisions against svn: the files svn has for every
+#                   trunk or branch at that revision are compared with the
+#                   blobs in the commit by md5. A file is read from svn
+#                   unless the blob cache or an earlier commit already gave
+#                   its md5 at the revision it last changed in. Either end
+#                   can be left out, a single REV checks just that one. svn
+#                   is asked on --export-workers threads. The repo is only
+#                   read, so it can run while the repo is being synced. In a
+#                   repo that has had a --dump a file with svn:keywords or
+#                   svn:eol-style also matches the way svn keeps it.
+#   --verify-sample=N
+#                   Only check N commits spread evenly over the range.
+#   --verify-output=FILE
+#                   Write every mismatch to FILE as a JSON line with the
+#                   revision, branch, commit, path and problem, - for stdout.
+#   --metrics=FILE  Append a JSON line per revision to FILE with its changed
+#                   paths, files, bytes and the time spent in each phase (svn
+#                   info2, export, git add/rm/stage/status/commit/checkout),
+#                   and print a summary with percentiles at the end. Without
+#                   --fast-import the adds and removes go to git in one git
+#                   stage before the next status, commit or checkout. Each
+#                   svn log window, git push and git repack gets a line of
+#                   its own with its phase and the revisions, changed paths,
+#                   refs or objects it covered.
+#   --rebuild-revmap
+#                   Rebuild .git/svn2git-revmap, the map from svn revision to
+#                   git commit, from the [[rev]] in every commit message. This
+#                   happens on its own when the map is missing or behind.
+#   --meta-cache=FILE
+#                   Where to keep the svn log and file list cache (default
+#                   .git/svn2git-meta.db in the repo). Revisions in the cache
+#                   are never asked for again, keep it outside the repo to
+#                   reuse it when rebuilding from scratch.
 #
 # Examples:
 #   Start fresh, creates new repo named "dojo-toolkit":
@@ -49,22 +185,167 @@
 #   Update from within the repo and push to github
 #     python dojosvn2git.py . my-github-account
 #
+#   Update using git fast-import:
+#     python dojosvn2git.py --fast-import dojo-toolkit
+#
+#   Keep a mirror up to date as commits land:
+#     python dojosvn2git.py --watch --status-file=/tmp/dojo.json dojo-toolkit my-github-account
+#
+#   See what a catch-up is in for before running it:
+#     python dojosvn2git.py --plan=: dojo-toolkit
+#
+#   Mirror only dojo and dijit without their tests, branches or tags:
+#     python dojosvn2git.py --include=dojo --include=dijit --exclude=dojo/trunk/tests --exclude=dijit/trunk/tests dojo-core
+#
+#   Keep a full mirror and a dojo only one from the same fetch, with
+#   mirrors.json holding
+#   [{"repo": "dojo-toolkit"}, {"repo": "dojo-core", "include": ["dojo"]}]:
+#     python dojosvn2git.py --targets=mirrors.json
+#
+#   Check 50 of the commits from rev 21000 on against svn:
+#     python dojosvn2git.py --verify=21000: --verify-sample=50 --verify-output=mismatches.json dojo-toolkit
+#
+#   Replay a local dump:
+#     svnadmin dump /path/to/svn/repo | python dojosvn2git.py --dump - dojo-toolkit
+#
 # Dependencies:
 #   python
 #   python-svn
-#   git
+#   git 2.26 or newer
 #
 # Note:
 #   This tool is written by a Python noob. Don't hate.
 #
 
-import os, sys, subprocess, pysvn, time, re, shutil
+import os, sys, subprocess, pysvn, time, re, shutil, threading, Queue, calendar, zlib, sqlite3, struct, bisect, hashlib, json, multiprocessing, errno, socket, fnmatch
 from subprocess import Popen, PIPE, STDOUT
-from math import floor
+from multiprocessing.pool import ThreadPool
+from optparse import OptionParser
+from math import floor, ceil
+
+# wall time and call counts per phase of the import, written out as one JSON
+# line per revision and summed up with percentiles at the end
+class Metrics(object):
+	
+	def __init__(self, path=None):
+		self.path		= path
+		self.file		= None
+		self.lock		= threading.Lock()
+		self.samples	= {}
+		self.current	= {}
+		
+		if path != None:
+			self.file = open(path, "a")
+	
+	def record(self, phase, seconds, phases=None):
+		# phases is where the time is billed, a revision's own dict when the
+		# work is done ahead of time for it, otherwise the revision being
+		# applied right now
+		with self.lock:
+			self.samples.setdefault(phase, []).append(seconds)
+			entry = (phases if phases != None else self.current).setdefault(phase, [0, 0.0])
+			entry[0] += 1
+			entry[1] += seconds
+	
+	def record_apart(self, phase, seconds, details):
+		# work that isn't for any one revision, like an svn log of a whole
+		# window, goes in the summary and gets a JSON line of its own
+		with self.lock:
+			self.samples.setdefault(phase, []).append(seconds)
+			if self.file != None:
+				line = dict(details)
+				line.update({ "phase": phase, "time": int(time.time()), "seconds": round(seconds, 4) })
+				self.file.write(json.dumps(line, sort_keys=True) + "\n")
+				self.file.flush()
+	
+	def finish_revision(self, revision, seconds):
+		with self.lock:
+			self.samples.setdefault("revision", []).append(seconds)
+			phases = self.current
+			self.current = {}
+		for (phase, (calls, total)) in revision.phases.items():
+			entry = phases.setdefault(phase, [0, 0.0])
+			entry[0] += calls
+			entry[1] += total
+		
+		with self.lock:
+			if self.file != None:
+				self.file.write(json.dumps({
+					"revision": revision.number,
+					"time": int(time.time()),
+					"seconds": round(seconds, 4),
+					"paths": revision.num_paths,
+					"files": revision.num_files,
+					"bytes": revision.num_bytes,
+					"phases": dict([(phase, { "calls": calls, "seconds": round(total, 4) }) for (phase, (calls, total)) in phases.items()])
+				}, sort_keys=True) + "\n")
+				self.file.flush()
+	
+	def summary(self):
+		# rows of (phase, calls, total, p50, p90, p99, max), slowest first
+		rows = []
+		with self.lock:
+			for (phase, samples) in self.samples.items():
+				samples = sorted(samples)
+				rows.append((phase, len(samples), sum(samples), self.percentile(samples, 50), self.percentile(samples, 90), self.percentile(samples, 99), samples[-1]))
+		rows.sort(key=lambda row: row[2], reverse=True)
+		return rows
+	
+	def close(self):
+		if self.file != None:
+			self.file.write(json.dumps({ "summary": dict([(row[0], { "calls": row[1], "seconds": round(row[2], 4), "p50": round(row[3], 4), "p90": round(row[4], 4), "p99": round(row[5], 4), "max": round(row[6], 4) }) for row in self.summary()]) }, sort_keys=True) + "\n")
+			self.file.close()
+			self.file = None
+	
+	def percentile(self, samples, percent):
+		# nearest rank, samples have to be sorted
+		return samples[max(0, int(ceil(len(samples) * percent / 100.0)) - 1)]
+
+# runs in a worker process of --shards, imports a single project into its
+# own staging repo
+def import_shard(job):
+	(options, project, path) = job
+	sys.stdout = open(path + ".log", "w")
+	try:
+		return (project, Repo(path, "", shard=project, **options).go())
+	finally:
+		sys.stdout.close()
+		sys.stdout = sys.__stdout__
+
+# runs in a process of its own for every target of --targets. The first
+# target tells the others how far it got through progress, the others get
+# the path and filter of the first target in fan_out
+def sync_target(options, path, fan_out):
+	sys.stdout = open(path + ".log", "w")
+	result = 1
+	try:
+		result = Repo(path, "", fan_out=fan_out, **options).go()
+	finally:
+		if fan_out[1] == None:
+			# the others go on by themselves from here
+			fan_out[0].value = sys.maxint
+		sys.stdout.close()
+		sys.stdout = sys.__stdout__
+	sys.exit(result)
+
+# times a Repo method under the given phase. With staged what git_add and
+# git_rm collected goes to git first, timed as "git stage" of its own
+def timed(phase, staged=False):
+	def wrap(method):
+		def timed_method(self, *args, **kwargs):
+			if staged:
+				self.git_stage()
+			start = time.time()
+			try:
+				return method(self, *args, **kwargs)
+			finally:
+				self.metrics.record(phase, time.time() - start)
+		return timed_method
+	return wrap
 
 class Repo(object):
 	
-	def __init__(self, repo_path, remote_repo_username):
+	def __init__(self, repo_path, remote_repo_username, use_fast_import=False, check_refs=False, export_workers=1, export_retries=2, prefetch=0, dump_file=None, meta_cache_path=None, rebuild_revmap=False, blob_cache_path=None, blob_cache_size=512, metrics_path=None, svn_url="http://svn.dojotoolkit.org/src", start_revid=15378, shards=0, shard=None, remote_url=None, push_every=0, maintain_every=25000, log_workers=3, includes=(), excludes=(), fan_out=None):
 		if repo_path == ".":
 			repo_path = os.getcwd()
 		
@@ -72,47 +353,129 @@ class Repo(object):
 		self.repo_name				= os.path.basename(repo_path)
 		self.remote_repo_username	= remote_repo_username
 		self.laps					= []
+		self.lap_weights			= []
+		self.plan_revids			= None
+		self.plan_totals			= None
+		self.plan_sizes				= {}
 		self.svn_client				= pysvn.Client()
 		self.num_commits			= 0
+		self.use_fast_import		= use_fast_import
+		self.fast_import			= None
+		self.check_refs				= check_refs
+		self.branches				= None
+		self.tags					= None
+		self.head					= None
+		self.export_pool			= ExportPool(self, export_workers, export_retries)
+		self.prefetch				= prefetch
+		self.log_workers			= log_workers
+		self.svn_url				= svn_url.rstrip("/")
+		self.start_revid			= start_revid
+		self.spool_path				= os.path.join(repo_path, ".git", "svn2git-spool")
+		self.dump_file				= dump_file
+		self.dump_modes				= {}
+		self.meta_cache_path		= meta_cache_path or os.path.join(repo_path, ".git", "svn2git-meta.db")
+		self.meta_cache				= None
+		self.first_revid			= start_revid
+		self.revmap					= RevMap(os.path.join(repo_path, ".git", "svn2git-revmap"))
+		self.journal				= Journal(os.path.join(repo_path, ".git", "svn2git-journal"))
+		self.dump_marker			= os.path.join(repo_path, ".git", "svn2git-dump")
+		self.stale_lock				= False
+		self.rebuild_revmap			= rebuild_revmap
+		self.blob_cache_path		= blob_cache_path or os.path.join(repo_path, ".git", "svn2git-blobs")
+		self.blob_cache_size		= blob_cache_size
+		self.blob_cache				= None
+		self.metrics				= Metrics(metrics_path)
+		self.shards					= shards
+		self.shard					= shard
+		self.shard_path				= os.path.join(repo_path, ".git", "svn2git-shards")
+		self.path_filter			= PathFilter(includes, excludes)
+		self.fan_out				= fan_out
+		self.all_projects			= ("dojo", "dijit", "dojox", "util", "demos")
+		# the projects whose trunk makes it into master
+		self.projects				= (shard,) if shard != None else tuple([project for project in self.all_projects if self.path_filter.reaches("/%s/trunk" % project)])
+		self.warm					= False
+		self.remote_url				= remote_url
+		self.push_every				= push_every
+		self.push_thread			= None
+		self.push_error				= None
+		self.maintain_every			= maintain_every
+		self.maintain_thread		= None
+		self.maintain_result		= None
+		self.objects_written		= 0
+		self.staged_adds			= []
+		self.staged_removes			= []
 	
 	def go(self):
-		svn_url				= "http://svn.dojotoolkit.org/src"
-		local_revid			= 15378 # release 1.2
+		svn_url				= self.svn_url
+		local_revid			= self.start_revid # release 1.2 unless told otherwise
+		if self.dump_file:
+			# a dump carries its own history, there's no 1.2 snapshot to start from
+			local_revid		= 0
+		self.first_revid	= local_revid
 		start_revid			= local_revid
 		new_repo			= False
 		do_checkout			= False
 		branches_touched	= []
 		branches_deleted	= []
 		tags_touched		= []
+		tags_deleted		= []
 		start_time			= time.time()
 		svnrev_file			= os.path.join(self.repo_path, ".svnrev")
-		last_run_new_branch	= False
 		
 		try:
 			if self.is_locked():
 				self.logln("\nDetected another instance of the tool already running, exiting")
 				return 1
 			
+			if len(self.path_filter.includes + self.path_filter.excludes):
+				self.logln("\nOnly mirroring svn paths by %s" % self.path_filter.describe())
+			
 			if os.path.isdir(self.repo_path):
 				self.create_lock()
 				
-				if os.path.isfile(svnrev_file):
+				if self.shards > 0:
+					self.logln("\nRepo already exists, --shards only applies to new repos")
+				
+				if self.journal.exists() or os.path.isfile(svnrev_file):
 					# need to figure out what version we're on
-					svnrev_file = open(svnrev_file)
-					rev = svnrev_file.readline()
-					svnrev_file.close()
+					self.journal.load()
+					rev = self.synced_rev()
 					
-					if len(rev) and int(rev) >= local_revid:
-						start_revid = local_revid = int(rev)
+					if rev != None and rev >= local_revid:
+						start_revid = local_revid = rev
 					else:
-						self.logln("\nUnable to read a valid last svn rev from the .svnrev file")
+						self.logln("\nUnable to read a valid last svn rev from the journal or the .svnrev file")
 						self.delete_lock()
 						return 1
 					
+					resumed = self.journal.phases(local_revid + 1)
+					if len(resumed):
+						self.logln("\nResuming rev %s, it was %s" % (local_revid + 1, ", ".join([phase + (" on " + branch if branch else "") for (phase, branch) in resumed])))
+					if len(resumed) or self.stale_lock:
+						# the last run died halfway through, throw away whatever it
+						# left in the index and working tree
+						self.run("git reset --hard -q")
+					
+					self.git_load_refs()
 					if self.git_current_branch() != "master":
 						self.git_checkout("master")
+					
+					# with --watch the map is still in memory from the last sync
+					if not self.warm or self.revmap.last_rev() != local_revid:
+						self.revmap.load()
+					if self.revmap.exists() and self.revmap.last_rev() > local_revid and self.use_fast_import:
+						# fast-import commits that never made it to disk, the ones
+						# the journal has for the revision being resumed did
+						self.revmap.truncate(local_revid, set([(local_revid + 1, branch) for branch in self.journal.committed(local_revid + 1)]))
+					elif self.revmap.exists() and not self.use_fast_import and (len(resumed) or self.revmap.last_rev() > local_revid):
+						# git commits are on disk as soon as they're made, even
+						# when the journal or the revmap never heard of them
+						self.git_recover_revmap(local_revid)
+					if self.rebuild_revmap or not self.revmap.exists() or self.revmap.last_rev() < self.read_svnrev():
+						self.git_rebuild_revmap()
+						self.rebuild_revmap = False
 				else:
-					self.logln("""\nRepo path "%s" is missing the .svnrev file!""" % self.repo_path)
+					self.logln("""\nRepo path "%s" is missing the journal and the .svnrev file!""" % self.repo_path)
 					self.delete_lock()
 					return 1
 			else:
@@ -122,272 +485,129 @@ class Repo(object):
 				
 				self.create_lock()
 				
-				# export the files
-				self.log("\nDoing initial Dojo 1.2 svn checkout... ")
-				self.svn_client.checkout(svn_url + "/dojo/trunk", os.path.join(self.repo_path, "dojo"), recurse=True, revision=pysvn.Revision(pysvn.opt_revision_kind.number, local_revid))
-				self.svn_client.checkout(svn_url + "/dijit/trunk", os.path.join(self.repo_path, "dijit"), recurse=True, revision=pysvn.Revision(pysvn.opt_revision_kind.number, local_revid))
-				self.svn_client.checkout(svn_url + "/dojox/trunk", os.path.join(self.repo_path, "dojox"), recurse=True, revision=pysvn.Revision(pysvn.opt_revision_kind.number, local_revid))
-				self.svn_client.checkout(svn_url + "/util/trunk", os.path.join(self.repo_path, "util"), recurse=True, revision=pysvn.Revision(pysvn.opt_revision_kind.number, local_revid))
-				self.svn_client.checkout(svn_url + "/demos/trunk", os.path.join(self.repo_path, "demos"), recurse=True, revision=pysvn.Revision(pysvn.opt_revision_kind.number, local_revid))
-				self.logln("done")
-				
-				self.log("Cleaning up .svn directories and finding empty directories... ")
-				self.process_svn_dir(self.repo_path, True, False)
-				self.logln("done")
-				
-				# add the files to git
-				for project in ("dojo", "dijit", "dojox", "util", "demos"):
-					self.git_add(project)
+				if self.shards > 0 and not self.dump_file:
+					if not self.import_shards(svn_url, local_revid):
+						self.delete_lock()
+						return 1
+				elif not self.dump_file and not self.svn_bootstrap(svn_url, local_revid):
+					self.delete_lock()
+					return 1
 				
-				# get the 1.2 log message
-				log = self.svn_client.log(
-					svn_url,
-					revision_start=pysvn.Revision(pysvn.opt_revision_kind.number, local_revid),
-					revision_end=pysvn.Revision(pysvn.opt_revision_kind.number, local_revid),
-					discover_changed_paths=False
-				)
+				self.revmap.sync()
+				self.journal.record(local_revid, "done")
+				self.journal.sync()
+			
+			self.lead(local_revid)
+			
+			if self.dump_file:
+				# the dump is read until it runs out. Its files are the way svn
+				# keeps them, --verify has to know
+				open(self.dump_marker, "a").close()
+				svn_revid = None
+			else:
+				svn_info  = self.svn_client.info2(svn_url, recurse=False)
+				svn_revid = svn_info[0][1].rev.number
 				
-				if (len(log)):
-					# commit!
-					self.git_commit(log[0]["message"], local_revid, log[0]["author"], log[0]["date"])
-				else:
-					self.logln("Error getting log info for rev %s" % local_revid)
+				if local_revid >= svn_revid:
+					self.logln("You're up-to-date at revision %s" % local_revid)
 					self.delete_lock()
-					return 1
+					return 0
+			
+			# with --watch the caches stay open from one sync to the next
+			if not self.dump_file and self.meta_cache == None:
+				self.meta_cache = MetaCache(self.meta_cache_path, svn_url)
+			if not self.dump_file and self.blob_cache == None:
+				self.blob_cache = BlobCache(self.blob_cache_path, self.blob_cache_size * 1024 * 1024)
+			
+			if self.use_fast_import:
+				fast_import = FastImport(self)
+				fast_import.start()
+				self.fast_import = fast_import
+				# nothing fast-import does is safe until it's checkpointed
+				self.journal.hold = True
 			
-			svn_info  = self.svn_client.info2(svn_url, recurse=False)
-			svn_revid = svn_info[0][1].rev.number
+			if os.path.isdir(self.spool_path):
+				shutil.rmtree(self.spool_path)
 			
-			if local_revid >= svn_revid:
-				self.logln("You're up-to-date at revision %s" % local_revid)
-				self.delete_lock()
-				return 0
+			# once --plan has put the whole log in the cache the time left is
+			# worked out from what every revision will cost, not just how many
+			self.plan_revids = None
+			if self.meta_cache and self.meta_cache.cached_to(local_revid + 1) >= svn_revid:
+				self.plan_weights(local_revid, svn_revid)
 			
-			while local_revid < svn_revid:
+			lap_time = time.time()
+			num_revs = 0
+			for revision in self.prefetch_revisions(local_revid, svn_revid):
+				local_revid = revision.number
+				how_much_longer = self.how_long(start_revid, local_revid, svn_revid)
+				if how_much_longer:
+					self.logln("\n-- Rev %s ---------------------------------- (%s)" % (local_revid, how_much_longer))
+				else:
+					self.logln("\n-- Rev %s ----------------------------------" % local_revid)
+				self.log("".join(revision.output))
 				
-				local_revid += 1
-				to_revid = local_revid + 100
-				if to_revid > svn_revid:
-					to_revid = svn_revid
+				self.apply_revision(revision, branches_touched, branches_deleted, tags_touched, tags_deleted)
 				
-				self.logln("\nFetching svn log history from rev %s to %s" % (local_revid, to_revid))
-				log = self.svn_client.log(
-					svn_url,
-					revision_start=pysvn.Revision(pysvn.opt_revision_kind.number, local_revid),
-					revision_end=pysvn.Revision(pysvn.opt_revision_kind.number, to_revid),
-					discover_changed_paths=True
-				)
+				if self.check_refs:
+					self.git_verify_refs()
 				
-				for rev in log:
-					local_revid = rev["revision"].number
-					rev_start_time = time.time()
-					how_much_longer = self.how_long(start_revid, local_revid, svn_revid)
-					if how_much_longer:
-						self.logln("\n-- Rev %s ---------------------------------- (%s)" % (local_revid, how_much_longer))
-					else:
-						self.logln("\n-- Rev %s ----------------------------------" % local_revid)
-					self.logln("{0} changed path{1}".format(len(rev["changed_paths"]), "s" if len(rev["changed_paths"]) != 1 else ""))
-					
-					tag = False
-					files = {}
-					dirs = []
-					file_count = 0
-					force_rev_update_on_master = False
-					
-					# sort each changed file based on the branch
-					for changed_path in rev["changed_paths"]:
-						self.log(" %s %s" % (changed_path.action, changed_path.path))
-						
-						parts = changed_path.path.strip("/").split("/")
-						project_dir = parts.pop(0).lower()
-						
-						# check if this is a project we care about
-						if project_dir not in ("branches", "tags", "dojo", "dijit", "dojox", "util", "demos"):
-							self.logln("""... "%s" is not a project we care about, skipping """ % project_dir)
-							continue
-						
-						# this means this changed_path was the start of a new project folder, so skip it
-						if len(parts) < 1:
-							self.logln("... path not deep enough, skipping")
-							continue
-						
-						ver_dir = parts.pop(0)
-						file_path = "/".join(parts)
-						
-						if project_dir == "tags":
-							if changed_path.action == "A":
-								# tag this commit
-								tag = ver_dir
-								self.logln()
-							elif changed_path.action == "D":
-								if self.git_tag_exists(tag):
-									self.logln("... deleting tag");
-									self.git_delete_tag(ver_dir)
-								else:
-									self.logln("... tag does not exist");
-							else:
-								self.logln("... tags with a %s action are not supported" % changed_path.action)
-							continue
-						
-						if not len(file_path):
-							if changed_path.action == "D":
-								if project_dir == "branches":
-									if self.git_branch_exists(ver_dir):
-										self.logln("... deleting branch")
-										branches_deleted.append(ver_dir)
-										self.git_delete_branch(ver_dir)
-									else:
-										self.logln("... branch does not exist")
-								else:
-									self.logln("... deleting of projects not supported")
-							else:
-								self.logln("... path not deep enough, skipping")
-							continue
-						
-						if changed_path.action == "D":
-							# if we're deleting something, don't bother to get the info, just add it to be deleted
-							branch = ver_dir if project_dir == "branches" else "master"
-							if not branch in files:
-								files[branch] = {}
-							url = svn_url + changed_path.path
-							if not url in files[branch]:
-								files[branch][url] = { "project_dir":"" if project_dir == "branches" else project_dir, "action":changed_path.action, "file_path":file_path }
-							self.logln()
-						else:
-							# detect if we're creating a new branch
-							if project_dir == "branches" and (not self.git_branch_exists(ver_dir) or last_run_new_branch):
-								branch = ver_dir
-								if not branch in files:
-									files[branch] = {}
-								url = svn_url + changed_path.path
-								if not url in files[branch]:
-									files[branch][url] = { "project_dir":"", "action":changed_path.action, "file_path":"" }
-								self.logln("""... detected new branch "%s" """ % branch)
-								last_run_new_branch = True
-								continue
-							else:
-								last_run_new_branch = False
-							
-							# get info for all files for this path
-							rev_info = self.svn_client.info2(svn_url + changed_path.path.replace(" ", "%20"), recurse=True, revision=pysvn.Revision(pysvn.opt_revision_kind.number, local_revid))
-							
-							if len(rev_info) == 1:
-								# if only one file, then add it
-								if rev_info[0][1].kind == pysvn.node_kind.file:
-									branch = ver_dir if project_dir == "branches" else "master"
-									if not branch in files:
-										files[branch] = {}
-									url = svn_url + changed_path.path.replace(" ", "%20")
-									if not url in files[branch]:
-										files[branch][url] = { "project_dir":"" if project_dir == "branches" else project_dir, "action":changed_path.action, "file_path":file_path }
-								elif rev_info[0][1].kind == pysvn.node_kind.dir:
-									dirs.append({ "branch":branch, "project_dir":"" if project_dir == "branches" else project_dir, "file_path":file_path })
-								self.logln()
-							else:
-								# if more than one file for this path, loop and add each
-								self.logln("... directory with {0} file{1}".format(len(rev_info), "s" if len(rev_info) != 1 else ""))
-								first = True
-								for rev_file in rev_info:
-									if not first:
-										self.logln("   > %s [%s]" % (rev_file[0], rev_file[1].kind))
-										if rev_file[1].kind == pysvn.node_kind.file:
-											branch = ver_dir if project_dir == "branches" else "master"
-											if not branch in files:
-												files[branch] = {}
-											url = rev_file[1].URL
-											if not url in files[branch]:
-												files[branch][url] = { "project_dir":"" if project_dir == "branches" else project_dir, "action":changed_path.action, "file_path":file_path + "/" + rev_file[0] }
-										elif rev_info[0][1].kind == pysvn.node_kind.dir:
-											dirs.append({ "branch":branch, "project_dir":"" if project_dir == "branches" else project_dir, "file_path":file_path + "/" + rev_file[0] })
-									first = False
-					
-					for branch in files:
-						self.logln("On branch %s" % branch)
-						for url in files[branch]:
-							entry = files[branch][url]
-							# print " %s %s -> %s" % (entry["action"], url, os.path.join(self.repo_path, entry["project_dir"], entry["file_path"]))
-							
-							if self.git_current_branch() != branch:
-								if not self.git_branch_exists(branch):
-									self.git_create_branch(branch)
-								self.git_checkout(branch)
-								if branch != "master":
-									force_rev_update_on_master = True
-								if branch not in branches_touched:
-									branches_touched.append(branch)
-							
-							if entry["file_path"] == "":
-								# nothing to do
-								continue
-							
-							if entry["action"] == "A" or entry["action"] == "M":
-								# export the file from svn
-								dest = os.path.join(self.repo_path, entry["project_dir"], entry["file_path"])
-								dest_dir = os.path.dirname(dest)
-								if not os.path.isdir(dest_dir):
-									os.makedirs(dest_dir)
-								# print "Exporting %s to %s" % (url, dest)
-								self.svn_client.export(url.replace(" ", "%20"), dest, recurse=False, ignore_externals=True, revision=pysvn.Revision(pysvn.opt_revision_kind.number, local_revid))
-								self.git_add(os.path.join(entry["project_dir"], entry["file_path"]))
-							
-							elif entry["action"] == "D":
-								# delete the file
-								self.git_rm(os.path.join(entry["project_dir"], entry["file_path"]))
-						
-						# check if any of the directories we encountered are empty
-						for directory in dirs:
-							if directory["branch"] == branch:
-								full_dir = os.path.join(self.repo_path, directory['project_dir'], directory['file_path'])
-								if not os.path.isdir(full_dir):
-									os.makedirs(full_dir)
-								self.process_svn_dir(full_dir, False, True)
-						
-						# need to run git status
-						modified_files = self.git_status()
-						file_count += len(modified_files)
-						
-						if len(modified_files) > 0:
-							# git commit!
-							self.git_commit(rev["message"], local_revid, rev["author"], rev["date"])
-						else:
-							print "No changes detected"
-					
-					# make sure we're back on master
-					if self.git_current_branch() != "master":
-						self.git_checkout("master")
-					
-					# if this rev is a tag, then tag it!
-					if tag and not self.git_tag_exists(tag):
-						self.git_create_tag(tag)
-						tags_touched.append(tag)
-					
-					if file_count == 0 or (force_rev_update_on_master and "master" not in files):
-						self.git_commit("Updating svn sync rev", local_revid, None, rev["date"])
-					
-					rev_total_time = time.time() - rev_start_time
-					self.lap(rev_total_time)
+				# with prefetching the revisions overlap, so time them end to end
+				self.lap(time.time() - lap_time, self.plan_weight(local_revid))
+				self.metrics.finish_revision(revision, time.time() - lap_time)
+				lap_time = time.time()
+				
+				num_revs += 1
+				if self.fast_import and num_revs % 100 == 0:
+					self.git_checkpoint()
+				if self.push_every > 0 and self.is_pushing() and num_revs % self.push_every == 0:
+					self.push_checkpoint(branches_touched, branches_deleted, tags_touched, tags_deleted)
+				if self.maintain_every > 0 and self.objects_written >= self.maintain_every:
+					self.maintain()
+			
+			shutil.rmtree(self.spool_path, True)
+			
+			self.revmap.close()
+			
+			if self.meta_cache:
+				self.logln("\nMetadata cache: %s hits, %s svn requests" % (self.meta_cache.hits, self.meta_cache.misses))
+				if not self.warm:
+					self.meta_cache.close()
+					self.meta_cache = None
+			
+			if self.blob_cache:
+				self.logln("Blob cache: %s hits from git, %s from disk, %s exported" % (self.blob_cache.git_hits, self.blob_cache.file_hits, self.blob_cache.misses))
+				if not self.warm:
+					self.blob_cache.close()
+					self.blob_cache = None
+			
+			if self.fast_import:
+				self.fast_import.close()
+				self.fast_import = None
+				self.run("git reset --hard -q")
+			self.journal.close()
+			
+			self.wait_for_maintenance()
+			
+			if os.path.isdir(self.shard_path):
+				self.finish_shards()
 			
 			self.logln("\nRepo is now synced to rev %s" % local_revid)
 			
-			if self.num_commits > 0 and self.remote_repo_username != "":
+			# tags and deleted branches need pushing without a commit
+			changed = self.num_commits > 0 or len(branches_touched + branches_deleted + tags_touched + tags_deleted) > 0
+			
+			if changed and self.is_pushing():
 				self.logln("\nPushing changes to remote repository")
-				if new_repo:
-					self.git_remote_add(self.remote_repo_username)
-				self.git_push("master")
-				
-				for branch in branches_touched:
-					if branch and branch != 'master':
-						self.git_push(branch)
-				
-				if self.git_current_branch() != "master":
-					self.git_checkout("master")
-				
-				for branch in branches_deleted:
-					if branch and branch != 'master':
-						self.git_push_deleted_branch(branch)
-				
-				if len(tags_touched):
-					self.git_push_tags()
+				self.wait_for_push()
+				self.git_remote_add()
+				refspecs = self.git_push_refspecs(branches_touched, branches_deleted, tags_touched, tags_deleted)
+				self.logln("Pushing {0} ref{1}".format(len(refspecs), "s" if len(refspecs) != 1 else ""))
+				self.git_push(refspecs)
+			
+			if self.metrics.path != None:
+				self.log_metrics()
+			if not self.warm:
+				self.metrics.close()
 			
 			total_time = time.time() - start_time
 			total_hours = int(floor(total_time / 3600))
@@ -402,7 +622,7 @@ class Repo(object):
 			else:
 				self.logln("\nCompleted in %s hours, %s minutes, %s seconds" % (total_hours, total_minutes, total_seconds))
 			
-			if self.num_commits > 0 and self.remote_repo_username == "":
+			if changed and not self.is_pushing():
 				self.logln("\nNext steps:")
 				if new_repo:
 					self.logln("  git remote add origin git@github.com:<YOUR ACCOUNT>/%s.git" % self.repo_name)
@@ -424,16 +644,1515 @@ class Repo(object):
 				if len(tags_touched):
 					self.logln("  git push --tags")
 		except Exception:
+			if self.push_thread != None:
+				self.push_thread.join()
+				self.push_thread = None
+			if self.maintain_thread != None:
+				self.maintain_thread.join()
+				self.maintain_thread = None
+			if self.fast_import:
+				self.fast_import.abort()
+				self.fast_import = None
+			self.journal.close()
+			self.revmap.close()
+			if self.meta_cache:
+				# whatever made it in is still good
+				self.meta_cache.close()
+				self.meta_cache = None
+			if self.blob_cache:
+				self.blob_cache.close()
+				self.blob_cache = None
+			if not self.warm:
+				self.metrics.close()
 			self.delete_lock()
 			raise
 		
 		self.delete_lock()
 		return 0
 	
+	def watch(self, min_interval=5, max_interval=300, status_path=None):
+		# keeps syncing new revisions as they land, with svn, git and the
+		# caches kept warm in between. While nothing happens svn is asked for
+		# its HEAD revision a little less often each time, a new revision
+		# brings the interval straight back down
+		self.warm = True
+		interval = min_interval
+		status = { "pid":os.getpid(), "state":"starting", "svn_url":self.svn_url, "synced_rev":None, "svn_head":None, "last_poll":None, "last_sync":None, "last_error":None, "syncs":0 }
+		self.logln("\nWatching %s, polling every %s to %s seconds" % (self.svn_url, min_interval, max_interval))
+		
+		try:
+			while True:
+				status["last_poll"] = int(time.time())
+				try:
+					svn_revid = self.svn_client.info2(self.svn_url, recurse=False)[0][1].rev.number
+					status["svn_head"] = svn_revid
+					if status["synced_rev"] == None or svn_revid > status["synced_rev"]:
+						status["state"] = "syncing"
+						self.write_status(status_path, status, interval)
+						if self.go() != 0:
+							raise RuntimeError("Sync failed, see the output above")
+						status["synced_rev"] = self.synced_rev()
+						status["last_sync"] = int(time.time())
+						status["syncs"] += 1
+						interval = min_interval
+					else:
+						interval = min(interval * 2, max_interval)
+						if self.maintain_every > 0 and self.objects_written > 0:
+							# nothing else to do, so there's no need to wait for the threshold
+							self.maintain()
+							self.wait_for_maintenance()
+					status["state"] = "idle"
+					status["last_error"] = None
+				except Exception as e:
+					# svn or the network being down shouldn't kill the watch
+					self.logln("\nSync failed: %s" % e)
+					status["state"] = "error"
+					status["last_error"] = str(e)
+					interval = max_interval
+				self.write_status(status_path, status, interval)
+				time.sleep(interval)
+		except KeyboardInterrupt:
+			self.logln("\nStopped watching")
+		finally:
+			self.warm = False
+			if self.meta_cache:
+				self.meta_cache.close()
+				self.meta_cache = None
+			if self.blob_cache:
+				self.blob_cache.close()
+				self.blob_cache = None
+			self.metrics.close()
+			status["state"] = "stopped"
+			self.write_status(status_path, status, None)
+		return 0
+	
+	def write_status(self, path, status, interval):
+		# replaced in one go so readers never see half a file
+		if path == None:
+			return
+		status["interval"] = interval
+		status["next_poll"] = int(time.time() + interval) if interval != None else None
+		tmp_path = path + ".tmp"
+		file = open(tmp_path, "w")
+		file.write(json.dumps(status, sort_keys=True) + "\n")
+		file.close()
+		os.rename(tmp_path, path)
+	
+	def synced_rev(self):
+		# the last revision the sync got all the way through, repos from
+		# before the journal only have the .svnrev file of their last commit.
+		# Only read, a sync may be appending to the journal meanwhile
+		if not self.journal.loaded:
+			self.journal.load(False)
+		if self.journal.last_done() != None:
+			return self.journal.last_done()
+		return self.read_svnrev()
+	
+	def read_svnrev(self):
+		# the revision of the last commit on the branch that's checked out,
+		# later revisions may not have needed a commit
+		svnrev_file = os.path.join(self.repo_path, ".svnrev")
+		if not os.path.isfile(svnrev_file):
+			return None
+		file = open(svnrev_file)
+		rev = file.readline().strip()
+		file.close()
+		return int(rev) if rev.isdigit() else None
+	
+	def verify(self, start_revid=None, end_revid=None, sample=0, output_path=None):
+		# compares what the commits for the revisions in range hold against
+		# the files svn had at those revisions, by md5. svn is read on
+		# --export-workers threads while git is read here, a batch at a time
+		start_time = time.time()
+		synced_rev = self.synced_rev() if os.path.isdir(self.repo_path) else None
+		if synced_rev == None:
+			self.logln("""\nRepo path "%s" is missing the journal and the .svnrev file!""" % self.repo_path)
+			return 1
+		
+		self.git_load_refs()
+		# only read, the repo may be being synced meanwhile
+		self.revmap.load(False)
+		if not self.revmap.exists() or self.revmap.last_rev() < self.read_svnrev():
+			self.git_rebuild_revmap(False)
+		# the commit that made the repo has no svn revision
+		records = [(revid, branch, sha.encode("hex")) for (revid, branch, sha) in self.revmap.records
+			if revid > 0 and sha != RevMap.null and (start_revid == None or revid >= start_revid) and (end_revid == None or revid <= end_revid)]
+		# a new branch is mapped where it forked before the revision that
+		# made it is committed on top, only the last commit is what svn had
+		records = [record for (i, record) in enumerate(records) if i + 1 == len(records) or records[i + 1][:2] != record[:2]]
+		total = len(records)
+		if sample > 0 and total > sample:
+			# spread out evenly, the first and last commit are always in
+			records = [records[i * (total - 1) // max(1, sample - 1)] for i in xrange(sample)] if sample > 1 else records[-1:]
+		if not len(records):
+			self.logln("\nNo commits to verify")
+			return 0
+		self.logln("\nVerifying %s of %s commits from rev %s to %s" % (len(records), total, records[0][0], records[-1][0]))
+		
+		if os.path.isdir(self.blob_cache_path):
+			self.blob_cache = BlobCache(self.blob_cache_path, self.blob_cache_size * 1024 * 1024)
+		output = None
+		if output_path != None:
+			output = sys.stdout if output_path == "-" else open(output_path, "w")
+		num_workers = self.export_pool.num_workers
+		pool = ThreadPool(num_workers)
+		self.verify_clients = threading.local()
+		self.verify_normal = os.path.isfile(self.dump_marker)
+		self.verify_md5s = {}
+		self.verify_reads = 0
+		md5s = {}
+		num_files = 0
+		mismatches = 0
+		try:
+			for i in xrange(0, len(records), num_workers * 2):
+				batch = records[i:i + num_workers * 2]
+				svn_trees = pool.map_async(self.svn_verify_tree, batch)
+				git_trees = [self.git_verify_tree(commit) for (revid, branch, commit) in batch]
+				for ((revid, branch, commit), (svn_files, prefixes, normal), git_files) in zip(batch, svn_trees.get(), git_trees):
+					num_files += len(svn_files)
+					for (path, problem, checksum, sha) in self.verify_files(svn_files, prefixes, git_files, md5s, normal):
+						mismatches += 1
+						self.logln(" ! %s %s %s: %s" % (revid, branch, path, problem))
+						if output != None:
+							output.write(json.dumps({ "revision":revid, "branch":branch, "commit":commit, "path":path, "problem":problem, "svn_md5":checksum, "git_sha":sha }, sort_keys=True) + "\n")
+		finally:
+			pool.terminate()
+			if output != None and output != sys.stdout:
+				output.close()
+			if self.blob_cache:
+				self.blob_cache.close()
+				self.blob_cache = None
+		
+		self.logln("\nVerified %s commits with %s files in %s seconds, %s read from svn, %s mismatch%s" % (len(records), num_files, int(round(time.time() - start_time)), self.verify_reads, mismatches, "es" if mismatches != 1 else ""))
+		return 1 if mismatches else 0
+	
+	def svn_verify_tree(self, record):
+		# {path:md5} of the files svn had for the commit and the projects
+		# they're under. A branch only has the projects that were copied to
+		# it, the rest is left over from master and isn't compared. info2
+		# has no checksums for URLs, a file is read unless it's been seen at
+		# the revision it last changed in, by this run or the blob cache.
+		# Files from a dump can be the way svn keeps them instead, {path:md5}
+		# of that for the ones with keywords or an eol style comes last
+		(revid, branch, commit) = record
+		client = getattr(self.verify_clients, "client", None)
+		if client == None:
+			client = self.verify_clients.client = pysvn.Client()
+		files = {}
+		normal = {}
+		prefixes = []
+		for project in self.projects if branch == "master" else self.all_projects:
+			path = "/%s/trunk" % project if branch == "master" else "/branches/%s/%s" % (branch, project)
+			if not self.path_filter.reaches(path):
+				continue
+			try:
+				rev_info = client.info2(self.svn_url + path.replace(" ", "%20"), recurse=True, revision=pysvn.Revision(pysvn.opt_revision_kind.number, revid))
+			except pysvn.ClientError:
+				if branch != "master":
+					continue
+				rev_info = []
+			prefixes.append(project + "/")
+			translated = self.svn_translated(client, path, revid) if self.verify_normal and len(rev_info) else {}
+			for (name, info) in rev_info[1:]:
+				if info.kind == pysvn.node_kind.file:
+					name = name.encode("utf-8") if isinstance(name, unicode) else name
+					if self.path_filter.allows(path + "/" + name):
+						files[project + "/" + name] = self.svn_md5(client, path + "/" + name, info.last_changed_rev.number, revid)
+						if name in translated:
+							normal[project + "/" + name] = self.svn_normal_md5(client, path + "/" + name, info.last_changed_rev.number, revid, translated[name])
+		return (files, prefixes, normal)
+	
+	def svn_translated(self, client, path, revid):
+		# {name: (keywords, eol style)} of the files under path that cat
+		# doesn't give back the way svn keeps them
+		url = self.svn_url + path.replace(" ", "%20")
+		revision = pysvn.Revision(pysvn.opt_revision_kind.number, revid)
+		translated = {}
+		for (index, prop) in ((0, "svn:keywords"), (1, "svn:eol-style")):
+			for (prop_url, value) in client.propget(prop, url, recurse=True, revision=revision).items():
+				name = prop_url.replace("%20", " ")[len(url):].strip("/")
+				name = name.encode("utf-8") if isinstance(name, unicode) else name
+				entry = translated.setdefault(name, [None, None])
+				entry[index] = value
+		return translated
+	
+	def svn_normal_md5(self, client, path, changed, revid, translated):
+		(keywords, eol) = translated
+		key = (path, changed, "normal")
+		if key in self.verify_md5s:
+			return self.verify_md5s[key]
+		content = client.cat(self.svn_url + path.replace(" ", "%20"), revision=pysvn.Revision(pysvn.opt_revision_kind.number, revid))
+		self.verify_reads += 1
+		md5 = hashlib.md5(self.svn_normal_form(content, keywords, eol)).hexdigest()
+		self.verify_md5s[key] = md5
+		return md5
+	
+	keyword_names = (("LastChangedDate", "Date"), ("LastChangedRevision", "Revision", "Rev"), ("LastChangedBy", "Author"), ("HeadURL", "URL"), ("Id",), ("Header",))
+	
+	def svn_normal_form(self, content, keywords, eol):
+		# undoes what cat did to a file: keywords are collapsed again, the
+		# fixed width ones padded out to their width, and the line endings
+		# of an eol style go back to the \n svn keeps
+		if keywords:
+			listed = set(re.split(r"[\s,]+", keywords.lower()))
+			names = []
+			for group in self.keyword_names:
+				if [name for name in group if name.lower() in listed]:
+					names += group
+			if len(names):
+				def collapse(match):
+					if match.group(2) == "::":
+						return "$%s::%s$" % (match.group(1), " " * (len(match.group(0)) - len(match.group(1)) - 4))
+					return "$%s$" % match.group(1)
+				content = re.sub(r"\$(%s)(::?) [^$\n]*\$" % "|".join(names), collapse, content)
+		if eol:
+			content = content.replace("\r\n", "\n").replace("\r", "\n")
+		return content
+	
+	def svn_md5(self, client, path, changed, revid):
+		key = (path, changed)
+		if key in self.verify_md5s:
+			return self.verify_md5s[key]
+		md5 = self.blob_cache.checksum(path, changed) if self.blob_cache else None
+		if md5 == None:
+			# cat expands keywords the same way the export did
+			md5 = hashlib.md5(client.cat(self.svn_url + path.replace(" ", "%20"), revision=pysvn.Revision(pysvn.opt_revision_kind.number, revid))).hexdigest()
+			self.verify_reads += 1
+		self.verify_md5s[key] = md5
+		return md5
+	
+	def git_verify_tree(self, commit):
+		# {path:(mode, sha)} of the files in the projects of a commit
+		files = {}
+		for project in self.all_projects:
+			for (mode, kind, sha, path) in self.git_ls_tree(commit, project, True):
+				if kind == "blob":
+					files[path] = (mode, sha)
+		return files
+	
+	def verify_files(self, svn_files, prefixes, git_files, md5s, normal):
+		# (path, problem, svn md5, git sha) for every file that's off. A blob
+		# the blob cache has seen exported with the svn md5 matches as is,
+		# the rest are hashed like svn does and remembered. A file from a
+		# dump may match the way svn keeps it instead
+		problems = []
+		unknown = set()
+		for (path, checksum) in svn_files.items():
+			if path not in git_files:
+				problems.append((path, "missing in git", checksum, None))
+			elif self.blob_cache == None or self.blob_cache.sha(checksum) != git_files[path][1]:
+				if git_files[path][1] not in md5s:
+					unknown.add(git_files[path][1])
+		if len(unknown):
+			links = set([sha for (mode, sha) in git_files.values() if mode == "120000"])
+			md5s.update(self.git_blob_md5s(list(unknown), links))
+		for (path, checksum) in svn_files.items():
+			if path in git_files and git_files[path][1] in md5s and md5s[git_files[path][1]] not in (checksum, normal.get(path)):
+				problems.append((path, "content differs", checksum, git_files[path][1]))
+		for (path, (mode, sha)) in git_files.items():
+			# the .gitignore files stand in for svn:ignore and empty directories
+			if path not in svn_files and os.path.basename(path) != ".gitignore" and [prefix for prefix in prefixes if path.startswith(prefix)]:
+				problems.append((path, "missing in svn", None, sha))
+		problems.sort()
+		return problems
+	
+	def plan(self, start_revid=None, end_revid=None):
+		# prints what syncing the range would do, worked out from nothing
+		# but the svn log. The repo is only read, the log is kept in the
+		# meta cache for the sync to use afterwards
+		start_time = time.time()
+		synced_rev = self.synced_rev() if os.path.isdir(self.repo_path) else None
+		if synced_rev != None:
+			self.git_load_refs()
+			# copies out of git are sized from the commits the map points at
+			self.revmap.load(False)
+			local_revid = synced_rev
+			self.first_revid = self.start_revid
+		else:
+			# what a new repo would have after the 1.2 snapshot
+			self.branches = set(["master"])
+			self.tags = set()
+			local_revid = self.start_revid
+		if start_revid != None:
+			local_revid = start_revid - 1
+		if end_revid == None:
+			end_revid = self.svn_client.info2(self.svn_url, recurse=False)[0][1].rev.number
+		if local_revid >= end_revid:
+			self.logln("\nNothing to plan, the repo is at rev %s" % local_revid)
+			return 0
+		
+		if os.path.isdir(os.path.dirname(os.path.abspath(self.meta_cache_path))):
+			self.meta_cache = MetaCache(self.meta_cache_path, self.svn_url)
+		average_size = None
+		if os.path.isfile(os.path.join(self.blob_cache_path, "index.db")):
+			blob_cache = BlobCache(self.blob_cache_path, self.blob_cache_size * 1024 * 1024)
+			average_size = blob_cache.average_size()
+			blob_cache.close()
+		
+		self.logln("\nPlan for rev {0} to {1}, starting from {2} branch{3} and {4} tag{5}".format(local_revid + 1, end_revid, len(self.branches), "es" if len(self.branches) != 1 else "", len(self.tags), "s" if len(self.tags) != 1 else ""))
+		totals = { "revisions":0, "weight":0.0, "exports":0, "copied":0, "unsized":0, "branches_created":0, "branches_deleted":0, "tags_created":0, "tags_deleted":0, "files":{} }
+		try:
+			state = PlanState(self.branches, self.tags)
+			for rev in self.svn_log(local_revid, end_revid):
+				plan = self.plan_revision(rev, state)
+				self.logln("  %s  %s" % (plan["revision"], "; ".join(self.describe_plan(plan)) or "nothing to do"))
+				totals["revisions"] += 1
+				totals["weight"] += plan["weight"]
+				totals["exports"] += plan["exports"]
+				totals["copied"] += plan["copied"]
+				totals["unsized"] += plan["unsized"]
+				totals["branches_created"] += len(plan["branches_created"])
+				totals["branches_deleted"] += len(plan["branches_deleted"])
+				totals["tags_created"] += len(plan["tags_created"])
+				totals["tags_deleted"] += len(plan["tags_deleted"])
+				for (branch, counts) in plan["files"].items():
+					for (action, count) in counts.items():
+						branch_counts = totals["files"].setdefault(branch, {})
+						branch_counts[action] = branch_counts.get(action, 0) + count
+		finally:
+			if self.meta_cache:
+				self.meta_cache.close()
+				self.meta_cache = None
+		
+		self.logln("\nTotals:")
+		self.logln("  {0} revision{1}, {2} branch{3} created, {4} deleted, {5} tag{6} created, {7} deleted".format(totals["revisions"], "s" if totals["revisions"] != 1 else "",
+			totals["branches_created"], "es" if totals["branches_created"] != 1 else "", totals["branches_deleted"], totals["tags_created"], "s" if totals["tags_created"] != 1 else "", totals["tags_deleted"]))
+		for branch in sorted(totals["files"]):
+			self.logln("  %s: %s" % (branch, self.describe_counts(totals["files"][branch])))
+		volume = " (about %.1f MB at the blob cache's average file size)" % (totals["exports"] * average_size / 1048576.0) if average_size != None else ""
+		self.logln("  {0} file{1} to export{2}, {3} file{4} copied in git".format(totals["exports"], "s" if totals["exports"] != 1 else "", volume, totals["copied"], "s" if totals["copied"] != 1 else ""))
+		if totals["unsized"]:
+			self.logln("  {0} of the changed paths {1} counted as one file, a directory among them has more".format(totals["unsized"], "are" if totals["unsized"] != 1 else "is"))
+		self.logln("  cost %.0f, planned in %s seconds" % (totals["weight"], int(round(time.time() - start_time))))
+		return 0
+	
+	def plan_revision(self, rev, state, git=True):
+		# what applying rev will do, from its changed paths alone. Anything
+		# classify_path hands back is a file or directory that gets added or
+		# changed, it's exported unless it's a copy of something in git
+		revision = Revision(rev["revision"].number, rev["message"], rev["author"], rev["date"])
+		branches_before = set(state.branches)
+		plan = { "revision":revision.number, "branches_created":[], "branches_deleted":revision.deleted_branches, "tags_created":[], "tags_deleted":revision.deleted_tags, "files":{}, "exports":0, "copied":0, "unsized":0 }
+		targets = []
+		for changed_path in rev["changed_paths"]:
+			copyfrom = None
+			if changed_path.copyfrom_path != None:
+				copyfrom = (changed_path.copyfrom_path, changed_path.copyfrom_revision.number)
+			target = self.classify_path(revision, state, changed_path.action, changed_path.path, copyfrom)
+			if target == None:
+				continue
+			source = self.map_svn_path(copyfrom[0]) if copyfrom != None and copyfrom[1] >= self.first_revid else None
+			copy = (source[0], copyfrom[1], source[1]) if source != None and self.is_planned_ref(source[0], state) else None
+			targets.append((changed_path.path, changed_path.action, target[0], copy))
+		# copies into a branch that's new in this revision are left to
+		# apply_revision by classify_path, they're files all the same
+		for (branch, copies) in revision.copies.items():
+			for (path, ref, revid, source_path) in copies:
+				targets.append(("/branches/%s/%s" % (branch, path), "A", branch, (ref, revid, source_path)))
+		
+		# a directory brings all of its files along, so what's under one we
+		# know the size of is already counted. One we don't know the size of
+		# counts as a file, unless its files are changed paths of their own
+		sizes = dict([(path, self.plan_size(revision.number, path, copy, git)) for (path, action, branch, copy) in targets])
+		sized = set([path for (path, action, branch, copy) in targets if action in ("A", "R") and sizes[path] != None])
+		paths = sorted(sizes)
+		for (path, action, branch, copy) in targets:
+			parent = os.path.dirname(path)
+			while parent not in sized and parent not in ("/", ""):
+				parent = os.path.dirname(parent)
+			if parent in sized:
+				continue
+			size = sizes[path]
+			if size == None:
+				i = bisect.bisect_left(paths, path + "/")
+				if i < len(paths) and paths[i].startswith(path + "/"):
+					continue
+				size = 1
+				plan["unsized"] += 1
+			counts = plan["files"].setdefault(branch, {})
+			counts[action] = counts.get(action, 0) + size
+			plan["copied" if copy != None else "exports"] += size
+		for (branch, changes) in revision.files.items():
+			for change in changes:
+				if change.action == "D":
+					counts = plan["files"].setdefault(branch, {})
+					counts["D"] = counts.get("D", 0) + 1
+		
+		for branch in sorted(set(revision.files.keys() + revision.branch_sources.keys()) - branches_before):
+			plan["branches_created"].append((branch, revision.branch_sources.get(branch)))
+		if revision.tag:
+			plan["tags_created"].append((revision.tag, revision.tag_source))
+		state.update(revision)
+		
+		# a revision costs about as much as one exported file to begin with,
+		# a file that's already in git a tenth of that
+		plan["weight"] = 1.0 + plan["exports"] + plan["copied"] * 0.1 + sum([counts.get("D", 0) for counts in plan["files"].values()]) * 0.1
+		return plan
+	
+	def plan_size(self, revid, path, copy=None, git=True):
+		# how many files a changed path brings along: what info2 listed if
+		# the meta cache has it, or what git has of the (ref, revid, path)
+		# it's copied from. None if we can't tell without asking svn
+		if self.meta_cache:
+			size = self.meta_cache.count_files(path, revid)
+			if size != None:
+				return size
+		if copy == None or not git:
+			return None
+		(ref, from_revid, source_path) = copy
+		commit = self.revmap.lookup(ref[11:], from_revid) if ref.startswith("refs/heads/") else None
+		if commit == None:
+			return None
+		# copies of the same trunk at the same rev are common, ls-tree it once
+		if (commit, source_path) not in self.plan_sizes:
+			self.plan_sizes[(commit, source_path)] = max(1, len(self.git_ls_tree(commit, source_path, True)))
+		return self.plan_sizes[(commit, source_path)]
+	
+	def plan_weights(self, local_revid, svn_revid):
+		# the running total of the cost of every revision to come. It's only
+		# for the ETA, so copies aren't sized with git before the sync starts
+		state = PlanState(self.branches, self.tags)
+		self.plan_revids = []
+		self.plan_totals = []
+		total = 0.0
+		for rev in self.meta_cache.get_log(local_revid + 1, svn_revid):
+			total += self.plan_revision(rev, state, False)["weight"]
+			self.plan_revids.append(rev["revision"].number)
+			self.plan_totals.append(total)
+		if not len(self.plan_revids):
+			self.plan_revids = None
+	
+	def plan_weight(self, revid):
+		if self.plan_revids == None:
+			return 1
+		i = bisect.bisect_left(self.plan_revids, revid)
+		if i == len(self.plan_revids) or self.plan_revids[i] != revid:
+			return 1
+		return self.plan_totals[i] - (self.plan_totals[i - 1] if i > 0 else 0.0)
+	
+	def describe_plan(self, plan):
+		actions = []
+		for (branch, source) in plan["branches_created"]:
+			actions.append("create branch %s%s" % (branch, " from %s@%s" % (source[0].split("/")[-1], source[1]) if source != None else ""))
+		for branch in plan["branches_deleted"]:
+			actions.append("delete branch %s" % branch)
+		for (tag, source) in plan["tags_created"]:
+			actions.append("tag %s%s" % (tag, " from %s@%s" % (source[0].split("/")[-1], source[1]) if source != None else ""))
+		for tag in plan["tags_deleted"]:
+			actions.append("delete tag %s" % tag)
+		for branch in sorted(plan["files"]):
+			actions.append("%s: %s" % (branch, self.describe_counts(plan["files"][branch])))
+		return actions
+	
+	def describe_counts(self, counts):
+		names = (("A", "added"), ("M", "modified"), ("R", "replaced"), ("D", "deleted"))
+		return ", ".join(["%s %s" % (counts[action], name) for (action, name) in names if counts.get(action)])
+	
+	def svn_bootstrap(self, svn_url, local_revid):
+		# export the trunks all at once, there's no need for working copies
+		borrowed = self.borrow_trunks(local_revid)
+		projects = [project for project in self.projects if project not in borrowed]
+		dir_jobs = []
+		jobs = []
+		for project in projects:
+			if self.path_filter.whole("/%s/trunk" % project):
+				dir_jobs.append((svn_url + "/%s/trunk" % project, os.path.join(self.repo_path, project)))
+			else:
+				self.bootstrap_filtered(svn_url, local_revid, project, dir_jobs, jobs)
+		if len(dir_jobs) or len(jobs):
+			self.log("\nDoing initial Dojo svn export at rev %s... " % local_revid)
+			pool = ExportPool(self, max(len(projects), self.export_pool.num_workers), self.export_pool.retries)
+			pool.export(dir_jobs, local_revid, self.svn_client, True)
+			pool.export(jobs, local_revid, self.svn_client, False)
+			self.logln("done")
+		
+		# the borrowed trunks already have their .gitignore files
+		self.log("Finding empty directories... ")
+		self.bootstrap_gitignores(svn_url, local_revid, projects)
+		self.logln("done")
+		
+		# add the files to git
+		for project in self.projects:
+			self.git_add(project)
+		
+		return self.bootstrap_commit(svn_url, local_revid)
+	
+	def bootstrap_filtered(self, svn_url, local_revid, project, dir_jobs, jobs):
+		# a trunk the filter only wants some of is listed first, and only
+		# what's wanted of it is exported: whole directories where it can be,
+		# file by file where it can't
+		trunk = "/%s/trunk" % project
+		root = os.path.join(self.repo_path, project)
+		names = []
+		for (name, info) in self.svn_client.info2(svn_url + trunk, recurse=True, revision=pysvn.Revision(pysvn.opt_revision_kind.number, local_revid))[1:]:
+			if not self.path_filter.allows(trunk + "/" + name):
+				continue
+			if info.kind == pysvn.node_kind.file:
+				names.append(name)
+			elif not os.path.isdir(os.path.join(root, name)):
+				# exported directories make their own, this is for the rest
+				os.makedirs(os.path.join(root, name))
+		for (path, files) in sorted(self.export_roots(trunk, names).items()):
+			dest = os.path.join(root, path[len(trunk) + 1:])
+			if not os.path.isdir(os.path.dirname(dest)):
+				os.makedirs(os.path.dirname(dest))
+			if files == [""]:
+				jobs.append(((svn_url + path).replace(" ", "%20"), dest))
+			else:
+				dir_jobs.append(((svn_url + path).replace(" ", "%20"), dest))
+	
+	def export_roots(self, path, names):
+		# {root: [name under root]} for the files under path, each under the
+		# highest directory the filter wants all of so it can be exported in
+		# one go. A file without one is a root of its own, with the name ""
+		roots = {}
+		whole = {}
+		for name in names:
+			parts = name.split("/")
+			for i in xrange(len(parts) + 1):
+				root = "/".join([path] + parts[:i])
+				if i == len(parts):
+					break
+				if root not in whole:
+					whole[root] = self.path_filter.whole(root)
+				if whole[root]:
+					break
+			roots.setdefault(root, []).append("/".join(parts[i:]))
+		return roots
+	
+	def borrow_trunks(self, local_revid):
+		# with --targets the trunks the first target took whole are copied
+		# out of its commit for local_revid instead of exported from svn
+		if self.fan_out == None or self.fan_out[1] == None:
+			return []
+		(progress, leader_path, leader_filter) = self.fan_out
+		self.wait_for_leader(local_revid)
+		revmap = RevMap(os.path.join(leader_path, ".git", "svn2git-revmap"))
+		# the leader is still writing to it
+		revmap.load(False)
+		commit = revmap.lookup("master", local_revid)
+		if commit == None:
+			return []
+		
+		borrowed = [project for project in self.projects if leader_filter.whole("/%s/trunk" % project)]
+		if len(borrowed):
+			self.log("""\nTaking %s from "%s"... """ % (", ".join(borrowed), leader_path))
+			# in two steps, through a pipe only a failing tar would show
+			archive = os.path.join(os.path.abspath(self.repo_path), ".git", "svn2git-trunks.tar")
+			self.run("""git --git-dir="%s" archive -o "%s" %s %s""" % (os.path.join(os.path.abspath(leader_path), ".git"), archive, commit, " ".join(['"%s"' % project for project in borrowed])))
+			self.run("""tar -x -f "%s" -C "%s" """ % (archive, os.path.abspath(self.repo_path)))
+			os.remove(archive)
+			self.logln("done")
+		return borrowed
+	
+	def bootstrap_gitignores(self, svn_url, local_revid, projects):
+		# empty directories get a .gitignore so git keeps them, with the
+		# svn:ignore of the directory in it if it has one. One recursive
+		# propget per trunk instead of a proplist per directory
+		revision = pysvn.Revision(pysvn.opt_revision_kind.number, local_revid)
+		ignores = {}
+		for project in projects:
+			trunk_url = svn_url + "/%s/trunk" % project
+			for (url, value) in self.svn_client.propget("svn:ignore", trunk_url, recurse=True, revision=revision).items():
+				path = url.replace("%20", " ")[len(trunk_url):].strip("/")
+				ignores[os.path.join(project, path).rstrip("/")] = value
+		
+		for project in projects:
+			for (path, dirnames, filenames) in os.walk(os.path.join(self.repo_path, project)):
+				if not len(dirnames) and not len(filenames):
+					self.create_gitignore(path, ignores.get(os.path.relpath(path, self.repo_path)))
+	
+	def import_shards(self, svn_url, local_revid):
+		# every project is imported into a staging repo of its own by a worker
+		# process first, which leaves the files they exported in the blob
+		# cache and in git objects this repo borrows. The revisions are then
+		# applied here in order like any other import, they just don't have
+		# to go back to svn for anything. Their commits aren't stitched
+		# together: a branch that copies some projects has the others from
+		# where it forked, which no staging repo knows
+		svn_revid = self.svn_client.info2(svn_url, recurse=False)[0][1].rev.number
+		
+		# the log is fetched once up front instead of by every worker, and
+		# the caches are set up before the workers race to create them
+		self.meta_cache = MetaCache(self.meta_cache_path, svn_url)
+		for rev in self.svn_log(local_revid, svn_revid):
+			pass
+		self.meta_cache.close()
+		self.meta_cache = None
+		BlobCache(self.blob_cache_path, self.blob_cache_size * 1024 * 1024).close()
+		
+		if not os.path.isdir(self.shard_path):
+			os.makedirs(self.shard_path)
+		options = {
+			"use_fast_import":True,
+			"export_workers":self.export_pool.num_workers,
+			"export_retries":self.export_pool.retries,
+			"prefetch":self.prefetch,
+			"log_workers":self.log_workers,
+			"meta_cache_path":os.path.abspath(self.meta_cache_path),
+			"blob_cache_path":os.path.abspath(self.blob_cache_path),
+			"blob_cache_size":self.blob_cache_size,
+			"svn_url":svn_url,
+			"start_revid":local_revid,
+			"maintain_every":self.maintain_every,
+			"includes":self.path_filter.includes,
+			"excludes":self.path_filter.excludes
+		}
+		jobs = [(options, project, os.path.join(self.shard_path, project)) for project in self.projects]
+		
+		self.logln("\nImporting %s in %s worker processes, logs are in %s" % (", ".join(self.projects), min(self.shards, len(jobs)), self.shard_path))
+		pool = multiprocessing.Pool(min(self.shards, len(jobs)))
+		try:
+			for (project, result) in pool.imap_unordered(import_shard, jobs):
+				if result != 0:
+					raise RuntimeError("""Importing "%s" failed, see %s.log""" % (project, os.path.join(self.shard_path, project)))
+				self.logln("""Finished importing "%s" """ % project)
+			pool.close()
+		except:
+			pool.terminate()
+			raise
+		finally:
+			pool.join()
+		
+		info_path = os.path.join(self.repo_path, ".git", "objects", "info")
+		if not os.path.isdir(info_path):
+			os.makedirs(info_path)
+		alternates = open(os.path.join(info_path, "alternates"), "a")
+		for project in self.projects:
+			alternates.write(os.path.abspath(os.path.join(self.shard_path, project, ".git", "objects")) + "\n")
+		alternates.close()
+		
+		# the initial checkout is put together from the trees the workers made
+		self.log("\nTaking the initial checkout from the staging repos... ")
+		for project in self.projects:
+			revmap = RevMap(os.path.join(self.shard_path, project, ".git", "svn2git-revmap"))
+			revmap.load()
+			commit = revmap.lookup("master", local_revid)
+			if commit == None:
+				self.logln("""\nStaging repo for "%s" has no commit for rev %s""" % (project, local_revid))
+				return False
+			self.run("git read-tree --prefix=%s/ %s:%s" % (project, commit, project))
+		self.run("git checkout-index -a -f")
+		self.logln("done")
+		
+		return self.bootstrap_commit(svn_url, local_revid)
+	
+	def finish_shards(self):
+		# copies the borrowed objects in so the staging repos can go
+		self.log("\nRepacking objects from the staging repos... ")
+		self.run("git repack -a -d -q")
+		alternates = os.path.join(self.repo_path, ".git", "objects", "info", "alternates")
+		if os.path.isfile(alternates):
+			os.remove(alternates)
+		shutil.rmtree(self.shard_path)
+		self.logln("done")
+	
+	def sync_targets(self, targets):
+		# syncs several repos with one fetch from svn. Every target runs in a
+		# process of its own with its own filters, remote and git writer. The
+		# log is fetched once up front, and the first target is the only one
+		# that goes to svn for what they all want: the others stay behind it
+		# and find what it fetched in the meta and blob caches they share
+		start_time = time.time()
+		for target in targets:
+			if not isinstance(target, dict) or not target.get("repo"):
+				self.logln("\nEvery target needs a \"repo\"")
+				return 1
+		
+		if self.dump_file == "-":
+			self.logln("\nThe targets can't all read the dump from stdin, give a file")
+			return 1
+		
+		if not self.dump_file:
+			svn_revid = self.svn_client.info2(self.svn_url, recurse=False)[0][1].rev.number
+			local_revid = svn_revid
+			for target in targets:
+				# only read, the target may be running from somewhere else
+				repo = Repo(target["repo"], "", start_revid=self.start_revid)
+				repo.journal.load(False)
+				local_revid = min(local_revid, repo.synced_rev() or self.start_revid)
+			
+			self.meta_cache = MetaCache(self.meta_cache_path, self.svn_url)
+			for rev in self.svn_log(local_revid, svn_revid):
+				pass
+			self.meta_cache.close()
+			self.meta_cache = None
+			BlobCache(self.blob_cache_path, self.blob_cache_size * 1024 * 1024).close()
+		
+		options = {
+			"use_fast_import":self.use_fast_import,
+			"export_workers":self.export_pool.num_workers,
+			"export_retries":self.export_pool.retries,
+			"prefetch":self.prefetch,
+			"log_workers":self.log_workers,
+			"dump_file":self.dump_file,
+			"meta_cache_path":os.path.abspath(self.meta_cache_path),
+			"blob_cache_path":os.path.abspath(self.blob_cache_path),
+			"blob_cache_size":self.blob_cache_size,
+			"svn_url":self.svn_url,
+			"start_revid":self.start_revid,
+			"maintain_every":self.maintain_every
+		}
+		progress = multiprocessing.Value("l", 0)
+		leader_filter = PathFilter(targets[0].get("include", ()), targets[0].get("exclude", ()))
+		processes = []
+		
+		self.logln("\nSyncing %s in %s processes, logs are next to each repo" % (", ".join([target["repo"] for target in targets]), len(targets)))
+		for (i, target) in enumerate(targets):
+			target_options = dict(options)
+			target_options.update({
+				"use_fast_import":target.get("fast_import", self.use_fast_import),
+				"includes":target.get("include", ()),
+				"excludes":target.get("exclude", ()),
+				"remote_url":target.get("remote_url"),
+				"push_every":target.get("push_every", 0)
+			})
+			fan_out = (progress, None if i == 0 else targets[0]["repo"], leader_filter)
+			process = multiprocessing.Process(target=sync_target, args=(target_options, target["repo"], fan_out))
+			process.start()
+			processes.append(process)
+		
+		failed = 0
+		for (target, process) in zip(targets, processes):
+			process.join()
+			if process.exitcode != 0:
+				self.logln("""Syncing "%s" failed, see %s.log""" % (target["repo"], target["repo"]))
+				failed += 1
+			else:
+				self.logln("""Finished syncing "%s" """ % target["repo"])
+		
+		self.logln("\nCompleted in %s seconds" % int(round(time.time() - start_time)))
+		return 1 if failed else 0
+	
+	def bootstrap_commit(self, svn_url, local_revid):
+		# get the 1.2 log message
+		log = self.svn_client.log(
+			svn_url,
+			revision_start=pysvn.Revision(pysvn.opt_revision_kind.number, local_revid),
+			revision_end=pysvn.Revision(pysvn.opt_revision_kind.number, local_revid),
+			discover_changed_paths=False
+		)
+		
+		if (len(log)):
+			# commit!
+			self.git_commit(log[0]["message"], local_revid, log[0]["author"], log[0]["date"])
+		else:
+			self.logln("Error getting log info for rev %s" % local_revid)
+			return False
+		
+		return True
+	
+	def prefetch_revisions(self, local_revid, svn_revid):
+		# classifies and exports revisions ahead of the git work, at most
+		# self.prefetch of them are done or being done ahead of the one git
+		# is busy with
+		state = PlanState(self.branches, self.tags)
+		
+		if self.dump_file:
+			# reading a dump never waits on the network, and deltas need
+			# the previous revision committed before they can be applied
+			for revision in self.dump_revisions(local_revid, state):
+				yield revision
+			return
+		
+		if self.prefetch <= 0:
+			for rev in self.svn_log(local_revid, svn_revid):
+				yield self.prepare_revision(self.svn_client, rev, state)
+			return
+		
+		# the producer takes a slot before it starts on a revision and the
+		# slot is given back once the revision is taken off the queue
+		queue = Queue.Queue()
+		slots = threading.Semaphore(self.prefetch)
+		stop = threading.Event()
+		thread = threading.Thread(target=self.prefetch_worker, args=(local_revid, svn_revid, state, queue, slots, stop))
+		thread.daemon = True
+		thread.start()
+		
+		try:
+			while True:
+				item = queue.get()
+				if item == None:
+					break
+				if isinstance(item, tuple):
+					# the producer died, re-raise its exception here
+					raise item[0], item[1], item[2]
+				slots.release()
+				yield item
+		finally:
+			stop.set()
+			slots.release()
+	
+	def prefetch_worker(self, local_revid, svn_revid, state, queue, slots, stop):
+		# what svn_log has to say is logged with the next revision, stdout
+		# belongs to the git side
+		notes = []
+		try:
+			client = pysvn.Client()
+			for rev in self.svn_log(local_revid, svn_revid, lambda s="": notes.append(s + "\n")):
+				slots.acquire()
+				if stop.is_set():
+					return
+				revision = self.prepare_revision(client, rev, state)
+				revision.output[:0] = notes
+				notes = []
+				queue.put(revision)
+			queue.put(None)
+		except Exception:
+			queue.put(sys.exc_info())
+	
+	def svn_log(self, local_revid, svn_revid, logln=None):
+		# the log entries after local_revid, in order. Runs of them that are
+		# in the cache are read from there, the gaps in between are fetched
+		# by a LogFetcher ahead of whoever is reading them. What there is to
+		# say about it goes to logln, from the thread that's reading
+		logln = logln or self.logln
+		while local_revid < svn_revid:
+			
+			local_revid += 1
+			
+			cached_to = self.meta_cache.cached_to(local_revid) if self.meta_cache else None
+			if cached_to != None:
+				to_revid = min(cached_to, svn_revid)
+				logln("\nReading svn log history from rev %s to %s from the cache" % (local_revid, to_revid))
+				for rev in self.meta_cache.get_log(local_revid, to_revid):
+					yield rev
+				local_revid = to_revid
+				continue
+			
+			next_cached = self.meta_cache.next_cached(local_revid) if self.meta_cache else None
+			to_revid = svn_revid if next_cached == None else min(next_cached - 1, svn_revid)
+			logln("\nFetching svn log history from rev %s to %s" % (local_revid, to_revid))
+			fetcher = LogFetcher(self, local_revid, to_revid, self.log_workers, self.export_pool.retries)
+			try:
+				for rev in fetcher.entries(logln):
+					yield rev
+			finally:
+				fetcher.stop()
+			local_revid = to_revid
+	
+	def prepare_revision(self, client, rev, state):
+		self.wait_for_leader(rev["revision"].number)
+		revision = self.classify_revision(client, rev, state)
+		self.journal.record(revision.number, "classified")
+		self.spool_revision(client, revision)
+		self.journal.record(revision.number, "exported")
+		self.lead(revision.number)
+		return revision
+	
+	def lead(self, revid):
+		# with --targets the first target tells the others it has been
+		# through revid, so what it fetched is in the caches
+		if self.fan_out != None and self.fan_out[1] == None:
+			self.fan_out[0].value = revid
+	
+	def wait_for_leader(self, revid):
+		# the other targets stay behind the first, so they find whatever it
+		# fetched from svn in the caches instead of fetching it again
+		if self.fan_out == None or self.fan_out[1] == None or self.fan_out[0].value >= revid:
+			return
+		start = time.time()
+		while self.fan_out[0].value < revid:
+			time.sleep(0.05)
+		self.metrics.record("wait for leader", time.time() - start)
+	
+	def classify_revision(self, client, rev, state):
+		local_revid = rev["revision"].number
+		revision = Revision(local_revid, rev["message"], rev["author"], rev["date"])
+		
+		revision.num_paths = len(rev["changed_paths"])
+		revision.logln("{0} changed path{1}".format(len(rev["changed_paths"]), "s" if len(rev["changed_paths"]) != 1 else ""))
+		
+		# sort each changed file based on the branch
+		for change in self.classify_changes(client, rev, state, revision):
+			if change.kind == "dir":
+				revision.dirs.append(change)
+			else:
+				revision.add_file(change)
+		revision.classified()
+		
+		if self.meta_cache:
+			self.meta_cache.commit()
+		
+		state.update(revision)
+		return revision
+	
+	def classify_changes(self, client, rev, state, revision):
+		# yields a Change for every file and directory under the changed
+		# paths of rev. classify_revision keeps every one of them until the
+		# revision is applied, what they hold is what it costs. Only one
+		# info2 listing is held at a time
+		svn_url = self.svn_url
+		local_revid = revision.number
+		
+		for changed_path in rev["changed_paths"]:
+			# the last listing goes before the next one is fetched
+			rev_info = export_dirs = parents = None
+			copyfrom = None
+			if changed_path.copyfrom_path != None:
+				copyfrom = (changed_path.copyfrom_path, changed_path.copyfrom_revision.number)
+			target = self.classify_path(revision, state, changed_path.action, changed_path.path, copyfrom)
+			if target == None:
+				continue
+			(branch, project_dir, file_path) = target
+			if project_dir == "branches":
+				project_dir = ""
+			
+			# get info for all files for this path
+			start = time.time()
+			if self.meta_cache:
+				rev_info = self.meta_cache.info2(client, changed_path.path, svn_url + changed_path.path.replace(" ", "%20"), local_revid)
+			else:
+				rev_info = client.info2(svn_url + changed_path.path.replace(" ", "%20"), recurse=True, revision=pysvn.Revision(pysvn.opt_revision_kind.number, local_revid))
+			self.metrics.record("svn info2", time.time() - start, revision.phases)
+			
+			# some of what's under the path may be excluded
+			if not self.path_filter.whole(changed_path.path):
+				rev_info = rev_info[:1] + [rev_file for rev_file in rev_info[1:] if self.path_filter.allows(changed_path.path + "/" + rev_file[0])]
+				if len(rev_info) == 1 and not self.path_filter.allows(changed_path.path):
+					revision.logln("... excluded, skipping")
+					continue
+			
+			if len(rev_info) == 1:
+				# if only one file, then add it
+				if rev_info[0][1].kind == pysvn.node_kind.file:
+					yield Change(branch, project_dir, file_path, changed_path.action, svn_path=changed_path.path, changed=rev_info[0][1].last_changed_rev.number)
+				elif rev_info[0][1].kind == pysvn.node_kind.dir:
+					yield Change(branch, project_dir, file_path, changed_path.action, "dir", empty=True)
+				revision.logln()
+				continue
+			
+			# if more than one file for this path, loop and add each
+			revision.logln("... directory with {0} file{1}".format(len(rev_info), "s" if len(rev_info) != 1 else ""))
+			parents = set([os.path.dirname(rev_file[0]) for rev_file in rev_info[1:]])
+			# can be exported along with the rest of a directory the filter
+			# wants all of, as (directory url, name in it, files it has)
+			export_dirs = {}
+			if changed_path.action in ("A", "R"):
+				roots = self.export_roots(changed_path.path, [rev_file[0] for rev_file in rev_info[1:] if rev_file[1].kind == pysvn.node_kind.file])
+				for (root, names) in roots.items():
+					for name in names:
+						if name != "":
+							export_dirs[(root + "/" + name)[len(changed_path.path) + 1:]] = (svn_url + root, name, len(names))
+			for rev_file in rev_info[1:]:
+				revision.logln("   > %s [%s]" % (rev_file[0], rev_file[1].kind))
+				if rev_file[1].kind == pysvn.node_kind.file:
+					yield Change(branch, project_dir, file_path + "/" + rev_file[0], changed_path.action, svn_path=changed_path.path, name=rev_file[0], changed=rev_file[1].last_changed_rev.number,
+						export_dir=export_dirs.get(rev_file[0]))
+				elif rev_info[0][1].kind == pysvn.node_kind.dir:
+					yield Change(branch, project_dir, file_path + "/" + rev_file[0], changed_path.action, "dir", empty=rev_file[0] not in parents)
+	
+	def classify_path(self, revision, state, action, path, copyfrom=None):
+		# tags, branch deletes, file deletes and new branches are dealt with
+		# here, for anything else the caller gets (branch, project_dir,
+		# file_path) back and has to work out which files are involved
+		svn_url = self.svn_url
+		files = revision.files
+		
+		revision.log(" %s %s" % (action, path))
+		
+		parts = path.strip("/").split("/")
+		project_dir = parts.pop(0).lower()
+		
+		# check if this is a project we care about
+		if project_dir not in ("branches", "tags") + self.all_projects:
+			revision.logln("""... "%s" is not a project we care about, skipping """ % project_dir)
+			return None
+		
+		# nothing at or under the path is wanted, don't even ask svn about it
+		if not self.path_filter.reaches(path):
+			revision.logln("... excluded, skipping")
+			return None
+		
+		# this means this changed_path was the start of a new project folder, so skip it
+		if len(parts) < 1:
+			revision.logln("... path not deep enough, skipping")
+			return None
+		
+		ver_dir = parts.pop(0)
+		file_path = "/".join(parts)
+		
+		# a worker of --shards only imports its own project, whatever else is
+		# in a branch or tag is left for the merge
+		if self.shard != None:
+			owner = project_dir if project_dir not in ("branches", "tags") else (parts[0].lower() if len(parts) else None)
+			if owner != None and owner != self.shard:
+				revision.logln("... not part of this shard, skipping")
+				return None
+		
+		# a copy of something that's already in git can be done with refs
+		# instead of exporting every file again
+		source = None
+		if copyfrom != None and action in ("A", "R") and copyfrom[1] >= self.first_revid:
+			source = self.map_svn_path(copyfrom[0])
+			if source != None and not self.is_planned_ref(source[0], state):
+				source = None
+			# git only has what the filter let in of the source, which is
+			# only what's wanted here if both are taken whole
+			if source != None and project_dir != "tags" and not (self.path_filter.whole(copyfrom[0]) and self.path_filter.whole(path)):
+				source = None
+		
+		if project_dir == "tags":
+			if action == "R" and not len(file_path) and ver_dir in state.tags:
+				# the tag was redone, move it
+				revision.deleted_tags.append(ver_dir)
+				state.tags.discard(ver_dir)
+			if action in ("A", "R"):
+				# tag this commit, or the one it was copied from
+				revision.tag = ver_dir
+				if source != None and source[1] == file_path and revision.tag_source == None:
+					revision.tag_source = (source[0], copyfrom[1])
+					revision.logln("... copied from %s@%s" % copyfrom)
+				else:
+					revision.logln()
+			elif action == "D":
+				if ver_dir in state.tags:
+					revision.logln("... deleting tag");
+					revision.deleted_tags.append(ver_dir)
+					state.tags.discard(ver_dir)
+				else:
+					revision.logln("... tag does not exist");
+			else:
+				revision.logln("... tags with a %s action are not supported" % action)
+			return None
+		
+		# the first paths of a branch that doesn't exist yet create it
+		if project_dir == "branches" and action != "D" and ver_dir not in state.branches:
+			branch = ver_dir
+			if source != None:
+				files.setdefault(branch, [])
+				fork = revision.branch_sources.get(branch)
+				if fork == None and source[1] == file_path:
+					revision.branch_sources[branch] = (source[0], copyfrom[1])
+					revision.logln("""... new branch "%s" copied from %s@%s""" % ((branch,) + copyfrom))
+				elif fork == (source[0], copyfrom[1]) and source[1] == file_path:
+					revision.logln("""... already part of new branch "%s" """ % branch)
+				elif len(file_path):
+					revision.copies.setdefault(branch, []).append((file_path, source[0], copyfrom[1], source[1]))
+					revision.logln("""... copied into new branch "%s" from %s@%s""" % ((branch,) + copyfrom))
+				else:
+					revision.logln("""... detected new branch "%s" """ % branch)
+				return None
+			if len(file_path) and not branch in files:
+				# not a copy we can do in git, export it like any other path
+				revision.log("""... detected new branch "%s" """ % branch)
+		
+		if not len(file_path):
+			if action == "D":
+				if project_dir == "branches":
+					if ver_dir in state.branches:
+						revision.logln("... deleting branch")
+						revision.deleted_branches.append(ver_dir)
+						state.branches.discard(ver_dir)
+					else:
+						revision.logln("... branch does not exist")
+				else:
+					revision.logln("... deleting of projects not supported")
+			else:
+				revision.logln("... path not deep enough, skipping")
+			return None
+		
+		if action == "D":
+			# if we're deleting something, don't bother to get the info, just add it to be deleted
+			branch = ver_dir if project_dir == "branches" else "master"
+			revision.add_file(Change(branch, "" if project_dir == "branches" else project_dir, file_path, action, svn_path=path))
+			revision.logln()
+			return None
+		
+		return (ver_dir if project_dir == "branches" else "master", project_dir, file_path)
+	
+	def dump_revisions(self, local_revid, state):
+		stream = sys.stdin if self.dump_file == "-" else open(self.dump_file, "rb")
+		reader = DumpReader(stream)
+		revision = None
+		num_paths = 0
+		new_dirs = {}
+		
+		try:
+			for (headers, props) in reader.records():
+				if "Revision-number" in headers:
+					if revision != None:
+						yield self.finish_dump_revision(revision, state, num_paths)
+					
+					revision = None
+					number = int(headers["Revision-number"])
+					if number > local_revid:
+						props = props or {}
+						revision = Revision(number, props.get("svn:log", ""), props.get("svn:author"), self.parse_svn_date(props.get("svn:date")))
+						revision.spool = os.path.join(self.spool_path, str(number))
+						num_paths = 0
+						new_dirs = {}
+				
+				elif "Node-path" in headers:
+					# file modes have to be tracked even for revisions we already have
+					self.track_dump_mode(headers, props)
+					if revision != None:
+						num_paths += 1
+						self.classify_node(reader, revision, state, headers, props, new_dirs)
+			
+			if revision != None:
+				yield self.finish_dump_revision(revision, state, num_paths)
+		finally:
+			if stream is not sys.stdin:
+				stream.close()
+	
+	def finish_dump_revision(self, revision, state, num_paths):
+		revision.classified()
+		revision.num_paths = num_paths
+		revision.output.insert(0, "{0} changed path{1}\n".format(num_paths, "s" if num_paths != 1 else ""))
+		state.update(revision)
+		# the dump has the contents, they're in the spool by now
+		self.journal.record(revision.number, "classified")
+		self.journal.record(revision.number, "exported")
+		return revision
+	
+	def classify_node(self, reader, revision, state, headers, props, new_dirs):
+		path = "/" + headers["Node-path"].strip("/")
+		action = { "add":"A", "change":"M", "delete":"D", "replace":"R" }[headers["Node-action"]]
+		kind = headers.get("Node-kind", "file")
+		
+		# anything showing up inside a directory added in this revision means it isn't empty
+		if os.path.dirname(path) in new_dirs and self.path_filter.allows(path):
+			new_dirs[os.path.dirname(path)].empty = False
+		
+		copyfrom = None
+		if "Node-copyfrom-path" in headers:
+			copyfrom = ("/" + headers["Node-copyfrom-path"].strip("/"), int(headers["Node-copyfrom-rev"]))
+		target = self.classify_path(revision, state, action, path, copyfrom)
+		if target == None:
+			return
+		(branch, project_dir, file_path) = target
+		if project_dir == "branches":
+			project_dir = ""
+		git_path = os.path.join(project_dir, file_path)
+		
+		# the dump has a node for everything under a directory but a copy,
+		# which brings along whatever git has of its source
+		if not self.path_filter.allows(path) and (kind != "dir" or copyfrom == None):
+			revision.logln("... excluded, skipping")
+			return
+		
+		revision.add_file(Change(branch, project_dir, file_path, action, kind, svn_path=path))
+		
+		source = None
+		if "Node-copyfrom-path" in headers:
+			source = self.map_svn_path(headers["Node-copyfrom-path"])
+			copyfrom_revid = int(headers["Node-copyfrom-rev"])
+		
+		if kind == "dir":
+			if source != None:
+				revision.copies.setdefault(branch, []).append((git_path, source[0], copyfrom_revid, source[1]))
+				revision.logln("... copied from %s@%s" % (headers["Node-copyfrom-path"], copyfrom_revid))
+			else:
+				if action != "M":
+					# same as a checkout, an empty dir keeps its svn:ignore
+					new_dirs[path] = Change(branch, project_dir, file_path, action, "dir", empty=True, ignore=(props or {}).get("svn:ignore") or "")
+					revision.dirs.append(new_dirs[path])
+				revision.logln()
+			return
+		
+		if "Text-content-length" in headers:
+			base = None
+			if headers.get("Text-delta") == "true":
+				copied = self.copy_source(revision, branch, git_path)
+				if source != None:
+					base = self.git_read_blob(source[0], copyfrom_revid, source[1])
+				elif action == "M" and copied != None:
+					# git won't have the copy until the revision is applied
+					base = self.git_read_blob(*copied)
+				elif action == "M":
+					base = self.git_read_blob("refs/heads/" + branch, None, git_path)
+				if base == None:
+					base = ""
+			
+			if not os.path.isdir(revision.spool):
+				os.makedirs(revision.spool)
+			# every node saved so far is in the exports, so that's a name
+			# nothing else in the spool has
+			dest = os.path.join(revision.spool, "node-%s" % sum([len(exports) for exports in revision.exports.values()]))
+			reader.save(dest, base)
+			
+			mode = self.dump_modes.get(path)
+			if mode == "120000":
+				# svn keeps symlinks as "link <target>"
+				file = open(dest)
+				link = file.read()
+				file.close()
+				os.remove(dest)
+				os.symlink(link[5:], dest)
+			elif mode == "100755":
+				os.chmod(dest, 0755)
+			
+			revision.exports.setdefault(branch, []).append((dest, git_path))
+			revision.logln()
+		elif source != None:
+			revision.copies.setdefault(branch, []).append((git_path, source[0], copyfrom_revid, source[1]))
+			revision.logln("... copied from %s@%s" % (headers["Node-copyfrom-path"], copyfrom_revid))
+		else:
+			# property change only
+			revision.logln()
+	
+	def track_dump_mode(self, headers, props):
+		# the dump only mentions svn:executable and svn:special when they
+		# change, so remember which files have them
+		path = "/" + headers["Node-path"].strip("/")
+		
+		if headers["Node-action"] == "delete" or headers["Node-action"] == "replace":
+			for p in self.dump_modes.keys():
+				if p == path or p.startswith(path + "/"):
+					del self.dump_modes[p]
+		
+		if "Node-copyfrom-path" in headers:
+			source = "/" + headers["Node-copyfrom-path"].strip("/")
+			for p in self.dump_modes.keys():
+				if p == source or p.startswith(source + "/"):
+					self.dump_modes[path + p[len(source):]] = self.dump_modes[p]
+		
+		if props != None:
+			if props.get("svn:special") != None:
+				self.dump_modes[path] = "120000"
+			elif props.get("svn:executable") != None:
+				self.dump_modes[path] = "100755"
+			elif headers.get("Prop-delta") != "true" or "svn:special" in props or "svn:executable" in props:
+				self.dump_modes.pop(path, None)
+	
+	def map_svn_path(self, path):
+		# where an svn path lives in git, as a (ref, path) tuple
+		parts = path.strip("/").split("/")
+		project_dir = parts.pop(0).lower()
+		if project_dir not in ("branches", "tags") + self.all_projects or len(parts) < 1 or not self.path_filter.reaches(path):
+			return None
+		ver_dir = parts.pop(0)
+		file_path = "/".join(parts)
+		if project_dir == "tags":
+			return ("refs/tags/" + ver_dir, file_path)
+		if project_dir == "branches":
+			return ("refs/heads/" + ver_dir, file_path)
+		return ("refs/heads/master", os.path.join(project_dir, file_path).rstrip("/"))
+	
+	def is_planned_ref(self, ref, state):
+		# whether ref will exist in git by the time this revision is applied
+		if ref.startswith("refs/tags/"):
+			return ref[10:] in state.tags
+		return ref == "refs/heads/master" or ref[11:] in state.branches
+	
+	def copy_source(self, revision, branch, path):
+		# where path came from if it was copied earlier in this revision, as
+		# a (ref, revid, path) tuple
+		for (dest, ref, revid, source_path) in revision.copies.get(branch, []):
+			if path == dest or path.startswith(dest + "/"):
+				return (ref, revid, (source_path + path[len(dest):]).lstrip("/"))
+		if branch in revision.branch_sources:
+			(ref, revid) = revision.branch_sources[branch]
+			return (ref, revid, path)
+		return None
+	
+	def parse_svn_date(self, date):
+		if date == None:
+			return None
+		return calendar.timegm(time.strptime(date[:19], "%Y-%m-%dT%H:%M:%S"))
+	
+	def spool_revision(self, client, revision):
+		# export every added or modified file into the spool ahead of time,
+		# apply_revision moves them into place
+		revision.spool = os.path.join(self.spool_path, str(revision.number))
+		jobs = []
+		stores = []
+		dir_files = {}
+		for branch in revision.files:
+			revision.exports[branch] = []
+			for change in revision.files[branch]:
+				if change.file_path != "" and (change.action == "A" or change.action == "M"):
+					key = change.svn_file()
+					url = self.svn_url + key
+					path = os.path.join(change.project_dir, change.file_path)
+					if self.blob_cache:
+						blob = self.blob_cache.lookup(key, change.changed)
+						if blob != None:
+							revision.cached.setdefault(branch, []).append((url, path, blob))
+							continue
+					if change.export_dir != None:
+						dir_files.setdefault(change.export_dir[0], []).append((branch, key, change, path))
+						continue
+					source = os.path.join(revision.spool, str(len(jobs)))
+					jobs.append((url.replace(" ", "%20"), source))
+					stores.append((key, change.changed, source))
+					revision.exports[branch].append((source, path))
+		
+		# a directory that was added with most of its files still to fetch is
+		# exported in one go, and the files it's supposed to have are picked
+		# out of it. Anything else the export brings along is left behind
+		dir_jobs = []
+		for dir_url in sorted(dir_files):
+			misses = len(dir_files[dir_url])
+			whole = misses > 1 and misses * 2 > dir_files[dir_url][0][2].export_dir[2]
+			if whole:
+				dest = os.path.join(revision.spool, "dir-%s" % len(dir_jobs))
+				dir_jobs.append((dir_url.replace(" ", "%20"), dest))
+			for (branch, key, change, path) in dir_files[dir_url]:
+				if whole:
+					source = os.path.join(dest, change.export_dir[1])
+				else:
+					source = os.path.join(revision.spool, str(len(jobs)))
+					jobs.append(((self.svn_url + key).replace(" ", "%20"), source))
+				stores.append((key, change.changed, source))
+				revision.exports[branch].append((source, path))
+		
+		if len(jobs) or len(dir_jobs):
+			os.makedirs(revision.spool)
+			start = time.time()
+			self.export_pool.export(dir_jobs, revision.number, client, True, revision.logln)
+			self.export_pool.export(jobs, revision.number, client, False, revision.logln)
+			self.metrics.record("svn export", time.time() - start, revision.phases)
+			if self.blob_cache:
+				for (key, changed, source) in stores:
+					self.blob_cache.store(key, changed, source)
+	
+	def resolve_cached(self, revision):
+		# content we've exported before comes from git if the blob is still
+		# there, from the blob cache dir if not, and from svn as a last resort
+		shas = set()
+		for branch in revision.cached:
+			for (url, path, (checksum, sha, mode)) in revision.cached[branch]:
+				shas.add(sha)
+		present = self.git_blobs_present(shas)
+		
+		jobs = []
+		num_files = 0
+		for branch in revision.cached:
+			for (url, path, (checksum, sha, mode)) in revision.cached[branch]:
+				if sha in present:
+					revision.blobs.setdefault(branch, []).append((path, mode, sha))
+					self.blob_cache.git_hits += 1
+					continue
+				if not os.path.isdir(revision.spool):
+					os.makedirs(revision.spool)
+				source = os.path.join(revision.spool, "cached-%s" % num_files)
+				num_files += 1
+				if not self.blob_cache.fetch(checksum, mode, source):
+					jobs.append((url.replace(" ", "%20"), source))
+				revision.exports.setdefault(branch, []).append((source, path))
+		
+		if len(jobs):
+			start = time.time()
+			self.export_pool.export(jobs, revision.number, self.svn_client)
+			self.metrics.record("svn export", time.time() - start)
+	
+	def apply_revision(self, revision, branches_touched, branches_deleted, tags_touched, tags_deleted):
+		local_revid = revision.number
+		files = revision.files
+		dirs = revision.dirs
+		tag = revision.tag
+		# a revision the last run died in the middle of is picked up after
+		# the last branch it got committed
+		committed = self.journal.committed(local_revid)
+		
+		if len(revision.cached):
+			self.resolve_cached(revision)
+		
+		for branch in revision.deleted_branches:
+			branches_deleted.append(branch)
+			self.git_delete_branch(branch)
+			self.revmap.append(local_revid, branch, None)
+		
+		for deleted_tag in revision.deleted_tags:
+			tags_deleted.append(deleted_tag)
+			self.git_delete_tag(deleted_tag)
+		
+		for branch in files:
+			self.logln("On branch %s" % branch)
+			if branch in committed:
+				self.logln("Already committed")
+				continue
+			if self.git_current_branch() != branch:
+				if not self.git_branch_exists(branch):
+					source = revision.branch_sources.get(branch)
+					commit = self.git_find_commit(*source) if source else None
+					self.git_create_branch(branch, commit)
+					self.revmap.append(local_revid, branch, commit or self.git_head_commit(branch))
+				self.git_checkout(branch)
+				if branch not in branches_touched:
+					branches_touched.append(branch)
+			
+			for (path, ref, revid, source_path) in revision.copies.get(branch, []):
+				self.git_copy(path, ref, revid, source_path)
+			
+			for change in files[branch]:
+				if change.action == "D" and change.file_path != "":
+					# delete the file
+					self.git_rm(os.path.join(change.project_dir, change.file_path))
+			
+			# content git already has only needs an index entry
+			blobs = revision.blobs.get(branch, [])
+			revision.num_files += len(blobs)
+			if len(blobs):
+				self.git_add_blobs(blobs)
+			
+			# the exported files are already waiting in the spool
+			for (source, path) in revision.exports.get(branch, []):
+				revision.num_files += 1
+				revision.num_bytes += os.lstat(source).st_size
+				if self.fast_import:
+					# fast-import reads the file and streams it as a blob
+					self.git_add(path, source)
+					continue
+				dest = os.path.join(self.repo_path, path)
+				dest_dir = os.path.dirname(dest)
+				if not os.path.isdir(dest_dir):
+					os.makedirs(dest_dir)
+				os.rename(source, dest)
+				self.git_add(path)
+			
+			# check if any of the directories we encountered are empty
+			for directory in dirs:
+				if directory.branch == branch and self.fast_import:
+					# there's no working tree to look at, svn already told us if it's empty
+					if directory.empty:
+						self.fast_import.add_data(os.path.join(directory.project_dir, directory.file_path, ".gitignore"), directory.ignore or "")
+				elif directory.branch == branch:
+					full_dir = os.path.join(self.repo_path, directory.project_dir, directory.file_path)
+					if not os.path.isdir(full_dir):
+						os.makedirs(full_dir)
+					if directory.ignore and directory.empty:
+						self.git_add(self.create_gitignore(full_dir, directory.ignore))
+					else:
+						self.process_svn_dir(full_dir, False, True)
+			
+			# need to run git status
+			modified_files = self.git_status()
+			
+			if len(modified_files) > 0:
+				# git commit!
+				self.git_commit(revision.message, local_revid, revision.author, revision.date)
+			else:
+				print "No changes detected"
+			self.journal.record(local_revid, "committed", branch)
+		
+		# make sure we're back on master
+		if self.git_current_branch() != "master":
+			self.git_checkout("master")
+		
+		# if this rev is a tag, then tag it!
+		if tag and not self.git_tag_exists(tag):
+			source = revision.tag_source
+			self.git_create_tag(tag, self.git_find_commit(*source) if source else None)
+			tags_touched.append(tag)
+		
+		if revision.spool != None:
+			shutil.rmtree(revision.spool, True)
+		
+		# the journal says how far the sync got, a revision that only
+		# touched branches or nothing at all no longer needs a commit on
+		# master to show it
+		self.revmap.sync()
+		self.journal.record(local_revid, "done")
+		self.journal.sync()
+	
 	def git_init(self):
 		self.logln("""\nCreating new git repo "%s" """ % self.repo_name)
 		
 		self.run("""git init "%s" """ % self.repo_path, ".")
+		self.git_load_refs()
 		
 		readme_file = "README"
 		file = open(os.path.join(self.repo_path, readme_file), 'w')
@@ -449,123 +2168,549 @@ class Repo(object):
 		
 		self.git_commit("Initialized repo and added README, .gitignore, and .svnrev files.")
 	
-	def git_add(self, file):
+	@timed("git add")
+	def git_add(self, file, source=None):
 		self.logln(" A %s" % file)
-		self.run("""git add "%s" """ % file)
+		self.objects_written += 1
+		if self.fast_import:
+			self.fast_import.add_file(file, source if source != None else os.path.join(self.repo_path, file))
+			return
+		self.staged_adds.append(file)
 	
+	@timed("git add", True)
+	def git_add_blobs(self, blobs):
+		# (path, mode, sha) of blobs that are already in the repo
+		for (path, mode, sha) in blobs:
+			self.logln(" A %s" % path)
+		if self.fast_import:
+			for (path, mode, sha) in blobs:
+				self.fast_import.add_ref(path, mode, sha)
+			return
+		self.run("git update-index --add -z --index-info", input="".join(["%s %s\t%s\0" % (mode, sha, path) for (path, mode, sha) in blobs]))
+		self.run("git checkout-index -f -z --stdin", input="".join([path + "\0" for (path, mode, sha) in blobs]))
+	
+	def git_blobs_present(self, shas):
+		# anything exported this session went into git before now
+		present = set([sha for sha in shas if sha in self.blob_cache.seen])
+		missing = [sha for sha in shas if sha not in present]
+		if len(missing):
+			for line in self.run("git cat-file --batch-check", input="\n".join(missing) + "\n").splitlines():
+				parts = line.split(" ")
+				if len(parts) == 3 and parts[1] == "blob":
+					present.add(parts[0])
+		return present
+	
+	@timed("git rm")
 	def git_rm(self, file):
 		self.logln(" D %s" % file)
-		if os.path.exists(os.path.join(self.repo_path, file)):
-			self.run("""git rm -rf "%s" """ % file)
+		if self.fast_import:
+			self.fast_import.remove(file)
+		else:
+			self.staged_removes.append(file)
+	
+	@timed("git stage")
+	def git_stage(self):
+		# the paths git_add and git_rm collected go to git in one run each,
+		# removes first since that's the order a revision makes them in
+		if len(self.staged_removes):
+			self.run("git --literal-pathspecs rm -r -f -q --ignore-unmatch --pathspec-from-file=- --pathspec-file-nul", input="".join([path + "\0" for path in self.staged_removes]))
+			self.staged_removes = []
+		if len(self.staged_adds):
+			self.run("git --literal-pathspecs add --pathspec-from-file=- --pathspec-file-nul", input="".join([path + "\0" for path in self.staged_adds]))
+			self.staged_adds = []
 	
+	@timed("git status", True)
 	def git_status(self):
-		regex = re.compile('([^\s]+)\s+(.*)', re.MULTILINE)
-		files = self.run("git status --porcelain")
-		if len(files):
-			if files[len(files)-1] == '':
-				files.pop()
-		return regex.findall(files)
+		if self.fast_import:
+			return self.fast_import.pending()
+		# everything goes through the index, so comparing it with HEAD tells
+		# us if there's anything to commit without scanning the working tree
+		changes = self.run("git diff --cached --no-renames --name-status -z").split("\0")
+		return zip(changes[0::2], changes[1::2])
 	
 	def git_commit(self, log, rev=0, author=None, date=None):
+		if not self.fast_import:
+			# staged along with everything else before the commit is timed
+			file = open(os.path.join(self.repo_path, ".svnrev"), 'w')
+			file.write(str(rev))
+			file.close()
+			self.git_add(".svnrev")
+		self.git_commit_staged(log, rev, author, date)
+	
+	@timed("git commit", True)
+	def git_commit_staged(self, log, rev, author, date):
+		if self.fast_import:
+			log = log.strip()
+			if rev > 0:
+				log += " [[%s]]" % rev
+			self.fast_import.add_data(".svnrev", str(rev))
+			self.logln("""Committing "%s" """ % log)
+			mark = self.fast_import.commit(self.head, log, author, date)
+			self.branches.add(self.head)
+			self.revmap.append(rev, self.head, self.fast_import.get_mark(mark))
+			self.num_commits += 1
+			self.objects_written += 3 # .svnrev, the root tree and the commit
+			return
+		
 		log = log.strip().replace("\\", "\\\\").replace('"', '\\"').replace("!", "\"'!'\"").replace('$', '\\$')
 		
 		if rev > 0:
 			log += " [[%s]]" % rev
 		
-		svnrev_file = ".svnrev"
-		file = open(os.path.join(self.repo_path, svnrev_file), 'w')
-		file.write(str(rev))
-		file.close()
-		self.git_add(svnrev_file)
-		
 		info = ""
 		if author != None:
 			info += """--author="%s <nobody@dojotoolkit.org>" """ % author
 		if date != None:
 			info += """--date="%s" """ % int(date)
 		
+		# the repacks are ours to schedule, "git gc --auto" would run one
+		# right in the middle of committing
+		config = "-c gc.auto=0 " if self.maintain_every > 0 else ""
+		
 		self.logln("""Committing "%s" """ % log)
-		self.run("git commit -a -q %s -m %s" % (info, '"' + log + '"'))
+		self.run("git %scommit -a -q %s -m %s" % (config, info, '"' + log + '"'))
 		
+		# the first commit in a new repo creates the branch
+		self.branches.add(self.head)
+		self.revmap.append(rev, self.head, self.git_head_commit(self.head))
 		self.num_commits += 1
+		self.objects_written += 2 # the root tree and the commit
 	
+	@timed("git checkout", True)
 	def git_checkout(self, branch):
 		self.logln("""Switching to branch "%s" """ % branch)
-		self.run("git checkout %s" % branch)
+		if not self.fast_import:
+			self.run("git checkout %s" % branch)
+		self.head = branch
+	
+	def git_load_refs(self):
+		# from here on branches, tags and HEAD are tracked in memory and
+		# only changed through the git_* methods below
+		self.branches	= set(self.git_branch_list())
+		self.tags		= set(self.git_tag_list())
+		self.head		= self.git_head_branch()
+	
+	def git_verify_refs(self):
+		if self.fast_import:
+			self.fast_import.checkpoint()
+		problems = []
+		branches = set(self.git_branch_list())
+		if branches != self.branches:
+			problems.append("branches cached=%s git=%s" % (sorted(self.branches), sorted(branches)))
+		tags = set(self.git_tag_list())
+		if tags != self.tags:
+			problems.append("tags cached=%s git=%s" % (sorted(self.tags), sorted(tags)))
+		# fast-import never moves HEAD, the checkouts only exist in the cache
+		if not self.fast_import and self.git_head_branch() != self.head:
+			problems.append("HEAD cached=%s git=%s" % (self.head, self.git_head_branch()))
+		if len(problems):
+			raise RuntimeError("Ref cache out of sync with git: %s" % "; ".join(problems))
 	
 	def git_branch_list(self):
-		return map(lambda s: s[2:], self.run("git branch --no-color").split("\n"))
+		return [branch[2:] for branch in self.run("git branch --no-color").split("\n") if len(branch) and branch[2] != "("]
+	
+	def git_tag_list(self):
+		return [tag for tag in self.run("git tag").split("\n") if len(tag)]
+	
+	def git_head_branch(self):
+		for branch in self.run("git branch --no-color").split("\n"):
+			if len(branch) and branch[0] == '*':
+				return branch[2:]
+		return 'master'
 	
 	def git_branch_exists(self, branch):
-		return branch in self.git_branch_list()
+		return branch in self.branches
 	
-	def git_create_branch(self, branch):
-		self.logln("""Creating branch "%s" """ % branch)
-		self.run("""git branch "%s" """ % branch)
+	def git_create_branch(self, branch, commit=None):
+		# starts at commit if given, otherwise wherever we are now
+		if commit != None:
+			self.logln("""Creating branch "%s" at %s""" % (branch, commit[:10]))
+		else:
+			self.logln("""Creating branch "%s" """ % branch)
+		if self.fast_import:
+			self.fast_import.create_branch(branch, self.head, commit)
+		else:
+			self.run("""git branch "%s" %s""" % (branch, commit or ""))
+		self.branches.add(branch)
 	
 	def git_delete_branch(self, branch):
 		self.logln("""Deleting branch "%s" """ % branch)
-		self.run("""git branch -D "%s" """ % branch)
+		if self.fast_import:
+			self.fast_import.delete_branch(branch)
+		else:
+			self.run("""git branch -D "%s" """ % branch)
+		self.branches.discard(branch)
 	
 	def git_current_branch(self):
-		for branch in self.run("git branch --no-color").split("\n"):
-			if branch[0] == '*':
-				return branch[2:]
-		return 'master'
+		return self.head
 	
 	def git_tag_exists(self, tag):
-		tags = self.run("git tag").split("\n")
-		return tag in tags
+		return tag in self.tags
 	
-	def git_create_tag(self, tag):
-		self.logln("""Creating tag "%s" """ % tag)
-		self.run("""git tag -a "%s" -m "Adding tag %s" """ % (tag, tag))
+	def git_create_tag(self, tag, commit=None):
+		if commit != None:
+			self.logln("""Creating tag "%s" at %s""" % (tag, commit[:10]))
+		else:
+			self.logln("""Creating tag "%s" """ % tag)
+		if self.fast_import:
+			self.fast_import.create_tag(tag, self.head, "Adding tag %s" % tag, commit)
+		else:
+			self.run("""git tag -a "%s" -m "Adding tag %s" %s""" % (tag, tag, commit or ""))
+		self.tags.add(tag)
 	
 	def git_delete_tag(self, tag):
 		self.logln("""Deleting tag "%s" """ % tag)
-		self.run("""git tag -d "%s" """ % tag)
-	
-	def git_remote_add(self, user):
-		self.logln("Adding remote origin git@github.com:%s/%s.git" % (user, self.repo_path))
-		self.run("git remote add origin git@github.com:%s/%s.git" % (user, self.repo_path))
-	
-	def git_push(self, branch, upstream=False):
-		self.logln("""Pushing branch "%s" """ % branch)
-		if self.git_current_branch() != branch:
-			self.git_checkout(branch)
-		if upstream:
-			self.run("git push -u origin %s" % branch)
+		if self.fast_import:
+			self.fast_import.delete_tag(tag)
 		else:
-			self.run("git push origin %s" % branch)
+			self.run("""git tag -d "%s" """ % tag)
+		self.tags.discard(tag)
 	
-	def git_push_deleted_branch(self, branch):
-		self.logln("""Deleting remote branch "%s" """ % branch)
-		self.run("git push origin :%s" % branch)
+	@timed("git copy", True)
+	def git_copy(self, path, ref, revid, source_path):
+		commit = self.git_find_commit(ref, revid)
+		if commit == None:
+			self.logln("""Unable to find "%s" as of rev %s to copy from, skipping""" % (ref, revid))
+			return
+		self.logln(" C %s -> %s" % (source_path, path))
+		
+		if self.fast_import:
+			if source_path == "":
+				self.fast_import.add_ref(path, "040000", self.run("git rev-parse %s^{tree}" % commit).strip())
+			else:
+				for (mode, kind, sha, name) in self.git_ls_tree(commit, source_path, False):
+					self.fast_import.add_ref(path, mode, sha)
+			return
+		
+		# stage the source entries under their new name, then write them out
+		index_info = ""
+		for (mode, kind, sha, name) in self.git_ls_tree(commit, source_path, True):
+			index_info += "%s %s\t%s\0" % (mode, sha, os.path.join(path, name[len(source_path):].lstrip("/")).rstrip("/"))
+		self.run("""git rm -r -q --cached --ignore-unmatch -- "%s" """ % path)
+		self.run("git update-index --add -z --index-info", input=index_info)
+		self.run("""git checkout -- "%s" """ % path)
+	
+	def git_ls_tree(self, commit, path, recurse):
+		entries = []
+		for line in self.run("""git ls-tree %s -z %s -- "%s" """ % ("-r" if recurse else "", commit, path)).split("\0"):
+			if len(line):
+				(info, name) = line.split("\t", 1)
+				entries.append(tuple(info.split(" ")) + (name,))
+		return entries
+	
+	def git_find_commit(self, ref, revid=None):
+		# the commit ref pointed at as of svn rev revid, or its tip for None
+		if self.fast_import:
+			# other git commands can't see what fast-import hasn't written out
+			self.fast_import.checkpoint()
+		
+		if revid != None and ref.startswith("refs/heads/"):
+			return self.revmap.lookup(ref[11:], revid)
+		
+		try:
+			return self.run("""git rev-parse -q --verify "%s^{commit}" """ % ref).strip()
+		except RuntimeError:
+			return None
+	
+	def git_head_commit(self, branch):
+		if self.fast_import:
+			head = self.fast_import.head(branch)
+			if head.startswith(":"):
+				return self.fast_import.get_mark(head)
+			return self.run("""git rev-parse "%s" """ % head).strip()
+		return self.run("""git rev-parse "refs/heads/%s" """ % branch).strip()
+	
+	def git_rebuild_revmap(self, save=True):
+		# reads the [[rev]] of every commit on every branch, once. Without
+		# save the map is only rebuilt in memory
+		self.log("Rebuilding the svn revision map from the git history... ")
+		regex = re.compile(r"\[\[(\d+)\]\]\s*$")
+		records = []
+		for branch in sorted(self.branches):
+			proc = Popen("""git log --first-parent --reverse --format=%%H%%n%%B%%x00 "refs/heads/%s" """ % branch, shell=True, stdout=PIPE, stderr=PIPE, cwd=self.repo_path)
+			buffer = ""
+			while True:
+				chunk = proc.stdout.read(65536)
+				entries = (buffer + chunk).split("\0")
+				buffer = entries.pop()
+				for entry in entries:
+					(sha, message) = (entry.strip("\n") + "\n").split("\n", 1)
+					match = regex.search(message)
+					records.append((int(match.group(1)) if match else 0, branch, sha.decode("hex")))
+				if chunk == "":
+					break
+			if proc.wait() != 0:
+				raise RuntimeError("""Failed reading the history of branch "%s" """ % branch)
+		
+		# sort is stable, so each branch keeps its own order
+		records.sort(key=lambda record: record[0])
+		if save:
+			self.revmap.replace(records)
+		else:
+			self.revmap.reset(records)
+		self.logln("%s commits" % len(records))
+	
+	def git_recover_revmap(self, revid):
+		# redoes the records of the revision after revid from the branch
+		# heads, for a run that died before the journal had all of them: a
+		# head committed for it, where a branch made for it forked, and the
+		# branches it deleted that are gone
+		regex = re.compile(r"\[\[(\d+)\]\]\s*$")
+		deleted = [record for record in self.revmap.records if record[0] > revid and record[2] == RevMap.null and record[1] not in self.branches]
+		self.revmap.truncate(revid)
+		records = []
+		for branch in sorted(self.branches):
+			commits = []
+			for entry in self.run("""git log --first-parent -n 2 --format=%%H%%n%%B%%x00 "refs/heads/%s" """ % branch).split("\0"):
+				if entry.strip("\n") != "":
+					(sha, message) = (entry.strip("\n") + "\n").split("\n", 1)
+					match = regex.search(message)
+					commits.append((int(match.group(1)) if match else 0, sha))
+			if not len(commits):
+				continue
+			committed = commits[0][0] > revid
+			if self.revmap.lookup(branch, revid) == None and (not committed or len(commits) > 1):
+				records.append((revid + 1, branch, commits[1 if committed else 0][1]))
+			if committed:
+				records.append((commits[0][0], branch, commits[0][1]))
+		for (rev, branch, sha) in records:
+			self.revmap.append(rev, branch, sha)
+		for (rev, branch, sha) in deleted:
+			self.revmap.append(rev, branch, None)
+		self.revmap.sync()
+	
+	def git_blob_md5s(self, shas, links=()):
+		# {sha:md5} of the given blobs, read through one "git cat-file". svn
+		# keeps a symlink as a file holding "link <target>"
+		proc = Popen("git cat-file --batch", shell=True, stdin=PIPE, stdout=PIPE, stderr=PIPE, cwd=self.repo_path)
+		writer = threading.Thread(target=lambda: (proc.stdin.write("".join([sha + "\n" for sha in shas])), proc.stdin.close()))
+		writer.start()
+		md5s = {}
+		for sha in shas:
+			header = proc.stdout.readline().split()
+			if len(header) != 3:
+				md5s[sha] = None
+				continue
+			md5 = hashlib.md5("link " if sha in links else "")
+			length = int(header[2])
+			while length > 0:
+				chunk = proc.stdout.read(min(length, 65536))
+				if chunk == "":
+					raise RuntimeError("Unexpected end of git cat-file output")
+				md5.update(chunk)
+				length -= len(chunk)
+			proc.stdout.read(1)
+			md5s[sha] = md5.hexdigest()
+		writer.join()
+		if proc.wait() != 0:
+			raise RuntimeError("Failed running command git cat-file --batch return code=%s" % proc.returncode)
+		return md5s
+	
+	def git_read_blob(self, ref, revid, path):
+		# contents of path as of svn rev revid, or the tip of ref for None
+		if self.fast_import and revid == None:
+			return self.fast_import.read_blob(ref[11:], path)
+		commit = self.git_find_commit(ref, revid)
+		if commit == None:
+			return None
+		try:
+			return self.run("""git cat-file blob "%s:%s" """ % (commit, path))
+		except RuntimeError:
+			return None
 	
-	def git_push_tags(self):
-		self.logln("Pushing tags")
-		self.run("git push --tags")
+	@timed("git checkpoint")
+	def git_checkpoint(self):
+		# flush fast-import to disk, which makes what the journal has been
+		# holding back safe to write, and bring the working tree up to date
+		self.logln("Checkpointing fast-import")
+		self.fast_import.checkpoint()
+		self.run("git reset --hard -q")
+	
+	def is_pushing(self):
+		return self.remote_repo_username != "" or self.remote_url != None
+	
+	def git_remote_add(self):
+		# origin is the account's github repo unless --remote-url says otherwise
+		url = self.remote_url or "git@github.com:%s/%s.git" % (self.remote_repo_username, self.repo_path)
+		if "origin" in self.run("git remote").split():
+			if self.remote_url != None:
+				self.run("""git remote set-url origin "%s" """ % url)
+			return
+		self.logln("Adding remote origin %s" % url)
+		self.run("""git remote add origin "%s" """ % url)
+	
+	def git_push_refspecs(self, branches_touched, branches_deleted, tags_touched, tags_deleted):
+		# every ref this sync changed, pinned to the commit it points at now
+		# so a push in the background sends a consistent snapshot
+		refspecs = []
+		branches = ["master"]
+		for branch in branches_touched + branches_deleted:
+			if branch and branch not in branches:
+				branches.append(branch)
+		for branch in branches:
+			if branch in self.branches:
+				# a branch that was deleted and made again has a new history
+				force = "+" if branch in branches_deleted else ""
+				refspecs.append("%s%s:refs/heads/%s" % (force, self.git_head_commit(branch), branch))
+			else:
+				refspecs.append(":refs/heads/%s" % branch)
+		
+		tags = []
+		for tag in tags_touched + tags_deleted:
+			if tag not in tags:
+				tags.append(tag)
+		for tag in tags:
+			if tag in self.tags:
+				# tags get moved, so they're always forced
+				refspecs.append("+%s:refs/tags/%s" % (self.run("""git rev-parse "refs/tags/%s" """ % tag).strip(), tag))
+			else:
+				refspecs.append(":refs/tags/%s" % tag)
+		return refspecs
+	
+	def git_push(self, refspecs):
+		# one atomic push, either every ref is updated or none of them are.
+		# Deleting a ref the remote doesn't have would fail the lot, a
+		# branch can come and go between two pushes
+		start = time.time()
+		remote_refs = set([line.split("\t")[1] for line in self.run("git ls-remote origin").splitlines() if "\t" in line])
+		refspecs = [refspec for refspec in refspecs if not refspec.startswith(":") or refspec[1:] in remote_refs]
+		if len(refspecs):
+			self.run("git push --atomic -q origin %s" % " ".join(['"%s"' % refspec for refspec in refspecs]))
+		# a push sends what many revisions made, often while another one is
+		# being applied, so it isn't billed to any of them
+		self.metrics.record_apart("git push", time.time() - start, { "refs": len(refspecs) })
+	
+	def push_checkpoint(self, branches_touched, branches_deleted, tags_touched, tags_deleted):
+		# publishes what's been imported so far while the import keeps going,
+		# unless the last one of these is still busy
+		if self.push_thread != None and self.push_thread.is_alive():
+			return
+		self.report_push_error()
+		if self.fast_import:
+			# the remote can only be sent what's been written out
+			self.fast_import.checkpoint()
+		self.git_remote_add()
+		refspecs = self.git_push_refspecs(branches_touched, branches_deleted, tags_touched, tags_deleted)
+		self.logln("Pushing {0} ref{1} in the background".format(len(refspecs), "s" if len(refspecs) != 1 else ""))
+		self.push_thread = threading.Thread(target=self.push_worker, args=(refspecs,))
+		self.push_thread.daemon = True
+		self.push_thread.start()
+	
+	def push_worker(self, refspecs):
+		try:
+			self.git_push(refspecs)
+		except Exception as e:
+			self.push_error = str(e)
+	
+	def wait_for_push(self):
+		if self.push_thread != None:
+			self.push_thread.join()
+			self.push_thread = None
+		self.report_push_error()
+	
+	def report_push_error(self):
+		# a failed background push isn't fatal, the next one sends it all again
+		if self.push_error != None:
+			self.logln("Background push failed: %s" % self.push_error)
+			self.push_error = None
+	
+	def maintain(self):
+		# packs the objects written since the last time in the background,
+		# the import carries on meanwhile. Only one of these runs at a time
+		if self.maintain_thread != None:
+			if self.maintain_thread.is_alive():
+				return
+			self.report_maintenance()
+		self.objects_written = 0
+		before = self.git_count_objects()
+		self.logln("Repacking in the background: %s" % self.format_object_counts(before))
+		self.maintain_thread = threading.Thread(target=self.maintain_worker, args=(before,))
+		self.maintain_thread.daemon = True
+		self.maintain_thread.start()
+	
+	def maintain_worker(self, before):
+		start = time.time()
+		try:
+			self.git_repack(before)
+			self.maintain_result = (before, self.git_count_objects(), time.time() - start, None)
+		except Exception as e:
+			self.maintain_result = (before, None, time.time() - start, str(e))
 	
-	def run(self, cmd, cwd=None):
+	def wait_for_maintenance(self):
+		if self.maintain_thread != None:
+			self.maintain_thread.join()
+			self.report_maintenance()
+	
+	def report_maintenance(self):
+		# the worker only keeps its numbers, they're logged from here so they
+		# don't land in the middle of a revision
+		self.maintain_thread = None
+		if self.maintain_result == None:
+			return
+		(before, after, seconds, error) = self.maintain_result
+		self.maintain_result = None
+		if error != None:
+			self.logln("Repacking failed after %.1f seconds: %s" % (seconds, error))
+		else:
+			self.logln("Repacked in %.1f seconds: %s -> %s" % (seconds, self.format_object_counts(before), self.format_object_counts(after)))
+	
+	def git_repack(self, before):
+		# --geometric rolls the loose objects and the small packs fast-import
+		# leaves at every checkpoint into bigger packs without rewriting the
+		# big ones every time. Objects are never dropped, so it's safe while
+		# git is being written to. Older git only gets the loose objects packed
+		start = time.time()
+		try:
+			self.run("git repack -d -q --geometric=2")
+		except RuntimeError:
+			self.run("git repack -d -q")
+		# it runs alongside whatever revisions are being applied meanwhile,
+		# so it isn't billed to any of them
+		self.metrics.record_apart("git repack", time.time() - start, { "loose_objects": before["count"], "packs": before["packs"] })
+	
+	def git_count_objects(self):
+		counts = {}
+		for line in self.run("git count-objects -v").splitlines():
+			(key, value) = line.split(": ", 1)
+			if value.isdigit():
+				# there's an "alternate" line for each borrowed object store
+				counts[key] = int(value)
+		return counts
+	
+	def format_object_counts(self, counts):
+		return "%s loose objects (%.1f MB), %s packs (%.1f MB)" % (counts["count"], counts["size"] / 1024.0, counts["packs"], counts["size-pack"] / 1024.0)
+	
+	def run(self, cmd, cwd=None, input=None):
 		if cwd == None:
 			cwd = self.repo_path
 		# self.logln("Running command: %s" % cmd)
 		
-		proc = Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd)
-		return_code = proc.wait()
+		proc = Popen(cmd, shell=True, stdin=subprocess.PIPE if input != None else None, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd)
+		output = proc.communicate(input)[0]
+		return_code = proc.returncode
 		if return_code == 0:
-			return proc.stdout.read()
+			return output
 		else:
 			raise RuntimeError("Failed running command %s return code=%s" % (cmd, return_code))
 	
-	def lap(self, seconds):
+	def log_metrics(self):
+		self.logln("\n%-16s %8s %10s %9s %9s %9s %9s" % ("Phase", "Calls", "Total", "p50", "p90", "p99", "Max"))
+		for (phase, calls, total, p50, p90, p99, slowest) in self.metrics.summary():
+			self.logln("%-16s %8d %9.2fs %8.3fs %8.3fs %8.3fs %8.3fs" % (phase, calls, total, p50, p90, p99, slowest))
+	
+	def lap(self, seconds, weight=1):
 		x = len(self.laps)
 		while x >= 250:
 			self.laps.pop(0)
+			self.lap_weights.pop(0)
 			x -= 1
 		self.laps.append(seconds)
-
+		self.lap_weights.append(weight)
+	
 	def how_long(self, start_rev, current_rev, end_rev):
+		if end_rev == None:
+			return False
+		
 		revs_left = end_rev - current_rev
 		percent = int(floor(float(current_rev - start_rev) / float(end_rev - start_rev) * 100.0))
 		
@@ -576,6 +2721,15 @@ class Repo(object):
 		total = sum(self.laps)
 		average_time = float(total) / x
 		estimated_time = revs_left * average_time
+		bar = ""
+		if self.plan_revids != None:
+			# what's left weighed by its cost, at the pace of the last revisions
+			i = bisect.bisect_right(self.plan_revids, current_rev)
+			done = self.plan_totals[i - 1] if i > 0 else 0.0
+			left = self.plan_totals[-1] - done
+			estimated_time = left * total / sum(self.lap_weights)
+			percent = int(floor(done / self.plan_totals[-1] * 100.0))
+			bar = "[%s%s] " % ("#" * (percent / 5), "-" * (20 - percent / 5))
 		
 		hours = int(floor(estimated_time / 3600))
 		minutes = int(floor(float(estimated_time) / 60.0)) - (hours * 60)
@@ -583,9 +2737,9 @@ class Repo(object):
 		
 		if hours == 0:
 			if minutes == 0:
-				return "%d%% %d revs left, %d sec remaining" % (percent, revs_left, seconds)
-			return "%d%% %d revs left, %d min %d sec remaining" % (percent, revs_left, minutes, seconds)
-		return "%d%% %d revs left, %d hrs %d min %d sec remaining" % (percent, revs_left, hours, minutes, seconds)
+				return "%d%% %s%d revs left, %d sec remaining" % (percent, bar, revs_left, seconds)
+			return "%d%% %s%d revs left, %d min %d sec remaining" % (percent, bar, revs_left, minutes, seconds)
+		return "%d%% %s%d revs left, %d hrs %d min %d sec remaining" % (percent, bar, revs_left, hours, minutes, seconds)
 	
 	def process_svn_dir(self, path, recurse, do_add):
 		delete_svn_dir = False
@@ -624,12 +2778,33 @@ class Repo(object):
 		return os.path.abspath(ignore_file).replace(os.path.abspath(self.repo_path), "").lstrip("/")
 	
 	def create_lock(self):
+		# who holds the lock goes on the first line, so a lock left behind by
+		# a run that was killed can be told apart from one that's running
 		lock = open(os.path.join(self.repo_path, ".lock"), 'w')
-		lock.write("Remove this file to unlock this repo")
+		lock.write("%s %s\nRemove this file to unlock this repo\n" % (os.getpid(), socket.gethostname()))
 		lock.close()
 	
 	def is_locked(self):
-		return os.path.exists(os.path.join(self.repo_path, ".lock"))
+		lock = os.path.join(self.repo_path, ".lock")
+		if not os.path.exists(lock):
+			return False
+		file = open(lock)
+		owner = file.readline().split()
+		file.close()
+		if len(owner) == 2 and owner[0].isdigit() and owner[1] == socket.gethostname() and not self.is_running(int(owner[0])):
+			self.logln("\nRemoving the lock left behind by process %s, it's no longer running" % owner[0])
+			os.remove(lock)
+			self.stale_lock = True
+			return False
+		return True
+	
+	def is_running(self, pid):
+		try:
+			os.kill(pid, 0)
+		except OSError as e:
+			# EPERM means it's there, just not ours
+			return e.errno != errno.ESRCH
+		return True
 	
 	def delete_lock(self):
 		lock = os.path.join(self.repo_path, ".lock")
@@ -645,12 +2820,1317 @@ class Repo(object):
 		sys.stdout.write("\n")
 		sys.stdout.flush()
 
+# what a single svn revision does to the repo, worked out before any of it is
+# applied so the svn side can run ahead of the git side
+class Revision(object):
+	
+	def __init__(self, number, message, author, date):
+		self.number				= number
+		self.message			= message
+		self.author				= author
+		self.date				= date
+		self.tag				= False
+		self.files				= {}
+		self.seen				= {}
+		self.dirs				= []
+		self.deleted_branches	= []
+		self.deleted_tags		= []
+		self.exports			= {}
+		self.copies				= {}
+		self.cached				= {}
+		self.blobs				= {}
+		self.branch_sources		= {}
+		self.tag_source			= None
+		self.spool				= None
+		self.output				= []
+		self.phases				= {}
+		self.num_paths			= 0
+		self.num_files			= 0
+		self.num_bytes			= 0
+	
+	def add_file(self, change):
+		# the first change to a file wins, it can show up under more than
+		# one changed path. The set holds the change's own file_path, so it
+		# costs no more strings
+		seen = self.seen.setdefault((change.branch, change.project_dir), set())
+		if change.file_path in seen:
+			return
+		seen.add(change.file_path)
+		self.files.setdefault(change.branch, []).append(change)
+	
+	def classified(self):
+		# the duplicates are all dropped by now, the sets can go while the
+		# revision waits to be applied
+		self.seen = {}
+	
+	def log(self, s=""):
+		self.output.append(s)
+	
+	def logln(self, s=""):
+		self.output.append(s + "\n")
+
+# a file or directory touched by a revision. Copying a whole tag can touch
+# hundreds of thousands of them, so they're kept as small as they can be:
+# the svn path of the changed path is shared by everything under it and the
+# url is only put together when the file is exported
+class Change(object):
+	
+	__slots__ = ("branch", "project_dir", "file_path", "action", "kind", "svn_path", "name", "changed", "export_dir", "empty", "ignore")
+	
+	def __init__(self, branch, project_dir, file_path, action, kind="file", svn_path=None, name=None, changed=None, export_dir=None, empty=False, ignore=None):
+		self.branch			= branch
+		self.project_dir	= project_dir
+		self.file_path		= file_path
+		self.action			= action
+		self.kind			= kind
+		self.svn_path		= svn_path
+		self.name			= name
+		self.changed		= changed
+		self.export_dir		= export_dir
+		self.empty			= empty
+		self.ignore			= ignore
+	
+	def svn_file(self):
+		# the svn path of the file itself, like "/dojo/trunk/dnd/Source.js"
+		return self.svn_path if self.name == None else self.svn_path + "/" + self.name
+
+# the branches and tags the repo will have once every revision classified so
+# far has been applied
+class PlanState(object):
+	
+	def __init__(self, branches, tags):
+		self.branches				= set(branches)
+		self.tags					= set(tags)
+	
+	def update(self, revision):
+		# once a revision is applied every branch it touches will exist
+		for branch in revision.files:
+			self.branches.add(branch)
+		if revision.tag:
+			self.tags.add(revision.tag)
+
+# decides which svn paths make it into the repo. Rules are prefixes of svn
+# paths like "dojox/trunk/gfx" or "branches", any part of which can be a
+# glob like "tags/release-1.*". They're compiled into a trie of path parts
+# once, so checking a path walks its parts instead of trying every rule. The
+# deepest rule that matches wins, an exclude beats an include at the same
+# depth, and without includes everything not excluded is in
+class PathFilter(object):
+	
+	def __init__(self, includes=(), excludes=()):
+		self.includes	= list(includes)
+		self.excludes	= list(excludes)
+		# every node is [decision, {part:node}, [(glob, node)]]
+		self.root		= [not len(self.includes), {}, []]
+		for rule in self.includes:
+			self.add(rule, True)
+		for rule in self.excludes:
+			self.add(rule, False)
+	
+	def add(self, rule, decision):
+		node = self.root
+		for part in self.split(rule):
+			if re.search(r"[*?[]", part):
+				child = [c for (glob, c) in node[2] if glob == part]
+				if not len(child):
+					child = [[None, {}, []]]
+					node[2].append((part, child[0]))
+				node = child[0]
+			else:
+				node = node[1].setdefault(part, [None, {}, []])
+		# the excludes are added last, so they win a tie
+		node[0] = decision
+	
+	def split(self, path):
+		# project dirs are matched whatever their case, like everywhere else
+		parts = [part for part in path.strip("/").split("/") if part != ""]
+		if len(parts):
+			parts[0] = parts[0].lower()
+		return parts
+	
+	def match(self, path):
+		# (whether path is in, whether everything under it is decided the same)
+		decision = self.root[0]
+		nodes = [self.root]
+		for part in self.split(path):
+			found = []
+			for node in nodes:
+				if part in node[1]:
+					found.append(node[1][part])
+				found.extend([child for (glob, child) in node[2] if fnmatch.fnmatchcase(part, glob)])
+			if not len(found):
+				return (decision, True)
+			decided = [node[0] for node in found if node[0] != None]
+			if len(decided):
+				decision = all(decided)
+			nodes = found
+		return (decision, not [node for node in nodes if len(node[1]) or len(node[2])])
+	
+	def allows(self, path):
+		return self.match(path)[0]
+	
+	def reaches(self, path):
+		# whether path or anything under it is in
+		(decision, covers) = self.match(path)
+		return decision or not covers
+	
+	def whole(self, path):
+		# whether path and everything under it is in
+		(decision, covers) = self.match(path)
+		return decision and covers
+	
+	def describe(self):
+		return ", ".join(["+" + rule for rule in self.includes] + ["-" + rule for rule in self.excludes])
+
+# maps (svn revision, branch) to the git commit made for it, kept in an
+# append-only file next to the repo so lookups never have to walk git log
+class RevMap(object):
+	
+	null = "\0" * 20
+	
+	def __init__(self, path):
+		self.path		= path
+		self.records	= []
+		self.revs		= {}
+		self.commits	= {}
+		self.file		= None
+	
+	def exists(self):
+		return os.path.isfile(self.path)
+	
+	def load(self, repair=True):
+		# repair is for whoever is about to append, anyone else leaves the
+		# file alone as a running sync may be writing to it
+		self.close()
+		self.records = []
+		self.revs = {}
+		self.commits = {}
+		
+		data = ""
+		if self.exists():
+			file = open(self.path, "rb")
+			data = file.read()
+			file.close()
+		
+		# each record is the revision, branch name length, branch and sha
+		pos = 0
+		while pos + 5 <= len(data):
+			(revid, length) = struct.unpack(">IB", data[pos:pos + 5])
+			end = pos + 5 + length + 20
+			if end > len(data):
+				break
+			self.index(revid, data[pos + 5:pos + 5 + length], data[pos + 5 + length:end])
+			pos = end
+		
+		if pos != len(data) and repair:
+			# whatever we were writing when we died never made it
+			self.replace(self.records)
+	
+	def lookup(self, branch, revid):
+		# the commit branch pointed at as of revid, or None
+		revs = self.revs.get(branch)
+		if not revs:
+			return None
+		i = bisect.bisect_right(revs, revid) - 1
+		if i < 0 or self.commits[branch][i] == self.null:
+			return None
+		return self.commits[branch][i].encode("hex")
+	
+	def last_rev(self):
+		if not len(self.records):
+			return None
+		return self.records[-1][0]
+	
+	def append(self, revid, branch, commit):
+		# commit None records the branch being deleted
+		sha = commit.decode("hex") if commit != None else self.null
+		if self.file == None:
+			self.file = open(self.path, "ab")
+		self.file.write(self.pack(revid, branch, sha))
+		self.index(revid, branch, sha)
+	
+	def sync(self):
+		if self.file != None:
+			self.file.flush()
+			os.fsync(self.file.fileno())
+	
+	def truncate(self, revid, keep=()):
+		# forgets everything after revid but the (revid, branch) in keep
+		self.replace([record for record in self.records if record[0] <= revid or (record[0], record[1]) in keep])
+	
+	def replace(self, records):
+		self.close()
+		tmp_path = self.path + ".tmp"
+		file = open(tmp_path, "wb")
+		for (revid, branch, sha) in records:
+			file.write(self.pack(revid, branch, sha))
+		file.flush()
+		os.fsync(file.fileno())
+		file.close()
+		os.rename(tmp_path, self.path)
+		self.reset(records)
+	
+	def reset(self, records):
+		# records in memory only, the file is left as it is
+		self.records = []
+		self.revs = {}
+		self.commits = {}
+		for (revid, branch, sha) in records:
+			self.index(revid, branch, sha)
+	
+	def close(self):
+		if self.file != None:
+			self.sync()
+			self.file.close()
+			self.file = None
+	
+	def index(self, revid, branch, sha):
+		# records only ever arrive in revision order
+		self.records.append((revid, branch, sha))
+		self.revs.setdefault(branch, []).append(revid)
+		self.commits.setdefault(branch, []).append(sha)
+	
+	def pack(self, revid, branch, sha):
+		if isinstance(branch, unicode):
+			branch = branch.encode("utf-8")
+		return struct.pack(">IB", revid, len(branch)) + branch + sha
+
+# how far the sync got, as an append-only file of "<rev> <phase> [<branch>]"
+# lines. A revision is classified, exported, committed branch by branch and
+# then done. A restart carries on after the last done revision, and doesn't
+# commit again on the branches the journal has for the one after it
+class Journal(object):
+	
+	def __init__(self, path):
+		self.path		= path
+		self.file		= None
+		self.lock		= threading.Lock()
+		self.loaded		= False
+		self.done		= None
+		self.partial	= {}
+		self.held		= []
+		self.hold		= False
+	
+	def exists(self):
+		return os.path.isfile(self.path)
+	
+	def load(self, compact=True):
+		self.close()
+		self.done = None
+		self.partial = {}
+		self.held = []
+		records = []
+		if self.exists():
+			file = open(self.path)
+			for line in file:
+				# branch names can have spaces in them, they come last
+				parts = line.rstrip("\n").split(" ", 2)
+				# a line we were writing when we died doesn't end in a newline
+				if line.endswith("\n") and len(parts) in (2, 3) and parts[0].isdigit():
+					records.append((int(parts[0]), parts[1], parts[2] if len(parts) == 3 else None))
+			file.close()
+		for (revid, phase, branch) in records:
+			if phase == "done" and revid > self.done:
+				self.done = revid
+		for (revid, phase, branch) in records:
+			if revid > self.done:
+				self.partial.setdefault(revid, []).append((phase, branch))
+		self.loaded = True
+		
+		if compact and self.exists():
+			# only what a restart needs is kept
+			tmp_path = self.path + ".tmp"
+			file = open(tmp_path, "w")
+			if self.done != None:
+				file.write(self.format(self.done, "done", None))
+			for revid in sorted(self.partial):
+				for (phase, branch) in self.partial[revid]:
+					file.write(self.format(revid, phase, branch))
+			file.flush()
+			os.fsync(file.fileno())
+			file.close()
+			os.rename(tmp_path, self.path)
+	
+	def last_done(self):
+		return self.done
+	
+	def phases(self, revid):
+		return self.partial.get(revid, [])
+	
+	def committed(self, revid):
+		return set([branch for (phase, branch) in self.partial.get(revid, []) if phase == "committed"])
+	
+	def record(self, revid, phase, branch=None):
+		# with fast-import, commits only count once they're checkpointed
+		line = self.format(revid, phase, branch)
+		with self.lock:
+			if self.hold and phase in ("committed", "done"):
+				self.held.append((revid, phase, branch, line))
+				return
+			self.write(revid, phase, branch, line)
+	
+	def release(self):
+		with self.lock:
+			for (revid, phase, branch, line) in self.held:
+				self.write(revid, phase, branch, line)
+			self.held = []
+		self.sync()
+	
+	def discard(self):
+		with self.lock:
+			self.held = []
+	
+	def sync(self):
+		with self.lock:
+			if self.file != None:
+				self.file.flush()
+				os.fsync(self.file.fileno())
+	
+	def close(self):
+		self.sync()
+		with self.lock:
+			if self.file != None:
+				self.file.close()
+				self.file = None
+	
+	def write(self, revid, phase, branch, line):
+		if self.file == None:
+			self.file = open(self.path, "a")
+		# handed to the OS right away so it outlives us being killed, only
+		# sync() waits for the disk
+		self.file.write(line)
+		self.file.flush()
+		if phase == "done":
+			self.done = max(revid, self.done)
+			for old in [old for old in self.partial if old <= revid]:
+				del self.partial[old]
+		elif revid > self.done:
+			self.partial.setdefault(revid, []).append((phase, branch))
+	
+	def format(self, revid, phase, branch):
+		return "%s %s%s\n" % (revid, phase, " " + branch if branch else "")
+
+# keeps the log, changed paths and info2 results of past revisions in an
+# sqlite file, none of which can change once a revision is committed
+class MetaCache(object):
+	
+	def __init__(self, path, svn_url):
+		self.path		= path
+		self.lock		= threading.Lock()
+		self.db			= sqlite3.connect(path, timeout=60, check_same_thread=False)
+		self.hits		= 0
+		self.misses		= 0
+		
+		# hand back the same byte strings pysvn gave us
+		self.db.text_factory = str
+		self.db.executescript("""
+			CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT);
+			CREATE TABLE IF NOT EXISTS log_ranges (start INTEGER PRIMARY KEY, end INTEGER);
+			CREATE TABLE IF NOT EXISTS revisions (revision INTEGER PRIMARY KEY, author TEXT, date REAL, message TEXT);
+			CREATE TABLE IF NOT EXISTS changed_paths (revision INTEGER, seq INTEGER, action TEXT, path TEXT, copyfrom_path TEXT, copyfrom_rev INTEGER, PRIMARY KEY (revision, seq));
+			CREATE TABLE IF NOT EXISTS node_info (revision INTEGER, path TEXT, seq INTEGER, name TEXT, kind TEXT, url TEXT, changed INTEGER, PRIMARY KEY (revision, path, seq));
+			DROP TABLE IF EXISTS info;
+			DROP TABLE IF EXISTS path_info;
+		""")
+		
+		row = self.db.execute("SELECT value FROM settings WHERE name = 'svn_url'").fetchone()
+		if row == None or row[0] != svn_url:
+			# whatever is in there belongs to some other svn repo
+			for table in ("log_ranges", "revisions", "changed_paths", "node_info"):
+				self.db.execute("DELETE FROM %s" % table)
+			self.db.execute("INSERT OR REPLACE INTO settings VALUES ('svn_url', ?)", (svn_url,))
+			self.db.commit()
+	
+	def cached_to(self, revid):
+		# the last revision of the unbroken run of cached log entries that
+		# revid is in, or None if revid isn't cached
+		with self.lock:
+			row = self.db.execute("SELECT end FROM log_ranges WHERE start <= ? AND end >= ?", (revid, revid)).fetchone()
+		if row == None:
+			return None
+		return row[0]
+	
+	def next_cached(self, revid):
+		# where the next run of cached log entries after revid starts
+		with self.lock:
+			return self.db.execute("SELECT MIN(start) FROM log_ranges WHERE start > ?", (revid,)).fetchone()[0]
+	
+	def get_log(self, start, end):
+		log = []
+		with self.lock:
+			for (revid, author, date, message) in self.db.execute("SELECT revision, author, date, message FROM revisions WHERE revision BETWEEN ? AND ? ORDER BY revision", (start, end)).fetchall():
+				changed_paths = []
+				for (action, path, copyfrom_path, copyfrom_rev) in self.db.execute("SELECT action, path, copyfrom_path, copyfrom_rev FROM changed_paths WHERE revision = ? ORDER BY seq", (revid,)):
+					changed_paths.append(CachedEntry(
+						action=action,
+						path=path,
+						copyfrom_path=copyfrom_path,
+						copyfrom_revision=pysvn.Revision(pysvn.opt_revision_kind.number, copyfrom_rev) if copyfrom_rev != None else None
+					))
+				log.append(CachedEntry(
+					revision=pysvn.Revision(pysvn.opt_revision_kind.number, revid),
+					author=author,
+					date=date,
+					message=message,
+					changed_paths=changed_paths
+				))
+			self.hits += 1
+		return log
+	
+	def put_log(self, start, end, log):
+		with self.lock:
+			for rev in log:
+				revid = rev["revision"].number
+				self.db.execute("INSERT OR REPLACE INTO revisions VALUES (?, ?, ?, ?)", (revid, rev["author"], rev["date"], rev["message"]))
+				self.db.execute("DELETE FROM changed_paths WHERE revision = ?", (revid,))
+				seq = 0
+				for changed_path in rev["changed_paths"]:
+					copyfrom_rev = changed_path.copyfrom_revision.number if changed_path.copyfrom_revision != None else None
+					self.db.execute("INSERT INTO changed_paths VALUES (?, ?, ?, ?, ?, ?)", (revid, seq, changed_path.action, changed_path.path, changed_path.copyfrom_path, copyfrom_rev))
+					seq += 1
+			
+			# merge with the ranges this one overlaps or touches
+			for (range_start, range_end) in self.db.execute("SELECT start, end FROM log_ranges WHERE start <= ? AND end >= ?", (end + 1, start - 1)).fetchall():
+				start = min(start, range_start)
+				end = max(end, range_end)
+			self.db.execute("DELETE FROM log_ranges WHERE start >= ? AND end <= ?", (start, end))
+			self.db.execute("INSERT INTO log_ranges VALUES (?, ?)", (start, end))
+			self.db.commit()
+			self.misses += 1
+	
+	def info2(self, client, path, url, revid):
+		with self.lock:
+			rows = self.db.execute("SELECT name, kind, url, changed FROM node_info WHERE revision = ? AND path = ? ORDER BY seq", (revid, path)).fetchall()
+			if len(rows):
+				self.hits += 1
+				return [(name, CachedEntry(kind=getattr(pysvn.node_kind, kind), URL=url, last_changed_rev=pysvn.Revision(pysvn.opt_revision_kind.number, changed))) for (name, kind, url, changed) in rows]
+		
+		rev_info = client.info2(url, recurse=True, revision=pysvn.Revision(pysvn.opt_revision_kind.number, revid))
+		
+		with self.lock:
+			seq = 0
+			for (name, info) in rev_info:
+				self.db.execute("INSERT OR REPLACE INTO node_info VALUES (?, ?, ?, ?, ?, ?, ?)", (revid, path, seq, name, str(info.kind), info.URL, info.last_changed_rev.number))
+				seq += 1
+			self.misses += 1
+		return rev_info
+	
+	def count_files(self, path, revid):
+		# how many files info2 of path listed at revid, None if it isn't cached
+		with self.lock:
+			(rows, files) = self.db.execute("SELECT COUNT(*), SUM(kind = 'file') FROM node_info WHERE revision = ? AND path = ?", (revid, path)).fetchone()
+		if not rows:
+			return None
+		return files
+	
+	def commit(self):
+		with self.lock:
+			self.db.commit()
+	
+	def close(self):
+		with self.lock:
+			self.db.commit()
+			self.db.close()
+
+# remembers the content of files we've exported before, by svn path and the
+# last revision that changed it, which is all info2 can tell about a URL.
+# Files with the same content share the md5 it was stored under. Content is
+# found again as the git blob it became, or as a copy kept in the cache dir
+# which is trimmed to max_size bytes, least recently used first
+class BlobCache(object):
+	
+	def __init__(self, path, max_size):
+		self.path			= path
+		self.max_size		= max_size
+		self.lock			= threading.Lock()
+		self.seen			= set()
+		self.touched		= {}
+		self.git_hits		= 0
+		self.file_hits		= 0
+		self.misses			= 0
+		
+		if not os.path.isdir(path):
+			os.makedirs(path)
+		# shared by the worker processes of --shards
+		self.db = sqlite3.connect(os.path.join(path, "index.db"), timeout=60, check_same_thread=False)
+		self.db.text_factory = str
+		self.db.executescript("""
+			CREATE TABLE IF NOT EXISTS nodes (path TEXT, changed INTEGER, checksum TEXT, mode TEXT, PRIMARY KEY (path, changed));
+			CREATE TABLE IF NOT EXISTS blobs (checksum TEXT PRIMARY KEY, sha TEXT, mode TEXT, size INTEGER, stored INTEGER, used INTEGER);
+			DROP TABLE IF EXISTS paths;
+		""")
+		self.size = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs WHERE stored = 1").fetchone()[0]
+		self.clock = self.db.execute("SELECT COALESCE(MAX(used), 0) FROM blobs").fetchone()[0]
+	
+	def lookup(self, path, changed):
+		# returns (checksum, sha, mode) or None. Setting svn:executable
+		# changes the file too, so the mode comes with the path
+		if changed == None:
+			self.misses += 1
+			return None
+		with self.lock:
+			row = self.db.execute("SELECT b.checksum, b.sha, n.mode FROM nodes n JOIN blobs b ON b.checksum = n.checksum WHERE n.path = ? AND n.changed = ?", (path, changed)).fetchone()
+			if row == None:
+				self.misses += 1
+				return None
+			self.touch(row[0])
+			return row
+	
+	def store(self, path, changed, source):
+		# called once source is exported, it'll be in git by the time any
+		# later revision is applied
+		if changed == None or os.path.islink(source):
+			return
+		mode = "100755" if os.stat(source).st_mode & 0111 else "100644"
+		size = os.path.getsize(source)
+		md5 = hashlib.md5()
+		sha = hashlib.sha1("blob %d\0" % size)
+		file = open(source, "rb")
+		while True:
+			chunk = file.read(65536)
+			if chunk == "":
+				break
+			md5.update(chunk)
+			sha.update(chunk)
+		file.close()
+		checksum = md5.hexdigest()
+		sha = sha.hexdigest()
+		
+		with self.lock:
+			self.seen.add(sha)
+			self.db.execute("INSERT OR REPLACE INTO nodes VALUES (?, ?, ?, ?)", (path, changed, checksum, mode))
+			row = self.db.execute("SELECT stored FROM blobs WHERE checksum = ?", (checksum,)).fetchone()
+			stored = row != None and row[0] == 1
+			if not stored and size <= self.max_size:
+				dest = self.blob_path(checksum)
+				if not os.path.isdir(os.path.dirname(dest)):
+					os.makedirs(os.path.dirname(dest))
+				shutil.copyfile(source, dest)
+				self.size += size
+				stored = True
+			self.clock += 1
+			self.db.execute("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)", (checksum, sha, mode, size, 1 if stored else 0, self.clock))
+			self.touched.pop(checksum, None)
+			self.write_touched()
+			self.evict()
+			self.db.commit()
+	
+	def average_size(self):
+		with self.lock:
+			return self.db.execute("SELECT AVG(size) FROM blobs").fetchone()[0]
+	
+	def checksum(self, path, changed):
+		# the md5 of path as of the revision that last changed it
+		with self.lock:
+			row = self.db.execute("SELECT checksum FROM nodes WHERE path = ? AND changed = ?", (path, changed)).fetchone()
+			return row[0] if row != None else None
+	
+	def sha(self, checksum):
+		# the git blob a file with this md5 was exported as
+		with self.lock:
+			row = self.db.execute("SELECT sha FROM blobs WHERE checksum = ?", (checksum,)).fetchone()
+			return row[0] if row != None else None
+	
+	def fetch(self, checksum, mode, dest):
+		# copies a stored blob to dest, False if it isn't on disk anymore
+		# and has to be exported after all
+		with self.lock:
+			source = self.blob_path(checksum)
+			if not os.path.isfile(source):
+				self.db.execute("UPDATE blobs SET stored = 0 WHERE checksum = ?", (checksum,))
+				self.db.commit()
+				self.misses += 1
+				return False
+			shutil.copyfile(source, dest)
+			if mode == "100755":
+				os.chmod(dest, 0755)
+			self.file_hits += 1
+			return True
+	
+	def close(self):
+		with self.lock:
+			self.write_touched()
+			self.db.commit()
+			self.db.close()
+	
+	def touch(self, checksum):
+		# written with the next store, an update here would keep the
+		# database locked for the other processes sharing it until then
+		self.clock += 1
+		self.touched[checksum] = self.clock
+	
+	def write_touched(self):
+		self.db.executemany("UPDATE blobs SET used = ? WHERE checksum = ?", [(used, checksum) for (checksum, used) in self.touched.items()])
+		self.touched = {}
+	
+	def evict(self):
+		if self.size <= self.max_size:
+			return
+		for (checksum, size) in self.db.execute("SELECT checksum, size FROM blobs WHERE stored = 1 ORDER BY used").fetchall():
+			path = self.blob_path(checksum)
+			if os.path.isfile(path):
+				os.remove(path)
+			self.db.execute("UPDATE blobs SET stored = 0 WHERE checksum = ?", (checksum,))
+			self.size -= size
+			if self.size <= self.max_size:
+				break
+	
+	def blob_path(self, checksum):
+		return os.path.join(self.path, checksum[:2], checksum)
+
+# stands in for the log entries and info2 results pysvn returns, which can
+# be read as a dict or through attributes
+class CachedEntry(dict):
+	
+	def __getattr__(self, name):
+		try:
+			return self[name]
+		except KeyError:
+			raise AttributeError(name)
+
+# streams blobs, commits and ref updates into a single long-lived
+# "git fast-import" process instead of running git once per file
+class FastImport(object):
+	
+	def __init__(self, repo):
+		self.repo			= repo
+		self.proc			= None
+		self.next_mark		= 0
+		self.next_progress	= 0
+		self.heads			= {}
+		self.changes		= []
+		self.committer		= None
+		self.dirty			= False
+	
+	def start(self):
+		# "Name <email> 1300000000 +0000", we only want the name and email
+		self.committer = self.repo.run("git var GIT_COMMITTER_IDENT").strip().rsplit(" ", 2)[0]
+		
+		# --done makes a stream that ends without "done", because we died,
+		# fail instead of updating the refs past the last checkpoint
+		self.proc = Popen("git fast-import --quiet --force --done", shell=True, bufsize=65536, stdin=PIPE, stdout=PIPE, cwd=self.repo.repo_path)
+	
+	def add_file(self, path, source):
+		if os.path.islink(source):
+			mode = "120000"
+			data = os.readlink(source)
+		else:
+			mode = "100755" if os.stat(source).st_mode & 0111 else "100644"
+			file = open(source, "rb")
+			data = file.read()
+			file.close()
+		os.remove(source)
+		self.add_data(path, data, mode)
+	
+	def add_data(self, path, data, mode="100644"):
+		mark = self.mark()
+		self.write("blob\nmark :%d\n%s\n" % (mark, self.data(data)))
+		self.changes.append("M %s :%d %s\n" % (mode, mark, self.quote(path)))
+	
+	def add_ref(self, path, mode, sha):
+		# an object that is already in the repo
+		self.changes.append("M %s %s %s\n" % (mode, sha, self.quote(path)))
+	
+	def remove(self, path):
+		self.changes.append("D %s\n" % self.quote(path))
+	
+	def pending(self):
+		return [change for change in self.changes if not change.endswith(" .svnrev\n")]
+	
+	def commit(self, branch, message, author=None, date=None):
+		now = int(time.time())
+		mark = self.mark()
+		
+		cmd = "commit refs/heads/%s\nmark :%d\n" % (branch, mark)
+		if author != None:
+			cmd += "author %s <nobody@dojotoolkit.org> %d +0000\n" % (self.encode(author), int(date) if date != None else now)
+		elif date != None:
+			cmd += "author %s %d +0000\n" % (self.committer, int(date))
+		cmd += "committer %s %d +0000\n" % (self.committer, now)
+		cmd += self.data(message + "\n")
+		if self.head(branch):
+			cmd += "from %s\n" % self.head(branch)
+		cmd += "".join(self.changes) + "\n"
+		
+		self.write(cmd)
+		self.changes = []
+		self.heads[branch] = ":%d" % mark
+		self.dirty = True
+		return ":%d" % mark
+	
+	def head(self, branch):
+		# branches we haven't touched yet still come from the repo
+		if branch in self.heads:
+			return self.heads[branch]
+		if branch in self.repo.branches:
+			return "refs/heads/%s^0" % branch
+		return None
+	
+	def create_branch(self, branch, source, commit=None):
+		self.dirty = True
+		self.heads[branch] = commit or self.head(source)
+		self.write("reset refs/heads/%s\nfrom %s\n\n" % (branch, self.heads[branch]))
+	
+	def delete_branch(self, branch):
+		self.dirty = True
+		self.heads.pop(branch, None)
+		self.write("reset refs/heads/%s\nfrom %s\n\n" % (branch, "0" * 40))
+	
+	def create_tag(self, tag, source, message, commit=None):
+		self.dirty = True
+		self.write("tag %s\nfrom %s\ntagger %s %d +0000\n%s\n" % (tag, commit or self.head(source), self.committer, int(time.time()), self.data(message + "\n")))
+	
+	def delete_tag(self, tag):
+		self.dirty = True
+		self.write("reset refs/tags/%s\nfrom %s\n\n" % (tag, "0" * 40))
+	
+	def read_blob(self, branch, path):
+		# asks fast-import itself, so commits it hasn't written out yet count
+		head = self.head(branch)
+		if head == None:
+			return None
+		if not head.startswith(":"):
+			head = self.repo.run("""git rev-parse "%s" """ % head).strip()
+		
+		self.write("ls %s %s\n" % (head, self.quote(path)))
+		self.proc.stdin.flush()
+		line = self.proc.stdout.readline()
+		if line.startswith("missing "):
+			return None
+		(mode, kind, sha) = line.split("\t")[0].split(" ")
+		if kind != "blob":
+			return None
+		
+		self.write("cat-blob %s\n" % sha)
+		self.proc.stdin.flush()
+		size = int(self.proc.stdout.readline().split(" ")[2])
+		data = self.proc.stdout.read(size)
+		self.proc.stdout.readline()
+		return data
+	
+	def get_mark(self, mark):
+		self.write("get-mark %s\n" % mark)
+		self.proc.stdin.flush()
+		return self.proc.stdout.readline().strip()
+	
+	def checkpoint(self):
+		# wait until fast-import has written everything so far to disk
+		if not self.dirty:
+			self.repo.journal.release()
+			return
+		self.dirty = False
+		self.next_progress += 1
+		token = "checkpoint %d" % self.next_progress
+		self.write("checkpoint\n\nprogress %s\n\n" % token)
+		self.proc.stdin.flush()
+		while True:
+			line = self.proc.stdout.readline()
+			if line == "":
+				raise RuntimeError("git fast-import exited unexpectedly")
+			if line.strip() == "progress " + token:
+				break
+		self.repo.journal.release()
+	
+	def close(self):
+		self.write("done\n")
+		self.proc.stdin.close()
+		return_code = self.proc.wait()
+		if return_code != 0:
+			raise RuntimeError("Failed running git fast-import return code=%s" % return_code)
+		self.repo.journal.release()
+		self.repo.journal.hold = False
+	
+	def abort(self):
+		# anything after the last checkpoint is thrown away
+		if self.proc.poll() == None:
+			self.proc.kill()
+			self.proc.wait()
+		self.repo.journal.discard()
+		self.repo.journal.hold = False
+	
+	def mark(self):
+		self.next_mark += 1
+		return self.next_mark
+	
+	def data(self, data):
+		data = self.encode(data)
+		return "data %d\n%s" % (len(data), data)
+	
+	def encode(self, s):
+		if isinstance(s, unicode):
+			return s.encode("utf-8")
+		return s
+	
+	def quote(self, path):
+		path = self.encode(path)
+		if path.startswith('"') or "\n" in path:
+			return '"%s"' % path.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+		return path
+	
+	def write(self, s):
+		self.proc.stdin.write(s)
+
+# exports files from svn on several threads at once, each thread gets its
+# own pysvn.Client since a client can't be shared between threads
+class ExportPool(object):
+	
+	def __init__(self, repo, num_workers=1, retries=2):
+		self.repo			= repo
+		self.num_workers	= num_workers
+		self.retries		= retries
+		self.queue			= Queue.Queue()
+		self.threads		= []
+		self.lock			= threading.Lock()
+	
+	def export(self, jobs, revid, client, recurse=False, logln=None):
+		# jobs are (url, dest) tuples, returns once every one of them is on
+		# disk. client is only used when there's nothing to parallelize.
+		# With recurse the urls are whole trees, without the externals they
+		# point to like every other export. The workers only collect what
+		# there is to say, it goes to logln from the calling thread once
+		# they're done. Each call has its own, the prefetch thread and the
+		# git side can both be exporting
+		logln = logln or self.repo.logln
+		revision = pysvn.Revision(pysvn.opt_revision_kind.number, revid)
+		notes = []
+		failures = []
+		
+		if self.num_workers <= 1 or len(jobs) <= 1:
+			for (url, dest) in jobs:
+				self.export_file(client, url, dest, revision, recurse, notes, failures)
+		else:
+			self.start()
+			done = threading.Semaphore(0)
+			for (url, dest) in jobs:
+				self.queue.put((url, dest, revision, recurse, notes, failures, done))
+			for job in jobs:
+				done.acquire()
+		
+		for note in notes:
+			logln(note)
+		if len(failures):
+			for (url, error) in failures:
+				logln("Failed exporting %s: %s" % (url, error))
+			raise RuntimeError("Failed exporting {0} file{1} from svn".format(len(failures), "s" if len(failures) != 1 else ""))
+	
+	def export_file(self, client, url, dest, revision, recurse, notes, failures):
+		attempt = 0
+		while True:
+			try:
+				client.export(url, dest, force=recurse, recurse=recurse, ignore_externals=True, revision=revision)
+				return
+			except pysvn.ClientError as e:
+				attempt += 1
+				if attempt > self.retries:
+					with self.lock:
+						failures.append((url, str(e)))
+					return
+				with self.lock:
+					notes.append("Retrying export of %s (%s)" % (url, e))
+				time.sleep(attempt)
+	
+	def start(self):
+		while len(self.threads) < self.num_workers:
+			thread = threading.Thread(target=self.work)
+			thread.daemon = True
+			thread.start()
+			self.threads.append(thread)
+	
+	def work(self):
+		client = pysvn.Client()
+		while True:
+			(url, dest, revision, recurse, notes, failures, done) = self.queue.get()
+			try:
+				self.export_file(client, url, dest, revision, recurse, notes, failures)
+			except Exception as e:
+				with self.lock:
+					failures.append((url, str(e)))
+			done.release()
+
+# fetches the svn log of a range of revisions on a few threads at once, each
+# taking the next window as soon as it's done with its last one. Windows are
+# sized from how long the last ones took for how many changed paths, and
+# handed out in revision order
+class LogFetcher(object):
+	
+	min_window		= 10
+	max_window		= 2000
+	target_seconds	= 2.0
+	
+	def __init__(self, repo, start_revid, end_revid, num_workers=3, retries=2):
+		self.repo				= repo
+		self.start_revid		= start_revid
+		self.end_revid			= end_revid
+		self.num_workers		= max(1, num_workers)
+		self.retries			= retries
+		self.next_revid			= start_revid
+		self.window				= min(100, self.max_window)
+		self.paths_per_rev		= None
+		self.seconds_per_path	= None
+		self.windows			= {}
+		self.pending			= 0
+		self.stopped			= False
+		self.lock				= threading.Condition()
+	
+	def entries(self, logln=None):
+		# the workers' retries are logged from here, by whoever is reading
+		logln = logln or self.repo.logln
+		for x in xrange(self.num_workers):
+			thread = threading.Thread(target=self.work)
+			thread.daemon = True
+			thread.start()
+		
+		revid = self.start_revid
+		while revid <= self.end_revid:
+			with self.lock:
+				while revid not in self.windows:
+					# a timeout keeps ctrl-c working while we wait
+					self.lock.wait(1)
+				(end_revid, log, error, notes) = self.windows.pop(revid)
+				self.pending -= 1
+				self.lock.notify_all()
+			for note in notes:
+				logln(note)
+			if error != None:
+				raise error[0], error[1], error[2]
+			for rev in log:
+				yield rev
+			revid = end_revid + 1
+	
+	def stop(self):
+		with self.lock:
+			self.stopped = True
+			self.lock.notify_all()
+	
+	def work(self):
+		client = pysvn.Client()
+		while True:
+			# never more than two windows per worker waiting to be read
+			with self.lock:
+				while not self.stopped and self.next_revid <= self.end_revid and self.pending >= self.num_workers * 2:
+					self.lock.wait(1)
+				if self.stopped or self.next_revid > self.end_revid:
+					return
+				start_revid = self.next_revid
+				end_revid = min(start_revid + self.window - 1, self.end_revid)
+				self.next_revid = end_revid + 1
+				self.pending += 1
+			
+			notes = []
+			try:
+				result = (end_revid, self.fetch(client, start_revid, end_revid, notes), None, notes)
+			except Exception:
+				result = (end_revid, None, sys.exc_info(), notes)
+			with self.lock:
+				self.windows[start_revid] = result
+				self.lock.notify_all()
+			if result[2] != None:
+				return
+	
+	def fetch(self, client, start_revid, end_revid, notes):
+		attempt = 0
+		while True:
+			start = time.time()
+			try:
+				log = client.log(
+					self.repo.svn_url,
+					revision_start=pysvn.Revision(pysvn.opt_revision_kind.number, start_revid),
+					revision_end=pysvn.Revision(pysvn.opt_revision_kind.number, end_revid),
+					discover_changed_paths=True
+				)
+				break
+			except pysvn.ClientError as e:
+				attempt += 1
+				if attempt > self.retries:
+					raise
+				notes.append("Retrying svn log of rev %s to %s (%s)" % (start_revid, end_revid, e))
+				time.sleep(attempt)
+		seconds = time.time() - start
+		num_paths = sum([len(rev["changed_paths"]) for rev in log])
+		self.repo.metrics.record_apart("svn log", seconds, { "revisions": [start_revid, end_revid], "paths": num_paths })
+		if self.repo.meta_cache:
+			self.repo.meta_cache.put_log(start_revid, end_revid, log)
+		self.resize(end_revid - start_revid + 1, num_paths, seconds)
+		return log
+	
+	def resize(self, num_revs, num_paths, seconds):
+		# aims for windows that take about target_seconds each, so busy
+		# stretches of history get small windows and quiet ones or a slow
+		# round trip big ones
+		num_paths = max(num_paths, 1)
+		with self.lock:
+			if self.paths_per_rev == None:
+				self.paths_per_rev = num_paths / float(num_revs)
+				self.seconds_per_path = seconds / num_paths
+			else:
+				self.paths_per_rev = (self.paths_per_rev + num_paths / float(num_revs)) / 2
+				self.seconds_per_path = (self.seconds_per_path + seconds / num_paths) / 2
+			seconds_per_rev = max(self.paths_per_rev * self.seconds_per_path, 0.000001)
+			self.window = int(max(self.min_window, min(self.max_window, self.target_seconds / seconds_per_rev)))
+
+# reads an "svnadmin dump" or "svnrdump dump" stream one record at a time,
+# node contents are never held in memory but copied straight to disk
+class DumpReader(object):
+	
+	def __init__(self, stream):
+		self.stream		= stream
+		self.remaining	= 0
+	
+	def records(self):
+		# yields (headers, props) for every record, the text of a node can be
+		# read with save() before asking for the next record
+		while True:
+			self.skip(self.remaining)
+			headers = self.read_headers()
+			if headers == None:
+				return
+			
+			prop_length = int(headers.get("Prop-content-length", 0))
+			text_length = int(headers.get("Text-content-length", 0))
+			content_length = int(headers.get("Content-length", prop_length + text_length))
+			
+			props = None
+			if prop_length > 0:
+				props = self.read_props(self.read(prop_length))
+			self.remaining = content_length - prop_length
+			
+			yield (headers, props)
+	
+	def save(self, dest, base=None):
+		# writes the text of the current node to dest, deltas are applied
+		# against the base text (the empty string if there is none)
+		length = self.remaining
+		self.remaining = 0
+		file = open(dest, "wb")
+		if base != None:
+			file.write(self.apply_delta(base, self.read(length)))
+		else:
+			while length > 0:
+				chunk = self.read(min(length, 65536))
+				file.write(chunk)
+				length -= len(chunk)
+		file.close()
+	
+	def read_text(self):
+		length = self.remaining
+		self.remaining = 0
+		return self.read(length)
+	
+	def read_headers(self):
+		headers = {}
+		while True:
+			line = self.stream.readline()
+			if line == "":
+				return headers if len(headers) else None
+			line = line.rstrip("\n")
+			if line == "":
+				if len(headers):
+					return headers
+				continue
+			(key, value) = line.split(": ", 1) if ": " in line else (line.rstrip(":"), "")
+			headers[key] = value
+	
+	def read_props(self, data):
+		props = {}
+		pos = 0
+		while pos < len(data):
+			end = data.index("\n", pos)
+			line = data[pos:end]
+			pos = end + 1
+			if line == "PROPS-END":
+				break
+			(kind, length) = line.split(" ")
+			key = data[pos:pos + int(length)]
+			pos += int(length) + 1
+			if kind == "D":
+				# removed by a Prop-delta
+				props[key] = None
+				continue
+			end = data.index("\n", pos)
+			length = int(data[pos:end].split(" ")[1])
+			pos = end + 1
+			props[key] = data[pos:pos + length]
+			pos += length + 1
+		return props
+	
+	def read(self, length):
+		data = self.stream.read(length)
+		if len(data) != length:
+			raise RuntimeError("Unexpected end of svn dump stream")
+		return data
+	
+	def skip(self, length):
+		while length > 0:
+			length -= len(self.read(min(length, 65536)))
+	
+	def apply_delta(self, source, delta):
+		# svndiff version 0 and 1 (zlib), as written by svnadmin dump --deltas
+		# and svnrdump
+		if delta[:3] != "SVN" or delta[3] not in "\0\1":
+			raise RuntimeError("Unsupported svndiff format in svn dump stream")
+		version = ord(delta[3])
+		target = []
+		pos = 4
+		while pos < len(delta):
+			(sview_offset, pos) = self.read_int(delta, pos)
+			(sview_len, pos) = self.read_int(delta, pos)
+			(tview_len, pos) = self.read_int(delta, pos)
+			(ins_len, pos) = self.read_int(delta, pos)
+			(new_len, pos) = self.read_int(delta, pos)
+			instructions = delta[pos:pos + ins_len]
+			pos += ins_len
+			new_data = delta[pos:pos + new_len]
+			pos += new_len
+			if version == 1:
+				instructions = self.inflate(instructions)
+				new_data = self.inflate(new_data)
+			
+			view = source[sview_offset:sview_offset + sview_len]
+			window = bytearray()
+			new_pos = 0
+			i = 0
+			while i < len(instructions):
+				op = ord(instructions[i]) >> 6
+				length = ord(instructions[i]) & 0x3f
+				i += 1
+				if length == 0:
+					(length, i) = self.read_int(instructions, i)
+				if op == 0:
+					(offset, i) = self.read_int(instructions, i)
+					window += view[offset:offset + length]
+				elif op == 1:
+					# may overlap the bytes it is producing, so go one at a time
+					(offset, i) = self.read_int(instructions, i)
+					for x in xrange(length):
+						window.append(window[offset + x])
+				else:
+					window += new_data[new_pos:new_pos + length]
+					new_pos += length
+			if len(window) != tview_len:
+				raise RuntimeError("Corrupt svndiff window in svn dump stream")
+			target.append(str(window))
+		return "".join(target)
+	
+	def inflate(self, data):
+		(length, pos) = self.read_int(data, 0)
+		if len(data) - pos == length:
+			return data[pos:]
+		return zlib.decompress(data[pos:])
+	
+	def read_int(self, data, pos):
+		value = 0
+		while True:
+			c = ord(data[pos])
+			pos += 1
+			value = (value << 7) | (c & 0x7f)
+			if c & 0x80 == 0:
+				return (value, pos)
+
 if __name__ == "__main__":
 	print "Dojo Toolkit svn->git Tool"
 	
-	if len(sys.argv) < 2:
-		print "Usage: python dojosvn2git.py <repo dir> [<github account username>]"
+	parser = OptionParser(usage="python dojosvn2git.py [options] <repo dir> [<github account username>]")
+	parser.add_option("--fast-import", action="store_true", dest="fast_import", default=False,
+		help="write commits through a single git fast-import process instead of running git for every file")
+	parser.add_option("--check-refs", action="store_true", dest="check_refs", default=False,
+		help="debug: compare the cached branches, tags and HEAD against git after every revision")
+	parser.add_option("--export-workers", type="int", dest="export_workers", default=1, metavar="N",
+		help="number of files to export from svn at the same time [default: %default]")
+	parser.add_option("--export-retries", type="int", dest="export_retries", default=2, metavar="N",
+		help="how many times to retry a failed export before giving up [default: %default]")
+	parser.add_option("--prefetch", type="int", dest="prefetch", default=0, metavar="N",
+		help="classify and export up to N revisions ahead while git is busy committing [default: %default]")
+	parser.add_option("--log-workers", type="int", dest="log_workers", default=3, metavar="N",
+		help="number of svn log windows to fetch at the same time [default: %default]")
+	parser.add_option("--dump", dest="dump_file", default=None, metavar="FILE",
+		help="read history from an svnadmin dump or svnrdump stream instead of the svn server, - for stdin")
+	parser.add_option("--blob-cache", dest="blob_cache_path", default=None, metavar="DIR",
+		help="where to keep copies of exported files [default: <repo dir>/.git/svn2git-blobs]")
+	parser.add_option("--blob-cache-size", dest="blob_cache_size", type="int", default=512, metavar="MB",
+		help="how much the blob cache may keep on disk [default: %default]")
+	parser.add_option("--svn-url", dest="svn_url", default="http://svn.dojotoolkit.org/src", metavar="URL",
+		help="root of the svn repo to import from [default: %default]")
+	parser.add_option("--start-rev", dest="start_revid", type="int", default=15378, metavar="REV",
+		help="svn revision a new repo starts from [default: %default, the 1.2 release]")
+	parser.add_option("--shards", type="int", dest="shards", default=0, metavar="N",
+		help="import the projects of a new repo side by side in N worker processes, then merge them [default: off]")
+	parser.add_option("--remote-url", dest="remote_url", default=None, metavar="URL",
+		help="push to URL instead of the github repo of <github account username>")
+	parser.add_option("--push-every", type="int", dest="push_every", default=0, metavar="N",
+		help="push in the background every N revisions while the import goes on [default: only at the end]")
+	parser.add_option("--maintain-every", type="int", dest="maintain_every", default=25000, metavar="N",
+		help="repack in the background after about N new git objects, 0 leaves it to git gc [default: %default]")
+	parser.add_option("--include", action="append", dest="includes", default=None, metavar="PATH",
+		help="only mirror svn paths under PATH, a glob like tags/release-1.* works too, can be given more than once [default: everything]")
+	parser.add_option("--exclude", action="append", dest="excludes", default=None, metavar="PATH",
+		help="leave svn paths under PATH out of the mirror, can be given more than once")
+	parser.add_option("--targets", dest="targets", default=None, metavar="FILE",
+		help="sync every repo listed in the JSON file FILE from one fetch from svn instead of the repo dir")
+	parser.add_option("--watch", action="store_true", dest="watch", default=False,
+		help="keep running and sync new revisions as they land")
+	parser.add_option("--poll-min", type="int", dest="poll_min", default=5, metavar="SECONDS",
+		help="shortest time between two looks at the svn HEAD with --watch [default: %default]")
+	parser.add_option("--poll-max", type="int", dest="poll_max", default=300, metavar="SECONDS",
+		help="longest time between two looks at the svn HEAD with --watch [default: %default]")
+	parser.add_option("--status-file", dest="status_path", default=None, metavar="FILE",
+		help="with --watch, keep the state of the watch in FILE as JSON")
+	parser.add_option("--plan", dest="plan", default=None, metavar="REV:REV",
+		help="print what syncing a range of svn revisions would do instead of syncing, : for everything not synced yet")
+	parser.add_option("--verify", dest="verify", default=None, metavar="REV:REV",
+		help="compare the commits for a range of svn revisions against svn instead of syncing, either end can be left out")
+	parser.add_option("--verify-sample", type="int", dest="verify_sample", default=0, metavar="N",
+		help="with --verify, only check N commits spread over the range [default: all]")
+	parser.add_option("--verify-output", dest="verify_output", default=None, metavar="FILE",
+		help="with --verify, write the mismatches to FILE as JSON lines, - for stdout")
+	parser.add_option("--metrics", dest="metrics_path", default=None, metavar="FILE",
+		help="append per-revision timings to FILE as JSON lines and print a summary at the end")
+	parser.add_option("--rebuild-revmap", dest="rebuild_revmap", action="store_true", default=False,
+		help="rebuild the svn revision to git commit map from the git history")
+	parser.add_option("--meta-cache", dest="meta_cache_path", default=None, metavar="FILE",
+		help="where to keep the svn log and info cache [default: <repo dir>/.git/svn2git-meta.db]")
+	(options, args) = parser.parse_args()
+	
+	if options.targets != None:
+		# the caches are shared by the targets, so they live next to the file
+		# naming them instead of in any one repo
+		targets_dir = os.path.dirname(os.path.abspath(options.targets))
+		file = open(options.targets)
+		targets = json.load(file)
+		file.close()
+		if not isinstance(targets, list) or not len(targets):
+			print "%s has to be a JSON list of targets" % options.targets
+			sys.exit(1)
+		for target in targets:
+			if isinstance(target, dict) and target.get("repo"):
+				target["repo"] = os.path.join(targets_dir, target["repo"])
+		r = Repo(targets_dir, "", use_fast_import=options.fast_import, export_workers=options.export_workers, export_retries=options.export_retries,
+			prefetch=options.prefetch, log_workers=options.log_workers, dump_file=options.dump_file,
+			meta_cache_path=options.meta_cache_path or os.path.join(targets_dir, "svn2git-meta.db"),
+			blob_cache_path=options.blob_cache_path or os.path.join(targets_dir, "svn2git-blobs"), blob_cache_size=options.blob_cache_size,
+			svn_url=options.svn_url, start_revid=options.start_revid, maintain_every=options.maintain_every)
+		sys.exit(r.sync_targets(targets))
+	
+	if len(args) < 1:
+		print "Usage: python dojosvn2git.py [options] <repo dir> [<github account username>]"
 		sys.exit(1)
 	
-	r = Repo(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else "")
+	r = Repo(args[0], args[1] if len(args) > 1 else "", use_fast_import=options.fast_import, check_refs=options.check_refs,
+		export_workers=options.export_workers, export_retries=options.export_retries,
+		prefetch=options.prefetch, log_workers=options.log_workers, dump_file=options.dump_file, meta_cache_path=options.meta_cache_path, rebuild_revmap=options.rebuild_revmap,
+		blob_cache_path=options.blob_cache_path, blob_cache_size=options.blob_cache_size, metrics_path=options.metrics_path,
+		svn_url=options.svn_url, start_revid=options.start_revid, shards=options.shards,
+		remote_url=options.remote_url, push_every=options.push_every, maintain_every=options.maintain_every,
+		includes=options.includes or (), excludes=options.excludes or ())
+	if options.plan != None:
+		(first, sep, last) = options.plan.partition(":")
+		if not sep:
+			last = first
+		sys.exit(r.plan(int(first) if first else None, int(last) if last else None))
+	if options.verify != None:
+		(first, sep, last) = options.verify.partition(":")
+		if not sep:
+			last = first
+		sys.exit(r.verify(int(first) if first else None, int(last) if last else None, options.verify_sample, options.verify_output))
+	if options.watch:
+		sys.exit(r.watch(options.poll_min, max(options.poll_min, options.poll_max), options.status_path))
 	sys.exit(r.go())
@@ -0,0 +1,136 @@
+# Copyright (c) 2011 Chris Barber <chris@cb1inc.com>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. The name of the author may not be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# what the tests share: dojosvn2git imported on top of the svn stub, a
+# temporary directory per test and a small svn history with the Dojo layout
+
+import os, sys, shutil, tempfile, unittest, subprocess, StringIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import svnstub
+svnstub.install(svnstub.SvnRepo())
+import dojosvn2git
+
+PROJECTS = ("dojo", "dijit", "dojox", "util", "demos")
+
+# the trunks with a file or two each, branches and tags, like the 1.2
+# snapshot the tool starts from. Returns the revision it's in
+def layout(svn):
+	dirs = ["branches", "tags"]
+	files = {}
+	for project in PROJECTS:
+		dirs += [project, project + "/trunk", project + "/trunk/_base"]
+		files[project + "/trunk/README"] = "%s\n" % project
+		files[project + "/trunk/_base/base.js"] = "// %s base\n" % project
+	return svn.commit("Initial layout", dirs=dirs, files=files)
+
+# the layout and then trunk changes, a new directory, a branch with fixes
+# of its own, a tag of the branch and the branch going away again
+def history(svn):
+	layout(svn)
+	svn.commit("Tweak dojo", files={ "dojo/trunk/README":"dojo, tweaked\n" })
+	svn.commit("Add dnd", dirs=["dojo/trunk/dnd"], files={ "dojo/trunk/dnd/Source.js":"source\n", "dojo/trunk/dnd/Target.js":"target\n" })
+	svn.commit("Branch 1.3", dirs=["branches/1.3"], copies=[("branches/1.3/dojo", "dojo/trunk", 3), ("branches/1.3/dijit", "dijit/trunk", 3)])
+	svn.commit("Fix on the branch", files={ "branches/1.3/dojo/README":"dojo 1.3\n" })
+	svn.commit("Both", files={ "dojo/trunk/_base/base.js":"// dojo base, changed\n", "branches/1.3/dijit/README":"dijit 1.3\n" })
+	svn.commit("Tag 1.3.0", copies=[("tags/release-1.3.0", "branches/1.3", 6)])
+	svn.commit("Drop the branch", deletes=["branches/1.3"])
+	return svn.head()
+
+class TestCase(unittest.TestCase):
+
+	def setUp(self):
+		self.tmp = tempfile.mkdtemp(prefix="svn2git-test-")
+		self.svn = svnstub.SvnRepo()
+		svnstub.install(self.svn)
+		# the tool talks a lot, only a failing test needs to see it
+		self.stdout = sys.stdout
+		sys.stdout = StringIO.StringIO()
+
+	def tearDown(self):
+		output = sys.stdout.getvalue()
+		sys.stdout = self.stdout
+		if hasattr(self, "_resultForDoCleanups") and len(self._resultForDoCleanups.failures + self._resultForDoCleanups.errors):
+			sys.stderr.write(output[-4000:])
+		shutil.rmtree(self.tmp, True)
+
+	def output(self):
+		return sys.stdout.getvalue()
+
+	def repo(self, name="repo", **options):
+		options.setdefault("svn_url", self.svn.root)
+		options.setdefault("start_revid", 1)
+		return dojosvn2git.Repo(os.path.join(self.tmp, name), "", **options)
+
+	def sync(self, name="repo", **options):
+		repo = self.repo(name, **options)
+		result = repo.go()
+		self.assertEqual(result, 0, "sync failed:\n" + self.output()[-4000:])
+		return repo
+
+	def crash(self, name, revid, phase, **options):
+		# syncs in a child process that dies the moment the journal is
+		# about to record phase for revid, like kill -9 would
+		pid = os.fork()
+		if pid == 0:
+			try:
+				record = dojosvn2git.Journal.record
+				def dying(journal, rev, what, branch=None):
+					if (rev, what) == (revid, phase):
+						os._exit(3)
+					return record(journal, rev, what, branch)
+				dojosvn2git.Journal.record = dying
+				self.repo(name, **options).go()
+			finally:
+				os._exit(0)
+		self.assertEqual(os.waitpid(pid, 0)[1] >> 8, 3, "the sync didn't get to rev %s %s" % (revid, phase))
+
+	def git(self, path, *args):
+		proc = subprocess.Popen(["git"] + list(args), cwd=os.path.join(self.tmp, path), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+		output = proc.communicate()[0]
+		if proc.returncode != 0:
+			raise RuntimeError("git %s failed in %s" % (" ".join(args), path))
+		return output
+
+	def tree(self, path, ref="master"):
+		# { path: content } of every file the ref has
+		files = {}
+		for line in self.git(path, "ls-tree", "-r", ref).splitlines():
+			(info, name) = line.split("\t", 1)
+			files[name] = self.git(path, "cat-file", "blob", info.split()[2])
+		return files
+
+	def subjects(self, path, ref="master"):
+		return self.git(path, "log", "--format=%s", ref).splitlines()
+
+	def refs(self, path):
+		# {ref: (subject, tree)} of every branch and tag
+		refs = {}
+		for line in self.git(path, "for-each-ref", "--format=%(refname) %(objectname)", "refs/heads", "refs/tags").splitlines():
+			(ref, sha) = line.split(" ")
+			refs[ref] = tuple(self.git(path, "log", "-1", "--format=%s%n%T", sha).splitlines())
+		return refs
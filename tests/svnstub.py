@@ -0,0 +1,291 @@
+# Copyright (c) 2011 Chris Barber <chris@cb1inc.com>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+# 3. The name of the author may not be used to endorse or promote products
+#    derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+# PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# an in-memory svn repo and a pysvn module that serves it, so the tests run
+# without python-svn or an svn server. Only what dojosvn2git.py calls is
+# there, and it answers the way pysvn does for URLs: info2 has the last
+# changed revision but no checksum, that needs a working copy
+
+import os, sys, time, types, hashlib, threading
+
+class opt_revision_kind(object):
+	number		= "number"
+	head		= "head"
+
+class node_kind(object):
+	none		= "none"
+	file		= "file"
+	dir			= "dir"
+
+class Revision(object):
+
+	def __init__(self, kind, number=None):
+		self.kind	= kind
+		self.number	= number
+
+class ClientError(Exception):
+	pass
+
+# pysvn hands back dicts whose keys can be read as attributes too
+class Entry(dict):
+
+	def __getattr__(self, name):
+		try:
+			return self[name]
+		except KeyError:
+			raise AttributeError(name)
+
+# the history as a full tree of nodes per revision. A node is a dict with
+# kind, changed (the revision that made it what it is), content and props
+class SvnRepo(object):
+
+	def __init__(self, root="http://svn.example.org/src"):
+		self.root		= root
+		self.trees		= [{ "": { "kind":"dir", "changed":0, "props":{} } }]
+		self.log		= [Entry(revision=Revision(opt_revision_kind.number, 0), author="", date=0.0, message="", changed_paths=[])]
+		self.calls		= {}
+		self.lock		= threading.Lock()
+
+	def head(self):
+		return len(self.trees) - 1
+
+	def commit(self, message, author="tester", dirs=(), files={}, deletes=(), copies=(), props={}, date=None):
+		# deletes go first, then copies of (path, from_path, from_rev), then
+		# the new directories and the files, new or changed
+		revid = len(self.trees)
+		tree = dict(self.trees[-1])
+		changed_paths = []
+		actions = {}
+
+		for path in deletes:
+			for key in [key for key in tree if key == path or key.startswith(path + "/")]:
+				del tree[key]
+			actions[path] = "D"
+		for (path, from_path, from_rev) in copies:
+			source = self.trees[from_rev]
+			for key in [key for key in source if key == from_path or key.startswith(from_path + "/")]:
+				# what's under the copy keeps the revision it was changed in
+				node = dict(source[key])
+				if key == from_path:
+					node["changed"] = revid
+				tree[path + key[len(from_path):]] = node
+			actions[path] = ("R" if path in actions else "A", from_path, from_rev)
+		for path in dirs:
+			tree[path] = { "kind":"dir", "changed":revid, "props":{} }
+			actions[path] = "R" if path in actions else "A"
+		for (path, content) in sorted(files.items()):
+			action = "M" if path in tree and path not in actions else ("R" if path in actions else "A")
+			tree[path] = { "kind":"file", "changed":revid, "content":content, "props":{} }
+			actions[path] = action
+		for (path, values) in props.items():
+			node = dict(tree[path])
+			node["props"] = dict(node["props"], **values)
+			node["changed"] = revid
+			tree[path] = node
+			actions.setdefault(path, "M")
+
+		for path in sorted(actions):
+			action = actions[path]
+			if isinstance(action, tuple):
+				changed_paths.append(Entry(action=action[0], path="/" + path, copyfrom_path="/" + action[1], copyfrom_revision=Revision(opt_revision_kind.number, action[2])))
+			else:
+				changed_paths.append(Entry(action=action, path="/" + path, copyfrom_path=None, copyfrom_revision=None))
+		self.trees.append(tree)
+		self.log.append(Entry(revision=Revision(opt_revision_kind.number, revid), author=author, date=date if date != None else 1300000000.0 + revid * 60, message=message, changed_paths=changed_paths))
+		return revid
+
+	def path(self, url):
+		url = url.replace("%20", " ")
+		if not url.startswith(self.root):
+			raise ClientError("%s is not in %s" % (url, self.root))
+		return url[len(self.root):].strip("/")
+
+	def url(self, path):
+		return (self.root + "/" + path).rstrip("/").replace(" ", "%20")
+
+	def tree(self, revision):
+		if revision == None or revision.kind == opt_revision_kind.head:
+			return (self.head(), self.trees[-1])
+		if revision.number > self.head():
+			raise ClientError("No such revision %s" % revision.number)
+		return (revision.number, self.trees[revision.number])
+
+	def count(self, name):
+		with self.lock:
+			self.calls[name] = self.calls.get(name, 0) + 1
+
+	def dump(self, stream):
+		# the history as "svnadmin dump" would write it, full texts and no
+		# deltas. What's under a copied directory comes along with the copy
+		stream.write("SVN-fs-dump-format-version: 2\n\nUUID: 5f1f9c3e-0000-4000-8000-000000000001\n\n")
+		for entry in self.log:
+			revid = entry.revision.number
+			date = time.strftime("%Y-%m-%dT%H:%M:%S.000000Z", time.gmtime(entry.date))
+			props = self.props({ "svn:log":entry.message, "svn:author":entry.author, "svn:date":date })
+			stream.write("Revision-number: %d\nProp-content-length: %d\nContent-length: %d\n\n%s\n" % (revid, len(props), len(props), props))
+			for changed_path in entry.changed_paths:
+				path = changed_path.path.strip("/")
+				stream.write("Node-path: %s\n" % path)
+				if changed_path.action == "D":
+					stream.write("Node-action: delete\n\n\n")
+					continue
+				node = self.trees[revid][path]
+				stream.write("Node-kind: %s\nNode-action: %s\n" % (node["kind"], { "A":"add", "M":"change", "R":"replace" }[changed_path.action]))
+				if changed_path.copyfrom_path != None:
+					stream.write("Node-copyfrom-rev: %d\nNode-copyfrom-path: %s\n\n\n" % (changed_path.copyfrom_revision.number, changed_path.copyfrom_path.strip("/")))
+					continue
+				props = self.props(node["props"])
+				text = node.get("content")
+				if text == None:
+					stream.write("Prop-content-length: %d\nContent-length: %d\n\n%s\n\n" % (len(props), len(props), props))
+					continue
+				stream.write("Prop-content-length: %d\nText-content-length: %d\nText-content-md5: %s\nContent-length: %d\n\n" % (len(props), len(text), hashlib.md5(text).hexdigest(), len(props) + len(text)))
+				stream.write(props + text + "\n\n")
+
+	def props(self, props):
+		data = ""
+		for (key, value) in sorted(props.items()):
+			data += "K %d\n%s\nV %d\n%s\n" % (len(key), key, len(value), value)
+		return data + "PROPS-END\n"
+
+class Client(object):
+
+	repo = None
+
+	def log(self, url, revision_start=None, revision_end=None, discover_changed_paths=False, limit=0):
+		repo = self.repo
+		repo.count("log")
+		start = repo.tree(revision_start)[0]
+		end = repo.tree(revision_end)[0]
+		log = []
+		for rev in repo.log[start:end + 1]:
+			log.append(Entry(rev, changed_paths=rev["changed_paths"] if discover_changed_paths else []))
+		return log[:limit] if limit else log
+
+	def info2(self, url, recurse=True, revision=None):
+		repo = self.repo
+		repo.count("info2")
+		(revid, tree) = repo.tree(revision)
+		path = repo.path(url)
+		if path not in tree:
+			raise ClientError("%s does not exist in revision %s" % (url, revid))
+		info = [(os.path.basename(path), self.info(repo, tree, path, revid))]
+		if recurse and tree[path]["kind"] == "dir":
+			prefix = path + "/" if path else ""
+			for key in sorted(tree):
+				if key != path and key.startswith(prefix):
+					info.append((key[len(prefix):], self.info(repo, tree, key, revid)))
+		return info
+
+	def info(self, repo, tree, path, revid):
+		node = tree[path]
+		return Entry(
+			kind=getattr(node_kind, node["kind"]),
+			URL=repo.url(path),
+			rev=Revision(opt_revision_kind.number, revid),
+			last_changed_rev=Revision(opt_revision_kind.number, node["changed"]),
+			wc_info=None
+		)
+
+	def export(self, url, dest, force=False, revision=None, recurse=True, ignore_externals=False, native_eol=None, peg_revision=None):
+		repo = self.repo
+		repo.count("export")
+		(revid, tree) = repo.tree(revision)
+		path = repo.path(url)
+		if path not in tree:
+			raise ClientError("%s does not exist in revision %s" % (url, revid))
+		if tree[path]["kind"] == "file":
+			self.write(dest, tree[path])
+			return Revision(opt_revision_kind.number, revid)
+		if os.path.isdir(dest) and not force:
+			raise ClientError("%s already exists" % dest)
+		if not os.path.isdir(dest):
+			os.makedirs(dest)
+		prefix = path + "/" if path else ""
+		for key in sorted(tree):
+			name = key[len(prefix):]
+			if key == path or not key.startswith(prefix) or (not recurse and "/" in name):
+				continue
+			if tree[key]["kind"] == "dir":
+				if not os.path.isdir(os.path.join(dest, name)):
+					os.makedirs(os.path.join(dest, name))
+			else:
+				self.write(os.path.join(dest, name), tree[key])
+		return Revision(opt_revision_kind.number, revid)
+
+	def write(self, dest, node):
+		if not os.path.isdir(os.path.dirname(dest)):
+			os.makedirs(os.path.dirname(dest))
+		file = open(dest, "wb")
+		file.write(self.translate(node))
+		file.close()
+		if "svn:executable" in node["props"]:
+			os.chmod(dest, 0755)
+
+	def cat(self, url, revision=None, peg_revision=None):
+		repo = self.repo
+		repo.count("cat")
+		(revid, tree) = repo.tree(revision)
+		path = repo.path(url)
+		if path not in tree or tree[path]["kind"] != "file":
+			raise ClientError("%s is not a file in revision %s" % (url, revid))
+		return self.translate(tree[path])
+
+	def translate(self, node):
+		# what export and cat make of a file: of svn:keywords only the
+		# revision ones are expanded, of svn:eol-style only CRLF is applied
+		content = node["content"]
+		keywords = node["props"].get("svn:keywords", "").split()
+		if [name for name in ("Rev", "Revision", "LastChangedRevision") if name in keywords]:
+			for name in ("LastChangedRevision", "Revision", "Rev"):
+				content = content.replace("$%s$" % name, "$%s: %s $" % (name, node["changed"]))
+		if node["props"].get("svn:eol-style") == "CRLF":
+			content = content.replace("\n", "\r\n")
+		return content
+
+	def propget(self, name, url, recurse=False, revision=None, peg_revision=None):
+		repo = self.repo
+		repo.count("propget")
+		(revid, tree) = repo.tree(revision)
+		path = repo.path(url)
+		prefix = path + "/" if path else ""
+		props = {}
+		for key in tree:
+			if (key == path or (recurse and key.startswith(prefix))) and name in tree[key]["props"]:
+				props[repo.url(key)] = tree[key]["props"][name]
+		return props
+
+# puts the stub in place of pysvn for whatever imports it next, serving repo
+def install(repo):
+	module = sys.modules.get("pysvn")
+	if module == None or not getattr(module, "stub", False):
+		module = types.ModuleType("pysvn")
+		module.stub = True
+		for item in (opt_revision_kind, node_kind, Revision, ClientError, Client):
+			setattr(module, item.__name__, item)
+		sys.modules["pysvn"] = module
+	Client.repo = repo
+	return module
@@ -0,0 +1,32 @@
+import os, unittest
+import support
+import bench
+
+class BenchTest(support.TestCase):
+
+	def test_dumps_import_and_split_cleanly(self):
+		# the base dump and then the full one pick up where the base left
+		# off, the same as importing the full dump in one go
+		runner = bench.Bench(self.tmp, 12, 4, 1, 1, 3, True, [])
+		runner.write_dumps()
+		self.sync("split", dump_file=runner.base_dump)
+		self.sync("split", dump_file=runner.full_dump)
+		self.sync("whole", dump_file=runner.full_dump)
+		self.assertEqual(self.refs("split"), self.refs("whole"))
+
+		refs = self.refs("whole")
+		self.assertEqual(sorted(refs), ["refs/heads/1.6", "refs/heads/master", "refs/tags/release-1.7.0"])
+		# the initial layout and every change, the branch and tag are copies
+		self.assertEqual(len([subject for subject in self.subjects("whole") if subject.startswith(("Initial layout", "Change "))]), 11)
+
+	def test_progress_counts_branch_only_revisions(self):
+		# the initial layout, a change and a tag, which leaves .svnrev
+		# where the change put it
+		runner = bench.Bench(self.tmp, 2, 4, 0, 1, 0, True, [])
+		runner.write_dumps()
+		self.sync("git", dump_file=runner.full_dump)
+		self.assertEqual(runner.svn_rev(), 3)
+		self.assertEqual(open(os.path.join(runner.git_path, ".svnrev")).readline().strip(), "2")
+
+if __name__ == "__main__":
+	unittest.main()
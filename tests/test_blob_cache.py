@@ -0,0 +1,56 @@
+import os, re, shutil, unittest
+import support
+from support import dojosvn2git
+
+class BlobCacheTest(support.TestCase):
+
+	def counts(self):
+		# (from git, from disk, exported) of the last sync
+		return tuple([int(count) for count in re.findall(r"Blob cache: (\d+) hits from git, (\d+) from disk, (\d+) exported", self.output())[-1]])
+
+	def history(self):
+		support.layout(self.svn)
+		self.svn.commit("Change a file", files={ "dojo/trunk/README":"dojo, changed\n" })
+		self.svn.commit("Add a directory", dirs=["dijit/trunk/form"], files={ "dijit/trunk/form/Button.js":"button\n", "dijit/trunk/form/Select.js":"select\n" })
+		self.svn.commit("Touch one of them", files={ "dijit/trunk/form/Select.js":"select, changed\n" })
+
+	def test_classify_keys_files_by_last_changed_rev(self):
+		# info2 of a URL has no checksum, the revision the file last changed
+		# in is what the cache can go by
+		self.history()
+		repo = self.repo()
+		state = dojosvn2git.PlanState(["master"], [])
+		client = dojosvn2git.pysvn.Client()
+		revision = repo.classify_revision(client, self.svn.log[3], state)
+		self.assertEqual([(change.file_path, change.changed) for change in revision.files["master"]], [("form/Button.js", 3), ("form/Select.js", 3)])
+
+		revision = repo.classify_revision(client, self.svn.log[4], state)
+		self.assertEqual([(change.file_path, change.changed) for change in revision.files["master"]], [("form/Select.js", 4)])
+
+	def test_second_import_comes_from_the_cache(self):
+		self.history()
+		blobs = os.path.join(self.tmp, "blobs")
+		self.sync("first", blob_cache_path=blobs)
+		self.assertEqual(self.counts(), (0, 0, 4))
+
+		exports = self.svn.calls["export"]
+		self.sync("second", blob_cache_path=blobs)
+		# only the trunks of the initial export go to svn again
+		self.assertEqual(self.svn.calls["export"] - exports, len(support.PROJECTS))
+		self.assertEqual(self.counts(), (0, 4, 0))
+		self.assertEqual(self.tree("first"), self.tree("second"))
+
+	def test_missing_copy_is_counted_once(self):
+		self.history()
+		blobs = os.path.join(self.tmp, "blobs")
+		self.sync("first", blob_cache_path=blobs)
+		for name in os.listdir(blobs):
+			if os.path.isdir(os.path.join(blobs, name)):
+				shutil.rmtree(os.path.join(blobs, name))
+
+		self.sync("second", blob_cache_path=blobs)
+		self.assertEqual(self.counts(), (0, 0, 4))
+		self.assertEqual(self.tree("first"), self.tree("second"))
+
+if __name__ == "__main__":
+	unittest.main()
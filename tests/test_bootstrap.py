@@ -0,0 +1,21 @@
+import unittest
+import support
+
+class BootstrapTest(support.TestCase):
+
+	def test_trunks_with_empty_and_ignoring_directories(self):
+		support.layout(self.svn)
+		self.svn.commit("Empty directories", dirs=["dojox/trunk/empty", "dijit/trunk/themes", "dijit/trunk/themes/built"], props={ "dijit/trunk/themes/built":{ "svn:ignore":"*.css\n" } })
+		# the snapshot the import starts from is the second revision
+		self.sync(start_revid=2, export_workers=3)
+
+		tree = self.tree("repo")
+		for project in support.PROJECTS:
+			self.assertEqual((tree[project + "/README"], tree[project + "/_base/base.js"]), ("%s\n" % project, "// %s base\n" % project))
+		# git only keeps the empty directories with something in them
+		self.assertEqual((tree["dojox/empty/.gitignore"], tree["dijit/themes/built/.gitignore"]), ("", "*.css\n"))
+		self.assertEqual(self.subjects("repo"), ["Empty directories [[2]]", "Initialized repo and added README, .gitignore, and .svnrev files."])
+		self.assertEqual(self.svn.calls["export"], len(support.PROJECTS))
+
+if __name__ == "__main__":
+	unittest.main()
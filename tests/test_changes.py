@@ -0,0 +1,56 @@
+import os, weakref, unittest
+import support, svnstub
+from support import dojosvn2git
+
+class ChangesTest(support.TestCase):
+
+	def classify(self, revid):
+		repo = self.repo()
+		state = dojosvn2git.PlanState(["master"], [])
+		return repo.classify_revision(dojosvn2git.pysvn.Client(), self.svn.log[revid], state)
+
+	def test_files_under_a_new_directory_are_listed_once(self):
+		# rev 3 has the dnd directory and both of its files as changed paths
+		support.history(self.svn)
+		revision = self.classify(3)
+		changes = revision.files["master"]
+		self.assertEqual([(change.file_path, change.svn_file()) for change in changes], [("dnd/Source.js", "/dojo/trunk/dnd/Source.js"), ("dnd/Target.js", "/dojo/trunk/dnd/Target.js")])
+		# everything under the directory shares its svn path
+		self.assertTrue(changes[0].svn_path is changes[1].svn_path)
+		self.assertFalse(hasattr(changes[0], "url"))
+
+	def test_paths_with_spaces_are_exported(self):
+		support.layout(self.svn)
+		self.svn.commit("Add a directory", dirs=["dijit/trunk/some dir"], files={ "dijit/trunk/some dir/a file.js":"a\n", "dijit/trunk/some dir/b file.js":"b\n" })
+		self.svn.commit("Change one", files={ "dijit/trunk/some dir/a file.js":"a, changed\n" })
+		self.sync()
+		tree = self.tree("repo")
+		self.assertEqual((tree["dijit/some dir/a file.js"], tree["dijit/some dir/b file.js"]), ("a, changed\n", "b\n"))
+
+	def test_listings_are_let_go(self):
+		# rev 3 lists the dnd directory and then each of its files, one
+		# listing at a time
+		support.history(self.svn)
+		listings = []
+		alive = []
+		info2 = svnstub.Client.info2
+		class Listing(list):
+			pass
+		def listing(client, url, **kwargs):
+			alive.append(len([ref for ref in listings if ref() is not None]))
+			result = Listing(info2(client, url, **kwargs))
+			listings.append(weakref.ref(result))
+			return result
+		svnstub.Client.info2 = listing
+		self.addCleanup(setattr, svnstub.Client, "info2", info2)
+
+		repo = self.repo()
+		state = dojosvn2git.PlanState(["master"], [])
+		revision = repo.classify_revision(dojosvn2git.pysvn.Client(), self.svn.log[3], state)
+		self.assertEqual(len(revision.files["master"]), 2)
+		self.assertEqual(alive, [0, 0, 0])
+		# the sets that dropped the duplicates go once it's classified
+		self.assertEqual(revision.seen, {})
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,22 @@
+import unittest
+import support
+
+class CopiesTest(support.TestCase):
+
+	def test_branch_forks_from_its_source(self):
+		support.history(self.svn)
+		self.sync()
+		# the branch starts at the trunk commit of rev 3. Svn only exported
+		# the trunks and what revs 2, 3 (a whole directory), 5 and 6 changed,
+		# nothing of the branch itself
+		fork = self.git("repo", "log", "-1", "--format=%H", "refs/tags/release-1.3.0~2").strip()
+		self.assertEqual(self.subjects("repo", fork)[0], "Add dnd [[3]]")
+		self.assertEqual(self.svn.calls["export"], len(support.PROJECTS) + 5)
+
+	def test_tag_points_at_the_copied_commit(self):
+		support.history(self.svn)
+		self.sync()
+		self.assertEqual(self.subjects("repo", "release-1.3.0")[:2], ["Both [[6]]", "Fix on the branch [[5]]"])
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,79 @@
+import os, unittest
+import support, svnstub
+from support import dojosvn2git
+
+class DirExportTest(support.TestCase):
+
+	def add(self):
+		support.layout(self.svn)
+		self.sync()
+		self.svn.commit("Add fx", dirs=["dojo/trunk/fx", "dojo/trunk/fx/easing"], files={ "dojo/trunk/fx/a.js":"a\n", "dojo/trunk/fx/b.js":"b\n", "dojo/trunk/fx/easing/c.js":"c\n" })
+		return self.svn.calls["export"]
+
+	def test_new_directory_is_one_export(self):
+		self.add()
+		urls = self.exported()
+		self.sync()
+		# without whatever its externals point to
+		self.assertEqual(urls, [(self.svn.url("dojo/trunk/fx"), True)])
+		tree = self.tree("repo")
+		self.assertEqual([tree["dojo/fx/" + name] for name in ("a.js", "b.js", "easing/c.js")], ["a\n", "b\n", "c\n"])
+
+	def exported(self):
+		# the urls svn is asked to export from here on
+		urls = []
+		export = svnstub.Client.export
+		def exporting(client, url, dest, **kwargs):
+			urls.append((url, kwargs["ignore_externals"]) if kwargs.get("recurse") else url)
+			return export(client, url, dest, **kwargs)
+		svnstub.Client.export = exporting
+		self.addCleanup(setattr, svnstub.Client, "export", export)
+		return urls
+
+	def test_excluded_files_are_never_exported(self):
+		self.add()
+		urls = self.exported()
+		self.sync(excludes=["dojo/trunk/fx/easing"])
+		# the directory isn't wanted whole, so its files go one by one
+		self.assertEqual(sorted(urls), [self.svn.url("dojo/trunk/fx/a.js"), self.svn.url("dojo/trunk/fx/b.js")])
+		tree = self.tree("repo")
+		self.assertEqual(sorted([path for path in tree if path.startswith("dojo/fx/")]), ["dojo/fx/a.js", "dojo/fx/b.js"])
+
+	def test_wanted_subdirectory_is_one_export(self):
+		support.layout(self.svn)
+		self.sync()
+		self.svn.commit("Add fx", dirs=["dojo/trunk/fx", "dojo/trunk/fx/easing"], files={ "dojo/trunk/fx/a.js":"a\n", "dojo/trunk/fx/easing/c.js":"c\n", "dojo/trunk/fx/easing/d.js":"d\n" })
+		urls = self.exported()
+		self.sync(excludes=["dojo/trunk/fx/a.js"])
+		self.assertEqual(urls, [(self.svn.url("dojo/trunk/fx/easing"), True)])
+		tree = self.tree("repo")
+		self.assertEqual(sorted([path for path in tree if path.startswith("dojo/fx/")]), ["dojo/fx/easing/c.js", "dojo/fx/easing/d.js"])
+
+	def cached_but(self, *names):
+		# a second repo sharing the blob cache of the first, which misses
+		# names in fx
+		support.layout(self.svn)
+		self.svn.commit("Add fx", dirs=["dojo/trunk/fx"], files=dict([("dojo/trunk/fx/%s.js" % name, name + "\n") for name in "abcde"]))
+		blobs = os.path.join(self.tmp, "blobs")
+		self.sync("first", blob_cache_path=blobs)
+		lookup = dojosvn2git.BlobCache.lookup
+		def missing(cache, path, changed):
+			if path in ["/dojo/trunk/fx/%s.js" % name for name in names]:
+				return None
+			return lookup(cache, path, changed)
+		dojosvn2git.BlobCache.lookup = missing
+		self.addCleanup(setattr, dojosvn2git.BlobCache, "lookup", lookup)
+		urls = self.exported()
+		self.sync("second", blob_cache_path=blobs)
+		self.assertEqual(self.tree("second"), self.tree("first"))
+		# the trunks of the initial export aren't in the cache either
+		return [url for url in urls if "/fx" in str(url)]
+
+	def test_a_few_misses_are_exported_alone(self):
+		self.assertEqual(sorted(self.cached_but("a", "b")), [self.svn.url("dojo/trunk/fx/a.js"), self.svn.url("dojo/trunk/fx/b.js")])
+
+	def test_mostly_missing_directory_is_one_export(self):
+		self.assertEqual(self.cached_but("a", "b", "c"), [(self.svn.url("dojo/trunk/fx"), True)])
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,54 @@
+import os, json, unittest
+import support
+
+class DumpTest(support.TestCase):
+
+	def write_dump(self):
+		path = os.path.join(self.tmp, "history.dump")
+		stream = open(path, "wb")
+		self.svn.dump(stream)
+		stream.close()
+		return path
+
+	def test_dump_matches_svn(self):
+		support.history(self.svn)
+		# a revision with several files on more than one branch, one of
+		# them executable
+		self.svn.commit("Branch 1.4", copies=[("branches/1.4", "branches/1.3", 6)])
+		self.svn.commit("Busy", files={ "dojo/trunk/a.js":"a\n", "dojo/trunk/b.js":"b\n", "branches/1.4/dojo/c.js":"c\n", "branches/1.4/dijit/d.sh":"#!/bin/sh\n" }, props={ "branches/1.4/dijit/d.sh":{ "svn:executable":"*" } })
+		path = self.write_dump()
+
+		self.sync("svn")
+		self.sync("dump", dump_file=path)
+		self.assertEqual(self.refs("dump"), self.refs("svn"))
+		self.assertEqual(self.tree("dump", "1.4"), self.tree("svn", "1.4"))
+		self.assertIn("100755", self.git("dump", "ls-tree", "1.4", "dijit/d.sh"))
+
+	def test_verify_allows_for_untranslated_files(self):
+		# the dump has files the way svn keeps them, the export expands
+		# keywords and applies the eol style
+		support.layout(self.svn)
+		self.svn.commit("Translated", files={ "dojo/trunk/kw.js":"// $Rev$\n", "dojo/trunk/eol.txt":"a\nb\n" }, props={ "dojo/trunk/kw.js":{ "svn:keywords":"Rev Id" }, "dojo/trunk/eol.txt":{ "svn:eol-style":"CRLF" } })
+		self.svn.commit("Broken", files={ "dijit/trunk/README":"dijit, changed\n" })
+		path = self.write_dump()
+
+		self.sync("svn")
+		self.sync("dump", dump_file=path)
+		self.assertEqual(self.tree("svn")["dojo/kw.js"], "// $Rev: 2 $\n")
+		self.assertEqual(self.tree("dump")["dojo/kw.js"], "// $Rev$\n")
+		self.assertEqual(self.tree("dump")["dojo/eol.txt"], "a\nb\n")
+		self.assertEqual(self.repo("svn").verify(), 0)
+		self.assertEqual(self.repo("dump").verify(), 0)
+
+		# anything else that's off still is
+		file = open(os.path.join(self.tmp, "dump", "dijit", "README"), "w")
+		file.write("dijit\n")
+		file.close()
+		self.git("dump", "commit", "-q", "-a", "--amend", "--no-edit")
+		os.remove(os.path.join(self.tmp, "dump", ".git", "svn2git-revmap"))
+		output = os.path.join(self.tmp, "mismatches.json")
+		self.assertEqual(self.repo("dump").verify(output_path=output), 1)
+		self.assertEqual([(line["path"], line["problem"]) for line in map(json.loads, open(output))], [("dijit/README", "content differs")])
+
+if __name__ == "__main__":
+	unittest.main()
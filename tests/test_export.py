@@ -0,0 +1,46 @@
+import os, threading, unittest
+import support, svnstub
+from support import dojosvn2git
+
+class ExportPoolTest(support.TestCase):
+
+	def setUp(self):
+		support.TestCase.setUp(self)
+		support.layout(self.svn)
+		self.lines = []
+		# the first export of every url fails
+		export = svnstub.Client.export
+		failed = set()
+		def flaky(client, url, dest, **kwargs):
+			if url not in failed:
+				failed.add(url)
+				raise svnstub.ClientError("connection reset")
+			return export(client, url, dest, **kwargs)
+		svnstub.Client.export = flaky
+		self.addCleanup(setattr, svnstub.Client, "export", export)
+
+	def logln(self, s=""):
+		self.lines.append((threading.current_thread().name, s))
+
+	def jobs(self, *paths):
+		return [(self.svn.url(path), os.path.join(self.tmp, "out", path)) for path in paths]
+
+	def test_workers_leave_the_logging_to_the_caller(self):
+		pool = dojosvn2git.ExportPool(self.repo(), 3, 2)
+		jobs = self.jobs("dojo/trunk/README", "dijit/trunk/README", "dojox/trunk/README")
+		pool.export(jobs, 1, dojosvn2git.pysvn.Client(), False, self.logln)
+		self.assertEqual([open(dest).read() for (url, dest) in jobs], ["dojo\n", "dijit\n", "dojox\n"])
+		self.assertEqual(sorted(self.lines), sorted([(threading.current_thread().name, "Retrying export of %s (connection reset)" % url) for (url, dest) in jobs]))
+
+	def test_failures_are_logged_and_raised(self):
+		pool = dojosvn2git.ExportPool(self.repo(), 2, 1)
+		jobs = self.jobs("dojo/trunk/README", "dojo/trunk/missing.js")
+		self.assertRaises(RuntimeError, pool.export, jobs, 1, dojosvn2git.pysvn.Client(), False, self.logln)
+		self.assertEqual([line for (thread, line) in self.lines if line.startswith("Failed")], ["Failed exporting %s: %s does not exist in revision 1" % (jobs[1][0], jobs[1][0])])
+		# the next call starts out clean
+		del self.lines[:]
+		pool.export(jobs[:1], 1, dojosvn2git.pysvn.Client(), False, self.logln)
+		self.assertEqual(self.lines, [])
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+import support
+
+class FastImportTest(support.TestCase):
+
+	# an executable file and a delete after the usual history
+	def more(self):
+		self.svn.commit("Make a script", files={ "util/trunk/build.sh":"#!/bin/sh\n" }, props={ "util/trunk/build.sh":{ "svn:executable":"*" } })
+		self.svn.commit("Drop a file", deletes=["dojo/trunk/dnd/Target.js"])
+
+	def test_same_history_as_git(self):
+		support.history(self.svn)
+		self.more()
+		self.sync("git")
+		self.sync("fast", use_fast_import=True)
+		self.assertEqual(self.refs("fast"), self.refs("git"))
+		self.assertEqual(self.subjects("fast"), self.subjects("git"))
+		self.assertIn("100755", self.git("fast", "ls-tree", "master", "util/build.sh"))
+
+	def test_later_sync_carries_on(self):
+		support.history(self.svn)
+		self.sync("fast", use_fast_import=True)
+		self.more()
+		self.sync("fast", use_fast_import=True)
+
+		# the same history in one go
+		self.sync("git")
+		self.assertEqual(self.refs("fast"), self.refs("git"))
+		# the working tree is brought up to date with what fast-import wrote
+		self.assertEqual(self.git("fast", "status", "--porcelain"), "")
+
+if __name__ == "__main__":
+	unittest.main()
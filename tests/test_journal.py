@@ -0,0 +1,92 @@
+import os, unittest
+import support
+from support import dojosvn2git
+
+class JournalTest(support.TestCase):
+
+	def revmap(self, name):
+		# the revmap with the subject of each commit instead of its sha
+		revmap = dojosvn2git.RevMap(os.path.join(self.tmp, name, ".git", "svn2git-revmap"))
+		revmap.load()
+		records = []
+		for (revid, branch, sha) in revmap.records:
+			subject = self.git(name, "log", "-1", "--format=%s", sha.encode("hex")).strip() if sha != dojosvn2git.RevMap.null else None
+			records.append((revid, branch, subject))
+		return records
+
+	def test_load_keeps_what_a_restart_needs(self):
+		path = os.path.join(self.tmp, "journal")
+		journal = dojosvn2git.Journal(path)
+		journal.load()
+		for (revid, phase, branch) in [(5, "done", None), (6, "classified", None), (6, "exported", None), (6, "committed", "master"), (6, "committed", "1.3 final"), (6, "done", None), (7, "exported", None), (7, "committed", "master")]:
+			journal.record(revid, phase, branch)
+		journal.close()
+		# a line cut short by a crash is left out
+		file = open(path, "a")
+		file.write("7 committed 1.")
+		file.close()
+
+		journal = dojosvn2git.Journal(path)
+		journal.load()
+		self.assertEqual((journal.last_done(), journal.phases(7), journal.committed(7)), (6, [("exported", None), ("committed", "master")], set(["master"])))
+		self.assertEqual(open(path).read(), "6 done\n7 exported\n7 committed master\n")
+
+	def test_fast_import_holds_commits_until_checkpoint(self):
+		journal = dojosvn2git.Journal(os.path.join(self.tmp, "journal"))
+		journal.load()
+		journal.hold = True
+		journal.record(1, "exported")
+		journal.record(1, "committed", "master")
+		journal.record(1, "done")
+		self.assertEqual((journal.last_done(), journal.committed(1)), (None, set()))
+		journal.release()
+		self.assertEqual(journal.last_done(), 1)
+
+	def test_revisions_without_commits_keep_the_revmap(self):
+		# the last two revisions only tag and delete a branch, the map
+		# ends before the journal does and that's fine
+		support.history(self.svn)
+		self.sync()
+		self.sync()
+		self.assertNotIn("Rebuilding the svn revision map", self.output())
+		self.assertIn("up-to-date at revision 8", self.output())
+
+	def resume(self, revid, phase, **options):
+		support.history(self.svn)
+		self.sync("clean", **options)
+		self.crash("repo", revid, phase, **options)
+		self.sync("repo", **options)
+		self.assertEqual(self.refs("repo"), self.refs("clean"))
+		self.assertEqual(self.revmap("repo"), self.revmap("clean"))
+
+	def test_plan_and_verify_only_read(self):
+		# a sync is halfway through writing rev 9 to the journal and the map
+		support.history(self.svn)
+		self.sync()
+		paths = [os.path.join(self.tmp, "repo", ".git", name) for name in ("svn2git-journal", "svn2git-revmap")]
+		for (path, tail) in zip(paths, ["9 classified\n9 expo", "\0\0"]):
+			file = open(path, "a")
+			file.write(tail)
+			file.close()
+		before = [(os.stat(path).st_ino, open(path, "rb").read()) for path in paths]
+
+		self.assertEqual(self.repo().plan(), 0)
+		self.assertEqual(self.repo().verify(), 0)
+		self.assertEqual([(os.stat(path).st_ino, open(path, "rb").read()) for path in paths], before)
+
+	def test_resume_after_commit_with_git(self):
+		# the commit of rev 6 on the first branch is made, the journal
+		# never hears of it
+		self.resume(6, "committed")
+
+	def test_resume_after_export_with_git(self):
+		self.resume(5, "exported")
+
+	def test_resume_after_commit_with_fast_import(self):
+		self.resume(6, "committed", use_fast_import=True)
+
+	def test_resume_after_done_with_fast_import(self):
+		self.resume(4, "done", use_fast_import=True)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,69 @@
+import time, threading, unittest
+import support, svnstub
+from support import dojosvn2git
+
+class LogFetcherTest(support.TestCase):
+
+	def setUp(self):
+		support.TestCase.setUp(self)
+		support.layout(self.svn)
+		for x in xrange(29):
+			self.svn.commit("Change %s" % x, files={ "dojo/trunk/README":"dojo %s\n" % x })
+		self.done = []
+		self.failures = {}
+		log = svnstub.Client.log
+		def slow(client, url, revision_start=None, revision_end=None, **kwargs):
+			# the earlier the window the longer it takes, so they come back
+			# in the opposite order they were asked for
+			start_revid = revision_start.number
+			time.sleep(max(0, 30 - start_revid) * 0.005)
+			if self.failures.get(start_revid, 0) > 0:
+				self.failures[start_revid] -= 1
+				raise svnstub.ClientError("connection reset")
+			self.done.append(start_revid)
+			return log(client, url, revision_start=revision_start, revision_end=revision_end, **kwargs)
+		svnstub.Client.log = slow
+		self.addCleanup(setattr, svnstub.Client, "log", log)
+
+	def fetcher(self, retries=2):
+		fetcher = dojosvn2git.LogFetcher(self.repo(), 2, 30, 3, retries)
+		fetcher.window = fetcher.min_window = fetcher.max_window = 4
+		return fetcher
+
+	def test_entries_come_out_in_order(self):
+		lines = []
+		fetcher = self.fetcher()
+		revids = [rev.revision.number for rev in fetcher.entries(lines.append)]
+		self.assertEqual(revids, range(2, 31))
+		self.assertEqual(lines, [])
+		# every window once, and not in the order they were read
+		self.assertEqual(sorted(self.done), range(2, 31, 4))
+		self.assertNotEqual(self.done, sorted(self.done))
+
+	def test_retries_are_logged_by_the_reader(self):
+		lines = []
+		self.failures = { 10:1 }
+		fetcher = self.fetcher()
+		reader = threading.current_thread().name
+		revids = []
+		for rev in fetcher.entries(lambda s="": lines.append((threading.current_thread().name, s))):
+			revids.append(rev.revision.number)
+		self.assertEqual(revids, range(2, 31))
+		self.assertEqual(lines, [(reader, "Retrying svn log of rev 10 to 13 (connection reset)")])
+
+	def test_failure_raises_after_the_windows_before_it(self):
+		self.failures = { 10:3 }
+		fetcher = self.fetcher(retries=1)
+		revids = []
+		try:
+			for rev in fetcher.entries(lambda s="": None):
+				revids.append(rev.revision.number)
+		except svnstub.ClientError:
+			pass
+		else:
+			self.fail("the failed window wasn't raised")
+		fetcher.stop()
+		self.assertEqual(revids, range(2, 10))
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,32 @@
+import os, json, unittest
+import support
+
+class MaintenanceTest(support.TestCase):
+
+	def test_repacks_on_the_way(self):
+		support.history(self.svn)
+		path = os.path.join(self.tmp, "metrics.jsonl")
+		self.sync(maintain_every=5, metrics_path=path)
+		output = self.output()
+		self.assertTrue(output.count("Repacking in the background") > 1)
+		self.assertEqual(output.count("Repacked in"), output.count("Repacking in the background"))
+		self.assertNotIn("Repacking failed", output)
+		# packing alongside the import loses nothing
+		self.git("repo", "fsck", "--strict", "--no-dangling")
+
+		# the repacks get lines of their own, they overlap whatever
+		# revisions are being applied meanwhile
+		lines = [json.loads(line) for line in open(path)]
+		repacks = [line for line in lines if line.get("phase") == "git repack"]
+		self.assertEqual(len(repacks), output.count("Repacked in"))
+		self.assertTrue(min([line["loose_objects"] for line in repacks]) > 0)
+		self.assertEqual([line for line in lines if "git repack" in line.get("phases", {})], [])
+		self.assertEqual(lines[-1]["summary"]["git repack"]["calls"], len(repacks))
+
+	def test_zero_leaves_it_to_git(self):
+		support.history(self.svn)
+		self.sync(maintain_every=0)
+		self.assertNotIn("Repack", self.output())
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,42 @@
+import os, unittest
+import support
+from support import dojosvn2git
+
+class MetaCacheTest(support.TestCase):
+
+	def test_second_sync_needs_no_log_or_info(self):
+		support.history(self.svn)
+		path = os.path.join(self.tmp, "meta.db")
+		self.sync("first", meta_cache_path=path)
+		calls = dict(self.svn.calls)
+		self.sync("second", meta_cache_path=path)
+		# the new repo's bootstrap asks for the message of the start revision
+		# and where svn's HEAD is, nothing else goes to svn
+		self.assertEqual(self.svn.calls["log"] - calls["log"], 1)
+		self.assertEqual(self.svn.calls["info2"] - calls["info2"], 1)
+		self.assertIn("Reading svn log history from rev 2 to 8 from the cache", self.output())
+		self.assertEqual(self.refs("second"), self.refs("first"))
+
+	def test_gaps_are_fetched(self):
+		support.history(self.svn)
+		path = os.path.join(self.tmp, "meta.db")
+		cache = dojosvn2git.MetaCache(path, self.svn.root)
+		cache.put_log(3, 4, self.svn.log[3:5])
+		cache.close()
+		self.sync(meta_cache_path=path)
+		output = self.output()
+		# the cached run is read in between the runs around it
+		self.assertTrue(output.index("Fetching svn log history from rev 2 to 2") < output.index("Reading svn log history from rev 3 to 4 from the cache") < output.index("Fetching svn log history from rev 5 to 8"))
+
+	def test_other_repo_starts_over(self):
+		support.history(self.svn)
+		path = os.path.join(self.tmp, "meta.db")
+		cache = dojosvn2git.MetaCache(path, self.svn.root)
+		cache.put_log(1, 8, self.svn.log[1:9])
+		cache.close()
+		cache = dojosvn2git.MetaCache(path, "http://svn.example.org/other")
+		self.assertEqual(cache.cached_to(1), None)
+		cache.close()
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,28 @@
+import os, json, unittest
+import support
+
+class MetricsTest(support.TestCase):
+
+	def test_svn_log_gets_lines_of_its_own(self):
+		support.history(self.svn)
+		path = os.path.join(self.tmp, "metrics.jsonl")
+		self.sync(metrics_path=path)
+		lines = [json.loads(line) for line in open(path)]
+		windows = [line for line in lines if line.get("phase") == "svn log"]
+		revisions = [line for line in lines if "revision" in line]
+
+		# the windows cover what came after the start revision once, in
+		# whatever order they came in
+		covered = []
+		for window in windows:
+			covered += range(window["revisions"][0], window["revisions"][1] + 1)
+		self.assertEqual(sorted(covered), range(2, 9))
+		self.assertEqual(sum([window["paths"] for window in windows]), sum([len(rev["changed_paths"]) for rev in self.svn.log[2:]]))
+
+		# none of it is billed to a revision, the summary has all of it
+		self.assertEqual([line["revision"] for line in revisions], range(2, 9))
+		self.assertEqual([line for line in revisions if "svn log" in line["phases"]], [])
+		self.assertEqual(lines[-1]["summary"]["svn log"]["calls"], len(windows))
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import support, svnstub
+from support import dojosvn2git
+
+class PathFilterTest(support.TestCase):
+
+	def test_nothing_given_takes_everything(self):
+		path_filter = dojosvn2git.PathFilter()
+		self.assertTrue(path_filter.allows("/dojo/trunk/README"))
+		self.assertTrue(path_filter.whole("/"))
+		self.assertEqual(path_filter.describe(), "")
+
+	def test_the_most_specific_rule_wins(self):
+		path_filter = dojosvn2git.PathFilter(["dojo", "dojox/trunk/gfx"], ["dojo/trunk/tests"])
+		self.assertTrue(path_filter.allows("/dojo/trunk/README"))
+		self.assertTrue(path_filter.allows("/dojox/trunk/gfx/shape.js"))
+		self.assertFalse(path_filter.allows("/dojox/trunk/README"))
+		self.assertFalse(path_filter.allows("/dojo/trunk/tests/runner.js"))
+		self.assertFalse(path_filter.allows("/dijit/trunk"))
+		# the project dirs go by any case
+		self.assertTrue(path_filter.allows("/Dojo/trunk/README"))
+
+		# dojo has a hole in it, dojox only a piece of it is in
+		self.assertFalse(path_filter.whole("/dojo/trunk"))
+		self.assertTrue(path_filter.whole("/dojo/trunk/_base"))
+		self.assertTrue(path_filter.reaches("/dojox/trunk"))
+		self.assertFalse(path_filter.reaches("/dijit"))
+		self.assertFalse(path_filter.reaches("/dojo/trunk/tests/data"))
+		self.assertEqual(path_filter.describe(), "+dojo, +dojox/trunk/gfx, -dojo/trunk/tests")
+
+	def test_globs(self):
+		path_filter = dojosvn2git.PathFilter((), ["tags/release-1.*", "*/trunk/tests"])
+		self.assertFalse(path_filter.allows("/tags/release-1.3.0"))
+		self.assertFalse(path_filter.reaches("/tags/release-1.3.0/dojo"))
+		self.assertTrue(path_filter.allows("/tags/release-2.0.0"))
+		self.assertFalse(path_filter.whole("/tags"))
+		self.assertFalse(path_filter.allows("/dijit/trunk/tests/a.js"))
+		self.assertTrue(path_filter.allows("/dijit/trunk/a.js"))
+
+	def test_an_exclude_wins_a_tie(self):
+		# the same path both ways, or a glob and a name at the same depth
+		self.assertFalse(dojosvn2git.PathFilter(["dojo"], ["dojo"]).allows("/dojo/trunk"))
+		path_filter = dojosvn2git.PathFilter(["tags/release-1.3.0"], ["tags/release-1.*"])
+		self.assertFalse(path_filter.allows("/tags/release-1.3.0"))
+		# deeper still beats both
+		path_filter = dojosvn2git.PathFilter(["tags/release-1.3.0/dojo"], ["tags/release-1.*"])
+		self.assertTrue(path_filter.allows("/tags/release-1.3.0/dojo/README"))
+		self.assertFalse(path_filter.allows("/tags/release-1.3.0/dijit/README"))
+
+	def exported(self):
+		# the urls svn is asked to export from here on
+		urls = []
+		export = svnstub.Client.export
+		def exporting(client, url, dest, **kwargs):
+			urls.append(url)
+			return export(client, url, dest, **kwargs)
+		svnstub.Client.export = exporting
+		self.addCleanup(setattr, svnstub.Client, "export", export)
+		return urls
+
+	def test_sync_leaves_out_what_is_filtered(self):
+		support.history(self.svn)
+		urls = self.exported()
+		self.sync(excludes=["dojo/trunk/dnd", "tags/release-1.*", "dojox", "util", "demos"])
+		self.assertIn("Only mirroring svn paths by -dojo/trunk/dnd, -tags/release-1.*, -dojox, -util, -demos", self.output())
+		# the projects, leaving out the top level files every repo has
+		self.assertEqual(sorted([path for path in self.tree("repo") if "/" in path]), ["dijit/README", "dijit/_base/base.js", "dojo/README", "dojo/_base/base.js"])
+		self.assertEqual(sorted(self.refs("repo")), ["refs/heads/master"])
+		# nothing under the excluded paths is asked for
+		self.assertTrue(len(urls))
+		self.assertEqual([url for url in urls if "/dnd" in url or "/dojox/" in url or "/tags/" in url], [])
+
+	def test_bootstrap_only_exports_what_is_wanted(self):
+		support.layout(self.svn)
+		self.svn.commit("Add tests", dirs=["dojo/trunk/tests", "dojo/trunk/tests/data"], files={ "dojo/trunk/tests/runner.js":"runner\n", "dojo/trunk/tests/data/a.json":"{}\n" })
+		urls = self.exported()
+		self.sync(start_revid=2, excludes=["dojo/trunk/tests/runner.js", "dojox", "util", "demos"])
+		# dijit is wanted whole, dojo only has its parts that are
+		self.assertEqual(sorted(urls), sorted([self.svn.url(path) for path in ("dijit/trunk", "dojo/trunk/README", "dojo/trunk/_base", "dojo/trunk/tests/data")]))
+		self.assertEqual(sorted([path for path in self.tree("repo") if "/" in path]), ["dijit/README", "dijit/_base/base.js", "dojo/README", "dojo/_base/base.js", "dojo/tests/data/a.json"])
+
+if __name__ == "__main__":
+	unittest.main()
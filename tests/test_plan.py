@@ -0,0 +1,45 @@
+import os, re, unittest
+import support
+
+class PlanTest(support.TestCase):
+
+	def plan(self, start_revid=None, end_revid=None):
+		# {revision: what it does} and the totals of a --plan run
+		output = len(self.output())
+		self.assertEqual(self.repo().plan(start_revid, end_revid), 0)
+		text = self.output()[output:]
+		revisions = dict([(int(revid), actions) for (revid, actions) in re.findall(r"^  (\d+)  (.*)$", text, re.M)])
+		return (revisions, text.split("\nTotals:\n")[1])
+
+	def history(self):
+		support.history(self.svn)
+		self.sync()
+		# a branch of two trunks at different revisions and a new directory
+		self.svn.commit("Branch 1.4", dirs=["branches/1.4"], copies=[("branches/1.4/dojo", "dojo/trunk", 3), ("branches/1.4/dijit", "dijit/trunk", 2)])
+		self.svn.commit("Add fx", dirs=["dojo/trunk/fx"], files={ "dojo/trunk/fx/a.js":"a\n", "dojo/trunk/fx/b.js":"b\n", "dojo/trunk/fx/c.js":"c\n" })
+
+	def test_copies_into_a_new_branch_are_counted(self):
+		self.history()
+		(revisions, totals) = self.plan()
+		# the branch forks from where dijit was copied, the four files dojo
+		# had at rev 3 come out of git
+		self.assertEqual(revisions[9], "create branch 1.4 from master@2; 1.4: 4 added")
+		self.assertIn("4 files copied in git", totals)
+
+	def test_new_directory_counts_its_files(self):
+		self.history()
+		# only the log is known, the directory's files are changed paths too
+		(revisions, totals) = self.plan()
+		self.assertEqual(revisions[10], "master: 3 added")
+		self.assertIn("3 files to export", totals)
+		self.assertIn("3 of the changed paths are counted as one file", totals)
+
+		# once a sync has the info in the meta cache the directory is sized
+		# and nothing is counted twice
+		self.sync()
+		(revisions, totals) = self.plan(9, 10)
+		self.assertEqual(revisions[10], "master: 3 added")
+		self.assertNotIn("counted as one file", totals)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,37 @@
+import time, unittest
+import support
+
+class PrefetchTest(support.TestCase):
+
+	def test_prefetch_matches_a_plain_sync(self):
+		support.history(self.svn)
+		self.sync("plain")
+		self.sync("prefetched", prefetch=3)
+		self.assertEqual(self.refs("prefetched"), self.refs("plain"))
+		# what the producer had to say about the log comes out with the
+		# first revision, not in the middle of someone else's output
+		output = self.output().split("-- Rev 2 ")[-1]
+		self.assertIn("Fetching svn log history from rev 2 to 8", output.split("-- Rev 3 ")[0])
+
+	def test_no_more_than_prefetch_revisions_ahead(self):
+		support.history(self.svn)
+		repo = self.repo(prefetch=2)
+		counts = { "started":0, "applied":0, "ahead":[] }
+		prepare = repo.prepare_revision
+		apply = repo.apply_revision
+		def preparing(*args):
+			counts["started"] += 1
+			return prepare(*args)
+		def applying(*args):
+			# the producer gets all the time it wants to run ahead
+			time.sleep(0.1)
+			counts["ahead"].append(counts["started"] - counts["applied"] - 1)
+			apply(*args)
+			counts["applied"] += 1
+		repo.prepare_revision = preparing
+		repo.apply_revision = applying
+		self.assertEqual(repo.go(), 0)
+		self.assertEqual(max(counts["ahead"]), 2)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,54 @@
+import os, json, unittest
+import support
+
+class PushTest(support.TestCase):
+
+	def setUp(self):
+		support.TestCase.setUp(self)
+		self.remote = os.path.join(self.tmp, "remote.git")
+		os.makedirs(self.remote)
+		self.git("remote.git", "init", "-q", "--bare")
+
+	def test_remote_ends_up_with_every_ref(self):
+		# pushes in the background every other revision, the branch 1.3 is
+		# pushed on the way and deleted again at the end
+		support.history(self.svn)
+		path = os.path.join(self.tmp, "metrics.jsonl")
+		self.sync(remote_url=self.remote, push_every=2, metrics_path=path)
+		self.assertEqual(self.refs("remote.git"), self.refs("repo"))
+		self.assertNotIn("refs/heads/1.3", self.refs("remote.git"))
+		self.assertIn("refs/tags/release-1.3.0", self.refs("remote.git"))
+
+		# the pushes aren't billed to the revisions they overlap
+		lines = [json.loads(line) for line in open(path)]
+		self.assertTrue(len([line for line in lines if line.get("phase") == "git push"]) > 1)
+		self.assertEqual([line for line in lines if "git push" in line.get("phases", {})], [])
+
+	def test_moved_tag_is_forced(self):
+		support.history(self.svn)
+		self.sync(remote_url=self.remote)
+		tagged = self.refs("remote.git")["refs/tags/release-1.3.0"]
+		# the tag is made again from the branch as it was a revision earlier
+		self.svn.commit("Redo 1.3.0", copies=[("tags/release-1.3.0", "branches/1.3", 5)], deletes=["tags/release-1.3.0"])
+		self.sync(remote_url=self.remote)
+		self.assertEqual(self.refs("remote.git"), self.refs("repo"))
+		self.assertNotEqual(self.refs("remote.git")["refs/tags/release-1.3.0"], tagged)
+
+	def test_push_is_all_or_nothing(self):
+		# the remote's master has a history of its own, so master is turned
+		# down and the tag mustn't go in without it
+		other = os.path.join(self.tmp, "other")
+		os.makedirs(other)
+		self.git("other", "init", "-q")
+		open(os.path.join(other, "file"), "w").write("other\n")
+		self.git("other", "add", "file")
+		self.git("other", "-c", "user.name=other", "-c", "user.email=other@example.org", "commit", "-q", "-m", "Other")
+		self.git("other", "push", "-q", self.remote, "HEAD:refs/heads/master")
+		before = self.refs("remote.git")
+
+		support.history(self.svn)
+		self.assertRaises(RuntimeError, self.repo(remote_url=self.remote).go)
+		self.assertEqual(self.refs("remote.git"), before)
+
+if __name__ == "__main__":
+	unittest.main()
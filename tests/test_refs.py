@@ -0,0 +1,24 @@
+import unittest
+import support
+
+class RefCacheTest(support.TestCase):
+
+	def test_cache_follows_git(self):
+		# --check-refs compares the cache with git after every revision and
+		# stops the sync on the first difference
+		support.history(self.svn)
+		self.sync("git", check_refs=True)
+		self.sync("fast", check_refs=True, use_fast_import=True)
+
+	def test_difference_is_caught(self):
+		support.history(self.svn)
+		self.sync()
+		repo = self.repo()
+		repo.git_load_refs()
+		repo.git_verify_refs()
+		# a tag made behind the cache's back
+		self.git("repo", "tag", "stray", "master")
+		self.assertRaises(RuntimeError, repo.git_verify_refs)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,51 @@
+import os, unittest
+import support
+from support import dojosvn2git
+
+class RevMapTest(support.TestCase):
+
+	def test_lookup_and_torn_record(self):
+		path = os.path.join(self.tmp, "revmap")
+		revmap = dojosvn2git.RevMap(path)
+		revmap.load()
+		revmap.append(3, "master", "11" * 20)
+		revmap.append(4, "1.3", "22" * 20)
+		revmap.append(6, "master", "33" * 20)
+		revmap.append(8, "1.3", None)
+		revmap.close()
+		# half a record, like a crash in the middle of a write
+		file = open(path, "ab")
+		file.write(revmap.pack(9, "master", "44" * 20)[:10])
+		file.close()
+
+		revmap = dojosvn2git.RevMap(path)
+		revmap.load()
+		self.assertEqual(revmap.last_rev(), 8)
+		self.assertEqual([revmap.lookup("master", revid) for revid in (2, 3, 5, 6, 100)], [None, "11" * 20, "11" * 20, "33" * 20, "33" * 20])
+		# a deleted branch has no commit from then on
+		self.assertEqual([revmap.lookup("1.3", revid) for revid in (4, 7, 8)], ["22" * 20, "22" * 20, None])
+		self.assertEqual(os.path.getsize(path), len("".join([revmap.pack(*record) for record in revmap.records])))
+
+	def read(self, name):
+		revmap = dojosvn2git.RevMap(os.path.join(self.tmp, name, ".git", "svn2git-revmap"))
+		revmap.load()
+		return revmap.records
+
+	def test_lost_map_is_rebuilt_from_git(self):
+		support.history(self.svn)
+		self.sync()
+		# git has nothing left of the deleted 1.3 branch to rebuild from, its
+		# records aren't needed as nothing can be copied out of it anymore
+		records = [record for record in self.read("repo") if record[1] != "1.3"]
+		self.assertNotEqual(records, [])
+
+		os.remove(os.path.join(self.tmp, "repo", ".git", "svn2git-revmap"))
+		self.sync()
+		self.assertIn("Rebuilding the svn revision map from the git history", self.output())
+		self.assertEqual(self.read("repo"), records)
+
+		self.sync(rebuild_revmap=True)
+		self.assertEqual(self.read("repo"), records)
+
+if __name__ == "__main__":
+	unittest.main()
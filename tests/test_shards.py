@@ -0,0 +1,19 @@
+import os, re, unittest
+import support
+
+class ShardsTest(support.TestCase):
+
+	def test_same_history_without_going_back_to_svn(self):
+		support.history(self.svn)
+		self.sync("sequential")
+		exports = self.svn.calls["export"]
+		# the workers export in processes of their own, this one only
+		# replays what they left in the blob cache and their objects
+		self.sync("sharded", shards=3)
+		self.assertEqual(self.svn.calls["export"], exports)
+		self.assertEqual(re.findall(r"Blob cache: \d+ hits from git, 0 from disk, (\d+) exported", self.output())[-1], "0")
+		self.assertEqual(self.refs("sharded"), self.refs("sequential"))
+		self.assertFalse(os.path.exists(os.path.join(self.tmp, "sharded", ".git", "svn2git-shards")))
+
+if __name__ == "__main__":
+	unittest.main()
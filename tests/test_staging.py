@@ -0,0 +1,60 @@
+import os, json, time, unittest
+import support
+
+class StagingTest(support.TestCase):
+
+	def test_revision_stages_in_one_run_each(self):
+		support.layout(self.svn)
+		# names git would read as options or globs if they weren't literal
+		names = ["plain.js", "with space.js", "-dash.js", "star*.js", "[set].js", ":colon.js"]
+		self.svn.commit("Add some", files=dict([("dijit/trunk/many/%s" % name, name + "\n") for name in names]))
+		self.svn.commit("Swap them", files=dict([("dojox/trunk/%s" % name, name + "\n") for name in names]), deletes=["dijit/trunk/many/" + name for name in names[1:]])
+
+		repo = self.repo()
+		commands = []
+		run = repo.run
+		def running(cmd, *args, **kwargs):
+			commands.append(cmd)
+			return run(cmd, *args, **kwargs)
+		repo.run = running
+		self.assertEqual(repo.go(), 0)
+
+		tree = self.tree("repo")
+		self.assertEqual(sorted([path for path in tree if path.startswith(("dijit/many/", "dojox/")) and not path.startswith(("dojox/README", "dojox/_base"))]), sorted(["dijit/many/plain.js"] + ["dojox/" + name for name in names]))
+		# however many files, a revision runs git add once for them and once
+		# for .svnrev, and git rm once if it deletes anything
+		revisions = []
+		staged = []
+		for cmd in commands:
+			if cmd.startswith("git -c gc.auto=0 commit"):
+				revisions.append((len([c for c in staged if " add " in c]), len([c for c in staged if " rm " in c])))
+				staged = []
+			elif cmd.startswith("git --literal-pathspecs"):
+				staged.append(cmd)
+		self.assertEqual(revisions[-2:], [(2, 0), (2, 1)])
+
+	def test_staging_is_timed_once(self):
+		support.history(self.svn)
+		path = os.path.join(self.tmp, "metrics.jsonl")
+		repo = self.repo(metrics_path=path)
+		# the clock jumps a minute every time git stages
+		clock = time.time
+		skipped = [0]
+		time.time = lambda: clock() + skipped[0]
+		self.addCleanup(setattr, time, "time", clock)
+		run = repo.run
+		def running(cmd, *args, **kwargs):
+			if cmd.startswith("git --literal-pathspecs"):
+				skipped[0] += 60
+			return run(cmd, *args, **kwargs)
+		repo.run = running
+		self.assertEqual(repo.go(), 0)
+
+		# it's all in git stage, none of it in the git phases that flushed it
+		summary = [json.loads(line) for line in open(path)][-1]["summary"]
+		self.assertTrue(skipped[0] > 0)
+		self.assertTrue(summary["git stage"]["seconds"] >= skipped[0])
+		self.assertEqual([phase for phase in summary if phase.startswith("git ") and phase != "git stage" and summary[phase]["seconds"] >= 60], [])
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,44 @@
+import os, sys, multiprocessing, unittest
+import support
+from support import dojosvn2git
+
+class TargetsTest(support.TestCase):
+
+	def test_targets_share_one_fetch(self):
+		support.history(self.svn)
+		# spaces in the paths go through git archive and tar too
+		targets = [
+			{ "repo":os.path.join(self.tmp, "full mirror") },
+			{ "repo":os.path.join(self.tmp, "core mirror"), "include":["dojo", "dijit"] },
+			{ "repo":os.path.join(self.tmp, "no branches"), "exclude":["branches", "tags"], "fast_import":True }
+		]
+		coordinator = self.repo("shared", meta_cache_path=os.path.join(self.tmp, "meta.db"), blob_cache_path=os.path.join(self.tmp, "blobs"))
+		self.assertEqual(coordinator.sync_targets(targets), 0)
+		# the others find what the first one exported in the caches
+		for name in ("core mirror", "no branches"):
+			log = open(os.path.join(self.tmp, name + ".log")).read()
+			self.assertIn("Taking dojo, dijit", log)
+			self.assertRegexpMatches(log, r"Blob cache: \d+ hits from git, \d+ from disk, 0 exported")
+
+		self.sync("full")
+		self.sync("core", includes=["dojo", "dijit"])
+		self.sync("nobranches", excludes=["branches", "tags"], use_fast_import=True)
+		self.assertEqual(self.refs("full mirror"), self.refs("full"))
+		self.assertEqual(self.refs("core mirror"), self.refs("core"))
+		self.assertEqual(self.refs("no branches"), self.refs("nobranches"))
+
+	def test_failed_archive_stops_the_bootstrap(self):
+		support.layout(self.svn)
+		self.sync("leader")
+		# the leader's map points at a commit it doesn't have
+		revmap = dojosvn2git.RevMap(os.path.join(self.tmp, "leader", ".git", "svn2git-revmap"))
+		revmap.replace([(1, "master", ("ab" * 20).decode("hex"))])
+		os.makedirs(os.path.join(self.tmp, "follower"))
+		self.git("follower", "init", "-q")
+
+		progress = multiprocessing.Value("l", sys.maxint)
+		follower = self.repo("follower", fan_out=(progress, os.path.join(self.tmp, "leader"), dojosvn2git.PathFilter((), ())))
+		self.assertRaises(RuntimeError, follower.borrow_trunks, 1)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,46 @@
+import os, re, json, unittest
+import support
+
+class VerifyTest(support.TestCase):
+
+	def history(self):
+		support.layout(self.svn)
+		self.svn.commit("Change a file", files={ "dojo/trunk/README":"dojo, changed\n" })
+		self.svn.commit("Add a file", files={ "dijit/trunk/_base/focus.js":"focus\n" })
+
+	def verify(self, **options):
+		output = os.path.join(self.tmp, "mismatches.json")
+		result = self.repo().verify(output_path=output, **options)
+		mismatches = [json.loads(line) for line in open(output)]
+		return (result, mismatches)
+
+	def test_good_commits_match(self):
+		self.history()
+		self.sync()
+		(result, mismatches) = self.verify()
+		self.assertEqual((result, mismatches), (0, []))
+		# the ten files of the layout are read once, the blob cache knows
+		# the two that changed after the export
+		self.assertEqual(re.findall(r"(\d+) read from svn", self.output())[-1], "10")
+
+	def test_corrupted_commit_is_reported(self):
+		self.history()
+		self.sync()
+		# the last commit gets different content with the same [[rev]]
+		path = os.path.join(self.tmp, "repo", "dojo", "README")
+		file = open(path, "w")
+		file.write("not what svn has\n")
+		file.close()
+		self.git("repo", "commit", "-q", "-a", "--amend", "--no-edit")
+		os.remove(os.path.join(self.tmp, "repo", ".git", "svn2git-revmap"))
+
+		(result, mismatches) = self.verify(start_revid=3)
+		self.assertEqual(result, 1)
+		self.assertEqual([(mismatch["revision"], mismatch["path"], mismatch["problem"]) for mismatch in mismatches], [(3, "dojo/README", "content differs")])
+
+		# the commit before it is still fine
+		(result, mismatches) = self.verify(start_revid=2, end_revid=2)
+		self.assertEqual((result, mismatches), (0, []))
+
+if __name__ == "__main__":
+	unittest.main()
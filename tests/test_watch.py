@@ -0,0 +1,66 @@
+import os, json, time, unittest
+import support
+
+class WatchTest(support.TestCase):
+
+	def watch(self, repo, polls, changes):
+		# runs the watch for a number of polls, instead of sleeping each poll
+		# hands over the status file and makes the next change to svn
+		path = os.path.join(self.tmp, "status.json")
+		seen = []
+		sleep = time.sleep
+		def sleeping(interval):
+			seen.append((interval, json.load(open(path))))
+			if len(seen) == polls:
+				raise KeyboardInterrupt()
+			if len(changes):
+				changes.pop(0)()
+		time.sleep = sleeping
+		try:
+			self.assertEqual(repo.watch(1, 4, path), 0)
+		finally:
+			time.sleep = sleep
+		return (seen, json.load(open(path)))
+
+	def test_new_revisions_are_picked_up(self):
+		support.history(self.svn)
+		repo = self.repo()
+		changes = [
+			lambda: self.svn.commit("Tweak dijit", files={ "dijit/trunk/README":"dijit, tweaked\n" }),
+			lambda: None,
+			lambda: None,
+			lambda: self.svn.commit("Tweak dojox", files={ "dojox/trunk/README":"dojox, tweaked\n" })
+		]
+		(seen, status) = self.watch(repo, 6, changes)
+
+		# nothing new backs off up to the longest interval, a new revision
+		# brings it straight back
+		self.assertEqual([interval for (interval, polled) in seen], [1, 1, 2, 4, 1, 2])
+		self.assertEqual([(polled["synced_rev"], polled["svn_head"], polled["syncs"]) for (interval, polled) in seen], [(8, 8, 1), (9, 9, 2), (9, 9, 2), (9, 9, 2), (10, 10, 3), (10, 10, 3)])
+		self.assertEqual(self.subjects("repo")[:3], ["Tweak dojox [[10]]", "Tweak dijit [[9]]", "Both [[6]]"])
+		self.assertEqual(self.tree("repo")["dojox/README"], "dojox, tweaked\n")
+
+		self.assertEqual(status["state"], "stopped")
+		self.assertEqual(status["next_poll"], None)
+		self.assertIn("Stopped watching", self.output())
+		self.assertFalse(repo.warm)
+
+	def test_a_failed_poll_keeps_watching(self):
+		support.history(self.svn)
+		repo = self.repo()
+		info2 = repo.svn_client.info2
+		def down(*args, **kwargs):
+			repo.svn_client.info2 = info2
+			raise RuntimeError("svn is down")
+		changes = [
+			lambda: setattr(repo.svn_client, "info2", down),
+			lambda: self.svn.commit("Tweak dijit", files={ "dijit/trunk/README":"dijit, tweaked\n" })
+		]
+		(seen, status) = self.watch(repo, 3, changes)
+
+		self.assertEqual([(interval, polled["state"], polled["last_error"]) for (interval, polled) in seen], [(1, "idle", None), (4, "error", "svn is down"), (1, "idle", None)])
+		self.assertEqual(seen[-1][1]["synced_rev"], 9)
+		self.assertIn("Sync failed: svn is down", self.output())
+
+if __name__ == "__main__":
+	unittest.main()